@@ -2,8 +2,8 @@
 import threading
 import logging
 
-from django.core.mail           import EmailMultiAlternatives
-from django.template.loader     import render_to_string
+from django.core.mail           import EmailMultiAlternatives, get_connection
+from django.template.loader     import get_template
 from django.template            import TemplateDoesNotExist
 from django.conf                import settings
 
@@ -13,16 +13,49 @@ def send_async_email(email):
     """
         Send email asynchronously in a background thread.
     """
-    
+    send_async_messages([email])
+
+
+def send_messages(emails, connection=None):
+    """
+        Sends a list of emails over one SMTP connection (one handshake for the lot).
+        Raises on failure, so callers backed by the outbox get their retry.
+    """
+    if not emails:
+        return 0
+
+    connection = connection or get_connection(fail_silently=False)
+    sent = connection.send_messages(emails) or 0
+    if sent < len(emails):
+        raise RuntimeError(f"Only {sent} of {len(emails)} emails were sent")
+    return sent
+
+
+def send_async_messages(emails):
+    """
+        Send a list of emails in one background thread over one connection.
+    """
+
     def _send():
         try:
-            email.send()
-            logger.debug("Email sent to %s", email.to)
-        except Exception as e:
-            logger.exception("Failed to send email to %s", email.to)
+            send_messages(emails)
+            logger.debug("Emails sent to %s", [email.to for email in emails])
+        except Exception:
+            logger.exception("Failed to send emails to %s", [email.to for email in emails])
 
     threading.Thread(target=_send, daemon=True).start()
 
+
+def _email_template(name):
+    """
+        Compiled email template, or None when it does not exist. Compiled templates are
+        reused by Django's cached loader (enabled whenever DEBUG is off).
+    """
+    try:
+        return get_template(name)
+    except TemplateDoesNotExist:
+        return None
+
 def _build_site_url(path: str) -> str:
     """
         Build a full URL based on SITE_URL in settings.
@@ -37,41 +70,38 @@ def _build_site_url(path: str) -> str:
     return f"{base}{path}"
 
 
-def send_email_with_template(subject: str, recipient: str, template_base: str, context: dict, async_send: bool = True, request=None):
+def build_email(subject: str, recipient: str, template_base: str, context: dict, request=None):
     """
-        Generic email sender: render templates and send.
+        Render the templates of `template_base` into an (unsent) email.
     """
+    text_template = _email_template(f"emails/{template_base}.txt")
+    html_template = _email_template(f"emails/{template_base}.html")
 
-    text_content        = ""
-    html_content        = None
-    text_template_found = False
-    html_template_found = False
-
-    try:
-        text_content            = render_to_string(f"emails/{template_base}.txt", context)
-        text_template_found     = True
-    except TemplateDoesNotExist:
+    if text_template is not None:
+        text_content = text_template.render(context)
+    else:
         text_content = context.get("intro", "You have a notification.")
 
-    try:
-        html_content            = render_to_string(f"emails/{template_base}.html", context, request=request)
-        html_template_found     = True
-    except TemplateDoesNotExist:
-        logger.debug("HTML template %s not found. Sending text-only email.", template_base)
-
     email = EmailMultiAlternatives(subject, text_content, settings.DEFAULT_FROM_EMAIL, [recipient])
 
-    if html_content:
-        email.attach_alternative(html_content, "text/html")
-
-    is_html_email = any(alt[1] == "text/html" for alt in getattr(email, "alternatives", []))
+    if html_template is not None:
+        email.attach_alternative(html_template.render(context, request=request), "text/html")
+    else:
+        logger.debug("HTML template %s not found. Sending text-only email.", template_base)
 
     logger.debug(
-        "Email prepared: text_template_found=%s, html_template_found=%s, is_html_email=%s",
-        text_template_found,
-        html_template_found,
-        is_html_email,
+        "Email prepared: text_template_found=%s, html_template_found=%s",
+        text_template is not None,
+        html_template is not None,
     )
+    return email
+
+
+def send_email_with_template(subject: str, recipient: str, template_base: str, context: dict, async_send: bool = True, request=None):
+    """
+        Generic email sender: render templates and send.
+    """
+    email = build_email(subject, recipient, template_base, context, request=request)
 
     if async_send:
         send_async_email(email)
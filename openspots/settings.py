@@ -157,12 +157,80 @@ CELERY_ACCEPT_CONTENT = ["json"]
 CELERY_TASK_SERIALIZER = "json"
 CELERY_RESULT_SERIALIZER = "json"
 CELERY_TIMEZONE = TIME_ZONE if 'TIME_ZONE' in globals() else 'UTC'
-OUTBOX_SWEEP_INTERVAL_SECONDS = float(os.getenv("OUTBOX_SWEEP_INTERVAL_SECONDS", "30"))
+OUTBOX_RELAY_ENABLED = os.getenv("OUTBOX_RELAY_ENABLED", "False").strip().lower() in {"1", "true", "yes", "on"}  # manage.py run_outbox_relay delivers on NOTIFY
+OUTBOX_RELAY_MAX_WAIT_SECONDS = float(os.getenv("OUTBOX_RELAY_MAX_WAIT_SECONDS", "60"))
+OUTBOX_SWEEP_INTERVAL_SECONDS = float(os.getenv("OUTBOX_SWEEP_INTERVAL_SECONDS", "300" if OUTBOX_RELAY_ENABLED else "30"))  # safety net when the relay runs
+OUTBOX_BATCH_SIZE = int(os.getenv("OUTBOX_BATCH_SIZE", "200"))
+OUTBOX_DISPATCH_DELAY_SECONDS = float(os.getenv("OUTBOX_DISPATCH_DELAY_SECONDS", "1"))  # coalesces a burst of writes into one dispatcher run
+OUTBOX_PROCESSING_TIMEOUT_SECONDS = int(os.getenv("OUTBOX_PROCESSING_TIMEOUT_SECONDS", str(10 * 60)))
+OUTBOX_RETENTION_DAYS = int(os.getenv("OUTBOX_RETENTION_DAYS", "7"))  # sent events older than this are deleted
+OUTBOX_PURGE_BATCH_SIZE = int(os.getenv("OUTBOX_PURGE_BATCH_SIZE", "5000"))
+OUTBOX_PURGE_INTERVAL_SECONDS = float(os.getenv("OUTBOX_PURGE_INTERVAL_SECONDS", str(60 * 60)))
+AVAILABILITY_CACHE_TIMEOUT = int(os.getenv("AVAILABILITY_CACHE_TIMEOUT", str(60 * 60 * 24)))
+AVAILABILITY_INDEX_TIMEOUT = int(os.getenv("AVAILABILITY_INDEX_TIMEOUT", str(60 * 5)))
+LISTING_CACHE_TIMEOUT = int(os.getenv("LISTING_CACHE_TIMEOUT", str(60 * 10)))
+VISIT_BUFFER_BACKEND = os.getenv("VISIT_BUFFER_BACKEND", "redis")  # "redis" or "memory" (single process)
+VISIT_BUFFER_REDIS_URL = os.getenv("VISIT_BUFFER_REDIS_URL", os.getenv("REDIS_URL", "redis://127.0.0.1:6379/0"))
+VISIT_FLUSH_BATCH_SIZE = int(os.getenv("VISIT_FLUSH_BATCH_SIZE", "5000"))
+VISIT_FLUSH_MAX_LATENCY_SECONDS = float(os.getenv("VISIT_FLUSH_MAX_LATENCY_SECONDS", "10"))
+VISIT_DEDUPE_WINDOW_SECONDS = int(os.getenv("VISIT_DEDUPE_WINDOW_SECONDS", str(30 * 60)))
+ROLLUP_INTERVAL_SECONDS = float(os.getenv("ROLLUP_INTERVAL_SECONDS", str(5 * 60)))
+ROLLUP_LOOKBACK_HOURS = int(os.getenv("ROLLUP_LOOKBACK_HOURS", "3"))  # must exceed the interval plus visit flush latency
+VISIT_RETENTION_MONTHS = int(os.getenv("VISIT_RETENTION_MONTHS", "6"))  # raw visits older than this are rolled up and deleted; 0 keeps them
+VISIT_COMPACTION_INTERVAL_SECONDS = float(os.getenv("VISIT_COMPACTION_INTERVAL_SECONDS", str(24 * 60 * 60)))
+DASHBOARD_COUNTERS_TIMEOUT = int(os.getenv("DASHBOARD_COUNTERS_TIMEOUT", str(60 * 5)))  # cached bucket counters; 0 always counts in the database
+IMAGE_PROCESSING_ASYNC = os.getenv("IMAGE_PROCESSING_ASYNC", "True").strip().lower() in {"1", "true", "yes", "on"}  # off: uploads are converted in the request
+IMAGE_PROCESSING_WORKERS = int(os.getenv("IMAGE_PROCESSING_WORKERS", "2"))  # encoder processes per batch (needs a non-prefork Celery pool)
+IMAGE_PROCESSING_BATCH_SIZE = int(os.getenv("IMAGE_PROCESSING_BATCH_SIZE", "20"))
+IMAGE_PROCESSING_DELAY_SECONDS = float(os.getenv("IMAGE_PROCESSING_DELAY_SECONDS", "2"))  # coalesces a burst of uploads into one task
+IMAGE_PROCESSING_SWEEP_SECONDS = float(os.getenv("IMAGE_PROCESSING_SWEEP_SECONDS", "300"))
+IMAGE_WEBP_QUALITY = int(os.getenv("IMAGE_WEBP_QUALITY", "80"))
+IMAGE_WEBP_METHOD = int(os.getenv("IMAGE_WEBP_METHOD", "4"))  # 0 (fast) - 6 (smallest)
+IMAGE_GC_GRACE_SECONDS = int(os.getenv("IMAGE_GC_GRACE_SECONDS", str(60 * 60)))  # unreferenced files younger than this are kept
+IMAGE_GC_INTERVAL_SECONDS = float(os.getenv("IMAGE_GC_INTERVAL_SECONDS", str(24 * 60 * 60)))
+GEOCODER = os.getenv("GEOCODER", "nominatim")  # "nominatim" or "stub" (answers from STUB_GEOCODER_RESULTS, no network)
+GEOCODING_ASYNC = os.getenv("GEOCODING_ASYNC", "True").strip().lower() in {"1", "true", "yes", "on"}  # off: venues are geocoded after commit, in the request
+GEOCODING_RATE_PER_SECOND = float(os.getenv("GEOCODING_RATE_PER_SECOND", "1"))  # Nominatim usage policy: at most 1 request/s
+GEOCODING_TIMEOUT_SECONDS = float(os.getenv("GEOCODING_TIMEOUT_SECONDS", "5"))
+GEOCODING_USER_AGENT = os.getenv("GEOCODING_USER_AGENT", "Openspots/1.0 (openspots.application@gmail.com)")
+GEOCODING_CACHE_TTL_DAYS = int(os.getenv("GEOCODING_CACHE_TTL_DAYS", "90"))
+GEOCODING_NEGATIVE_TTL_HOURS = int(os.getenv("GEOCODING_NEGATIVE_TTL_HOURS", "24"))  # addresses with no match are asked again after this
+GEOCODING_DELAY_SECONDS = float(os.getenv("GEOCODING_DELAY_SECONDS", "1"))  # coalesces a burst of venue saves into one task
+GEOCODING_SWEEP_SECONDS = float(os.getenv("GEOCODING_SWEEP_SECONDS", str(60 * 60)))
+STUB_GEOCODER_RESULTS = {}  # {address: (lat, lon)} for GEOCODER = "stub"
 CELERY_BEAT_SCHEDULE = {
     "process-pending-outbox-events-every-30s": {
         "task": "venues.tasks.process_pending_outbox_events",
         "schedule": OUTBOX_SWEEP_INTERVAL_SECONDS,
     },
+    "purge-sent-outbox-events": {
+        "task": "venues.tasks.purge_outbox_events",
+        "schedule": OUTBOX_PURGE_INTERVAL_SECONDS,
+    },
+    "flush-venue-visits": {
+        "task": "venues.tasks.flush_venue_visits",
+        "schedule": VISIT_FLUSH_MAX_LATENCY_SECONDS,
+    },
+    "refresh-venue-rollups": {
+        "task": "venues.tasks.refresh_venue_rollups",
+        "schedule": ROLLUP_INTERVAL_SECONDS,
+    },
+    "compact-venue-visits": {
+        "task": "venues.tasks.compact_venue_visits",
+        "schedule": VISIT_COMPACTION_INTERVAL_SECONDS,
+    },
+    "process-pending-venue-images": {
+        "task": "venues.tasks.process_venue_images",
+        "schedule": IMAGE_PROCESSING_SWEEP_SECONDS,
+    },
+    "collect-image-garbage": {
+        "task": "venues.tasks.collect_image_garbage",
+        "schedule": IMAGE_GC_INTERVAL_SECONDS,
+    },
+    "geocode-venues": {
+        "task": "venues.tasks.geocode_venues",
+        "schedule": GEOCODING_SWEEP_SECONDS,
+    },
 }
 
 # ------------------------------------------------------------------------------
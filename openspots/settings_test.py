@@ -15,3 +15,6 @@ PASSWORD_HASHERS = [
 
 # Disable debug toolbar etc.
 INSTALLED_APPS = [app for app in INSTALLED_APPS if app != 'debug_toolbar']
+
+# Never call Nominatim from tests
+GEOCODER = "stub"
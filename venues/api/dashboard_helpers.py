@@ -1,12 +1,13 @@
-from datetime                   import timedelta
-from django.conf                import settings
-from django.core.paginator      import EmptyPage, Paginator
-from django.db.models           import Count, Q
-from django.db.models.functions import TruncDay, TruncMonth, TruncWeek, TruncYear
-from django.utils               import timezone
-from venues.models              import Reservation, VenueVisit
-from venues.utils               import get_today
-from .serializers               import VenueImageSerializer
+from django.conf                          import settings
+from django.core.paginator                import EmptyPage, Paginator
+from django.utils                         import timezone
+from venues.models                        import Reservation
+from venues.services.dashboard_counts     import bucket_filters, get_counts
+from venues.services.rollups              import activity_series
+from venues.services.search               import search_reservations
+from venues.utils                         import get_today
+from .pagination                          import paginate_keyset
+from .serializers                         import VenueImageSerializer
 
 
 DASHBOARD_PAGE_SIZE     = 10
@@ -63,59 +64,10 @@ def _working_day_payload(day):
 
 
 def _analytics_payload(venue, grouping):
-    if grouping == "weekly":
-        trunc_fn = TruncWeek
-        days_back = 84
-        date_fmt = "%Y-%m-%d"
-    elif grouping == "monthly":
-        trunc_fn = TruncMonth
-        days_back = 365
-        date_fmt = "%Y-%m"
-    elif grouping == "yearly":
-        trunc_fn = TruncYear
-        days_back = 365 * 3
-        date_fmt = "%Y"
-    else:
-        trunc_fn = TruncDay
-        days_back = 30
-        date_fmt = "%Y-%m-%d"
-
-    start_date = get_today() - timedelta(days=days_back)
-
-    visits = (
-        VenueVisit.objects
-        .filter(venue=venue, timestamp__date__gte=start_date)
-        .annotate(period=trunc_fn("timestamp"))
-        .values("period")
-        .annotate(count=Count("id"))
-        .order_by("period")
-    )
-    reservations = (
-        Reservation.objects
-        .filter(venue=venue, created_at__date__gte=start_date)
-        .annotate(period=trunc_fn("created_at"))
-        .values("period")
-        .annotate(count=Count("id"))
-        .order_by("period")
-    )
-
-    rows_by_period = {}
-    visit_values = []
-    reservation_values = []
-
-    for item in visits:
-        period = item["period"].strftime(date_fmt)
-        rows_by_period.setdefault(period, {"period": period, "visits": 0, "reservations": 0})
-        rows_by_period[period]["visits"] = item["count"]
-        visit_values.append(item["count"])
+    start_date, rows = activity_series(venue, grouping)
 
-    for item in reservations:
-        period = item["period"].strftime(date_fmt)
-        rows_by_period.setdefault(period, {"period": period, "visits": 0, "reservations": 0})
-        rows_by_period[period]["reservations"] = item["count"]
-        reservation_values.append(item["count"])
-
-    rows = [rows_by_period[key] for key in sorted(rows_by_period)]
+    visit_values = [row["visits"] for row in rows if row["visits"]]
+    reservation_values = [row["reservations"] for row in rows if row["reservations"]]
     total_visits = sum(visit_values)
     total_reservations = sum(reservation_values)
     days_count = max((get_today() - start_date).days, 1)
@@ -188,32 +140,25 @@ def _reservation_payload(reservation, *, include_details=True):
 def _dashboard_reservations_queryset(venue, bucket):
     # THIS FUNCTION DOES NOT HIT THE DATABASE
 
-    today        = get_today()
+    filters      = bucket_filters(get_today())
     reservations = venue.reservations.all() # In Django QuerySets are lazy evaluated, so this doesn't hit the database yet.
 
     if bucket == "requests":
-        return reservations.filter(date__gte=today, status="pending").order_by("date", "time", "id")
+        return reservations.filter(filters["requests"]).order_by("date", "time", "id")
     
     if bucket == "arrivals":
-        return reservations.filter(date__gte=today, status__in=["accepted", "rejected", "cancelled"]).order_by("date", "time", "id")
+        return reservations.filter(filters["arrivals"]).order_by("date", "time", "id")
     
     if bucket == "history":
-        return reservations.filter(date__lt=today).order_by("-date", "-time", "-id")
+        return reservations.filter(filters["history"]).order_by("-date", "-time", "-id")
     
     return Reservation.objects.none()
 
 
 # OK - REVIEWED
 def _dashboard_reservation_counts(venue):
-    today = get_today()
-    upcoming = venue.reservations.filter(date__gte=today, status="pending")
-
-    return {
-        "unseen_requests": upcoming.filter(seen=False).count(),
-        "requests":       upcoming.count(),
-        "arrivals":       _dashboard_reservations_queryset(venue, "arrivals").count(),
-        "history":        _dashboard_reservations_queryset(venue, "history").count(),
-    }
+    # One aggregate query, or none while the venue's cached counters are warm.
+    return get_counts(venue.id)
 
 
 # OK - REVIEWED
@@ -235,10 +180,9 @@ def _filter_dashboard_reservations(queryset, request):
         queryset = queryset.filter(date__lte=end) # keep only reservations whose date is less than or equal to end
     
     if search:
-        queryset = queryset.filter(Q(firstname__icontains=search) | Q(lastname__icontains=search)
-                                 | Q(email__icontains=search)     | Q(phone__icontains=search)
-                                 | Q(status__icontains=search)    | Q(arrival_status__icontains=search)
-        )
+        # Indexed search column; best word-start matches first unless a sort is requested below.
+        queryset = search_reservations(queryset, search)
+        queryset = queryset.order_by("-search_rank", *queryset.query.order_by)
 
     sort_fields = {
         # Mapping from frontend table column names to the actual model fields to sort by.
@@ -303,3 +247,21 @@ def _paginated_reservation_payload(queryset, request):
     #     }
     #   ]
     # }
+
+
+# OK - REVIEWED
+# Keyset mode (?pagination=cursor): no COUNT(*) and no OFFSET, so a deep page costs the
+# same as the first one. Reuses the ordering put on the queryset by
+# _dashboard_reservations_queryset / _filter_dashboard_reservations; every one of them
+# ends on "id", so the order is total.
+def _keyset_reservation_payload(queryset, request, approximate_count=None):
+    page_size   = _parse_positive_int(request.GET.get("page_size"), DASHBOARD_PAGE_SIZE, maximum=DASHBOARD_MAX_PAGE_SIZE)
+    ordering    = tuple(queryset.query.order_by)
+    items, next_cursor = paginate_keyset(queryset, ordering, request.GET.get("cursor"), page_size) # ValueError on a bad cursor
+
+    return {
+        "page_size":            page_size,
+        "next_cursor":          next_cursor,        # None on the last page
+        "approximate_count":    approximate_count,  # Cached bucket counter, None when the list is filtered
+        "results":              [_reservation_payload(item, include_details=False) for item in items],
+    }
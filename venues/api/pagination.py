@@ -0,0 +1,65 @@
+import base64
+import binascii
+import json
+
+from django.db.models import Q
+
+
+def encode_cursor(values):
+    return base64.urlsafe_b64encode(json.dumps(values, default=str).encode()).decode()
+
+
+def decode_cursor(cursor):
+    """
+    Returns the list of ordering values stored in a cursor, or raises ValueError.
+    Every value must be a JSON scalar; a crafted cursor cannot smuggle in lists or
+    objects as lookup values.
+    """
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (binascii.Error, UnicodeDecodeError, json.JSONDecodeError) as exc:
+        raise ValueError("Invalid cursor") from exc
+
+    if not isinstance(values, list):
+        raise ValueError("Invalid cursor")
+    if not all(value is None or isinstance(value, (str, int, float)) for value in values):
+        raise ValueError("Invalid cursor")
+    return values
+
+
+def keyset_after(ordering, values):
+    """
+    Q matching the rows that come strictly after `values` for the given ordering,
+    e.g. ("name", "id") -> name > v0 OR (name = v0 AND id > v1). A leading "-" marks
+    a descending field. The last field must be unique so the order is total.
+    """
+    if len(values) != len(ordering):
+        raise ValueError("Invalid cursor")
+
+    condition = Q()
+    equal = Q()
+    for field, value in zip(ordering, values):
+        name = field.lstrip("-")
+        lookup = "lt" if field.startswith("-") else "gt"
+        condition |= equal & Q(**{f"{name}__{lookup}": value})
+        equal &= Q(**{name: value})
+    return condition
+
+
+def cursor_for(item, ordering):
+    getter = item.get if isinstance(item, dict) else lambda name: getattr(item, name)
+    return encode_cursor([getter(field.lstrip("-")) for field in ordering])
+
+
+def paginate_keyset(queryset, ordering, cursor=None, page_size=20):
+    """
+    Returns (items, next_cursor) for one page of `queryset` ordered by `ordering`.
+    One query: the page is fetched with one extra row to know whether more follow.
+    """
+    queryset = queryset.order_by(*ordering)
+    if cursor:
+        queryset = queryset.filter(keyset_after(ordering, decode_cursor(cursor)))
+
+    items = list(queryset[:page_size + 1])
+    next_cursor = cursor_for(items[page_size - 1], ordering) if len(items) > page_size else None
+    return items[:page_size], next_cursor
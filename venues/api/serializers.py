@@ -1,10 +1,12 @@
 from django.contrib.auth import get_user_model
 from django.db import IntegrityError, transaction
+from django.db.models import Prefetch
 from django.contrib.auth.password_validation import validate_password
 from rest_framework import serializers
 from rest_framework.validators import UniqueValidator
 
-from venues.models import Reservation, Review, Venue, VenueApplication
+from venues.models import Reservation, Review, Venue, VenueApplication, VenueImage, VenueMenuImage
+from venues.services.images import image_srcset, image_url
 
 User = get_user_model()
 
@@ -12,14 +14,16 @@ User = get_user_model()
 class VenueImageSerializer(serializers.Serializer):
     id = serializers.IntegerField(read_only=True)
     url = serializers.SerializerMethodField()
+    srcset = serializers.SerializerMethodField()
     order = serializers.IntegerField(read_only=True)
     approved = serializers.BooleanField(read_only=True)
     marked_for_deletion = serializers.BooleanField(read_only=True)
 
     def get_url(self, obj):
-        if not obj.image:
-            return None
-        return obj.image.url
+        return image_url(obj)
+
+    def get_srcset(self, obj):
+        return image_srcset(obj)
 
 
 class ReviewSerializer(serializers.ModelSerializer):
@@ -31,9 +35,60 @@ class ReviewSerializer(serializers.ModelSerializer):
         read_only_fields = ["id", "username", "created_at"]
 
 
-class VenueSerializer(serializers.ModelSerializer):
+class SparseFieldsMixin:
+    """
+    Drops every field not listed in context["fields"] (the ?fields= query parameter).
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        requested = self.context.get("fields")
+        if requested:
+            for name in set(self.fields) - set(requested):
+                self.fields.pop(name)
+
+
+def _wants(fields, *names):
+    return not fields or any(name in fields for name in names)
+
+
+def _approved_image_prefetch(related_name, model_cls):
+    return Prefetch(
+        related_name,
+        queryset=model_cls.objects.filter(approved=True, marked_for_deletion=False).order_by("order"),
+        to_attr=f"approved_{related_name}",
+    )
+
+
+class ApprovedImagesMixin:
+    def _approved_images(self, venue, related_name):
+        prefetched = getattr(venue, f"approved_{related_name}", None)
+        if prefetched is not None:
+            return prefetched
+
+        return getattr(venue, related_name).filter(
+            approved=True,
+            marked_for_deletion=False,
+        ).order_by("order")
+
+    def _first_image(self, venue):
+        images = self._approved_images(venue, "images")
+        if isinstance(images, list):
+            return images[0] if images else None
+        return images.first()
+
+    def get_first_image(self, venue):
+        # Cards never need more than the "card" rendition; first_image_srcset has the rest.
+        return image_url(self._first_image(venue), "card")
+
+    def get_first_image_srcset(self, venue):
+        return image_srcset(self._first_image(venue))
+
+
+class VenueSerializer(SparseFieldsMixin, ApprovedImagesMixin, serializers.ModelSerializer):
     owner_id = serializers.IntegerField(read_only=True)
     first_image = serializers.SerializerMethodField()
+    first_image_srcset = serializers.SerializerMethodField()
     images = serializers.SerializerMethodField()
     menu_images = serializers.SerializerMethodField()
     reviews = serializers.SerializerMethodField()
@@ -54,23 +109,32 @@ class VenueSerializer(serializers.ModelSerializer):
             "phone",
             "owner_id",
             "first_image",
+            "first_image_srcset",
             "images",
             "menu_images",
             "reviews",
         ]
         read_only_fields = ["id", "average_rating", "owner_id"]
 
-    def _approved_images(self, venue, related_name):
-        return getattr(venue, related_name).filter(
-            approved=True,
-            marked_for_deletion=False,
-        ).order_by("order")
-
-    def get_first_image(self, venue):
-        image = self._approved_images(venue, "images").first()
-        if not image or not image.image:
-            return None
-        return image.image.url
+    @staticmethod
+    def prefetch(queryset, fields=None):
+        """
+            Loads the images, menu images and reviews of every venue in the queryset with
+            one query each, so serializing a list costs the same regardless of its size.
+            Relations left out of `fields` are not loaded.
+        """
+        lookups = []
+        if _wants(fields, "images", "first_image", "first_image_srcset"):
+            lookups.append(_approved_image_prefetch("images", VenueImage))
+        if _wants(fields, "menu_images"):
+            lookups.append(_approved_image_prefetch("menu_images", VenueMenuImage))
+        if _wants(fields, "reviews"):
+            lookups.append(Prefetch(
+                "reviews",
+                queryset=Review.objects.select_related("user").order_by("-created_at"),
+                to_attr="ordered_reviews",
+            ))
+        return queryset.prefetch_related(*lookups)
 
     def get_images(self, venue):
         return VenueImageSerializer(
@@ -87,10 +151,31 @@ class VenueSerializer(serializers.ModelSerializer):
         ).data
 
     def get_reviews(self, venue):
-        return ReviewSerializer(
-            venue.reviews.select_related("user").order_by("-created_at"),
-            many=True,
-        ).data
+        reviews = getattr(venue, "ordered_reviews", None)
+        if reviews is None:
+            reviews = venue.reviews.select_related("user").order_by("-created_at")
+        return ReviewSerializer(reviews, many=True).data
+
+
+class VenueCardSerializer(SparseFieldsMixin, ApprovedImagesMixin, serializers.ModelSerializer):
+    """
+    Compact venue used by the homepage cards: no descriptions, galleries or reviews.
+    """
+
+    first_image = serializers.SerializerMethodField()
+    first_image_srcset = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Venue
+        fields = ["id", "name", "kind", "first_image", "first_image_srcset", "average_rating", "is_full"]
+        read_only_fields = fields
+
+    @staticmethod
+    def prefetch(queryset, fields=None):
+        if not _wants(fields, "first_image", "first_image_srcset"):
+            return queryset
+        return queryset.prefetch_related(_approved_image_prefetch("images", VenueImage))
+
 
 class UpcomingReservationSerializer(serializers.ModelSerializer):
     venue = serializers.SerializerMethodField()
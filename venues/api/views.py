@@ -1,12 +1,18 @@
+from collections import defaultdict
 from datetime import datetime
 
 import json
 
 from django.conf import settings
+from django.core.exceptions import ValidationError
 from django.db import transaction
-from django.db.models import Q
+from django.db.models import Case, CharField, F, Q, Value, When, Window
+from django.db.models.functions import RowNumber
+from django.http import HttpResponse, HttpResponseNotModified
 from django.shortcuts import get_object_or_404
 from django.utils import timezone
+from django.utils.http import parse_etags
+from django.utils.translation import get_language
 
 from rest_framework import generics, permissions, status, viewsets
 from rest_framework.decorators import action
@@ -14,6 +20,7 @@ from rest_framework.response import Response
 from rest_framework import serializers as drf_serializers
 from rest_framework.views import APIView
 from rest_framework.pagination import PageNumberPagination
+from rest_framework.renderers import JSONRenderer
 
 from drf_spectacular.utils import extend_schema
 
@@ -28,6 +35,9 @@ from venues.models import (
     VenueUpdateRequest,
     WorkingDay,
 )
+from venues.services.availability import SLOT_MINUTES, get_availability_range, get_free_venue_ids
+from venues.services.listing_cache import bump_venue_version, get_listing, listing_key, store_listing
+from venues.services.geo import cluster_precision, cluster_venues, filter_bbox, radius_bbox, within_radius
 from venues.services.emails import (
     send_new_venue_application_email,
     send_venue_verification_code,
@@ -43,6 +53,7 @@ from .dashboard_helpers import (
     _dashboard_reservations_queryset,
     _dashboard_venue_payload,
     _filter_dashboard_reservations,
+    _keyset_reservation_payload,
     _paginated_reservation_payload,
     _reservation_payload,
     _working_day_payload,
@@ -51,15 +62,31 @@ from .serializers import (
     ReservationSerializer,
     UpcomingReservationSerializer,
     VenueApplicationSerializer,
+    VenueCardSerializer,
     VenueEmailSerializer,
     VenueSerializer,
     VenueUpdateRequestSerializer,
     VenueVerificationCodeSerializer,
     ReviewSerializer,
 )
+from .pagination import cursor_for, decode_cursor, keyset_after, paginate_keyset
 
 
 SEND_COOLDOWN_SECONDS = 45
+AVAILABILITY_MAX_RANGE_DAYS = 62
+MAP_MAX_RADIUS_KM = 100
+VENUE_LIST_PAGE_SIZE = 12
+VENUE_LIST_MAX_PAGE_SIZE = 50
+VENUE_LIST_ORDERING = ("name", "id")
+VENUE_LIST_CACHE_PARAMS = ("kind", "availability", "group", "cursor", "page_size", "view", "fields")
+
+# Homepage sections, in display order. "cafe" covers bars too.
+VENUE_GROUPS = {
+    "cafe_bar": Q(kind__in=["cafe", "bar"]),
+    "restaurants": Q(kind="restaurant"),
+    "beach_bar": Q(kind="beach_bar"),
+    "other": ~Q(kind__in=["cafe", "bar", "restaurant", "beach_bar"]),
+}
 
 
 def _reservation_payload(reservation):
@@ -99,6 +126,18 @@ def _working_day_payload(day):
     }
 
 
+def _slot_payload(slot):
+    return {
+        "time": slot["time"].strftime("%H:%M"),
+        "slot_date": slot["slot_date"].isoformat(),
+        "is_next_day": slot["is_next_day"],
+        "offset": slot["offset"],
+        "is_blocked": slot["is_blocked"],
+        "is_reserved": slot["is_reserved"],
+        "is_available": slot["is_available"],
+    }
+
+
 def _reorder_images(venue, request, model_cls):
     if request.method != "POST":
         raise drf_serializers.ValidationError("Invalid request method")
@@ -145,6 +184,7 @@ def _reorder_images(venue, request, model_cls):
 
         if to_update:
             model_cls.objects.bulk_update(to_update, ["order"])
+            transaction.on_commit(lambda: bump_venue_version(venue.id), robust=True)
 
     return Response({"detail": "Image order updated.", "updated_order": updated_ids})
 
@@ -259,14 +299,12 @@ def _handle_dashboard_image_group(
             approved=True,
             marked_for_deletion=False,
         ).count()
-        for index, file in enumerate(files):
-            model_cls.objects.create(
-                venue=venue,
-                image=file,
-                approved=auto_approve,
-                marked_for_deletion=False,
-                order=next_order + index,
-            )
+        if files:
+            model_cls.bulk_create_uploads([
+                model_cls(venue=venue, image=file, approved=auto_approve, marked_for_deletion=False, order=next_order + index)
+                for index, file in enumerate(files)
+            ])
+            transaction.on_commit(lambda: bump_venue_version(venue.id), robust=True)
         return list(
             model_cls.objects.filter(
                 venue=venue,
@@ -276,13 +314,10 @@ def _handle_dashboard_image_group(
         )
 
     ordered_existing_ids = [item["id"] for item in image_order if item["kind"] == "existing"]
-    duplicate_existing_ids = {
-        image_id for image_id in ordered_existing_ids if ordered_existing_ids.count(image_id) > 1
-    }
-    if duplicate_existing_ids:
+    existing_ids = set(ordered_existing_ids)
+    if len(existing_ids) != len(ordered_existing_ids):
         raise drf_serializers.ValidationError({order_field or visible_field: "Image order contains duplicate existing image ids."})
 
-    existing_ids = set(ordered_existing_ids)
     deleted_id_set = set(deleted_ids)
     overlap = existing_ids & deleted_id_set
     if overlap:
@@ -291,16 +326,18 @@ def _handle_dashboard_image_group(
         })
 
     all_referenced_ids = existing_ids | deleted_id_set
-    if all_referenced_ids:
-        found_ids = set(model_cls.objects.filter(venue=venue, id__in=all_referenced_ids).values_list("id", flat=True))
-        missing_ids = all_referenced_ids - found_ids
-        if missing_ids:
-            raise drf_serializers.ValidationError({
-                order_field or visible_field: f"Unknown image ids for this venue: {sorted(missing_ids)}."
-            })
-
-    updated_ids = []
+    images_by_id = model_cls.objects.filter(venue=venue).in_bulk(all_referenced_ids) if all_referenced_ids else {}
+    missing_ids = all_referenced_ids - images_by_id.keys()
+    if missing_ids:
+        raise drf_serializers.ValidationError({
+            order_field or visible_field: f"Unknown image ids for this venue: {sorted(missing_ids)}."
+        })
 
+    # One INSERT for the uploads (converted later by the image queue), one UPDATE for the
+    # rest, whatever the size of the gallery; bulk writes send no post_save, so the venue's
+    # listing version is bumped here.
+    ordered_images = []
+    new_images = []
     for order_index, item in enumerate(image_order):
         if item["kind"] == "new":
             file = file_map.get(item["upload_key"])
@@ -308,24 +345,29 @@ def _handle_dashboard_image_group(
                 raise drf_serializers.ValidationError({
                     order_field or visible_field: f"Missing uploaded file for {item['upload_key']}."
                 })
-            image = model_cls.objects.create(
+            image = model_cls(
                 venue=venue,
                 image=file,
                 approved=auto_approve,
                 marked_for_deletion=False,
                 order=order_index,
             )
-            updated_ids.append(image.id)
-            continue
-
-        image = model_cls.objects.get(pk=item["id"], venue=venue)
-
-        image.order = order_index
-        image.marked_for_deletion = False
-        if auto_approve:
-            image.approved = True
-        image.save(update_fields=["order", "marked_for_deletion"] + (["approved"] if auto_approve else []))
-        updated_ids.append(image.id)
+            new_images.append(image)
+        else:
+            image = images_by_id[item["id"]]
+            image.order = order_index
+            image.marked_for_deletion = False
+            if auto_approve:
+                image.approved = True
+        ordered_images.append(image)
+
+    if new_images:
+        model_cls.bulk_create_uploads(new_images)
+    existing_images = [images_by_id[image_id] for image_id in ordered_existing_ids]
+    if existing_images:
+        model_cls.objects.bulk_update(
+            existing_images, ["order", "marked_for_deletion"] + (["approved"] if auto_approve else [])
+        )
 
     if deleted_ids:
         deleted_images = model_cls.objects.filter(venue=venue, id__in=deleted_ids)
@@ -334,7 +376,10 @@ def _handle_dashboard_image_group(
         else:
             deleted_images.update(marked_for_deletion=True)
 
-    return updated_ids
+    if new_images or existing_images or deleted_ids:
+        transaction.on_commit(lambda: bump_venue_version(venue.id), robust=True)
+
+    return [image.id for image in ordered_images]
 
 
 class VenueApplicationCreateAPIView(generics.CreateAPIView):
@@ -451,13 +496,8 @@ def _first_venue_image_url(venue, request):
     return request.build_absolute_uri(image.image.url)
 
 
-def _upcoming_reservation_payload(request):
-    user = request.user
-
-    if not user.is_authenticated:
-        return None
-
-    reservation = (
+def _upcoming_reservations_queryset(user):
+    return (
         Reservation.objects
         .filter(
             user=user,
@@ -466,9 +506,17 @@ def _upcoming_reservation_payload(request):
         .exclude(status__in=["cancelled", "rejected"])
         .select_related("venue")
         .order_by("date", "time")
-        .first()
     )
 
+
+def _upcoming_reservation_payload(request):
+    user = request.user
+
+    if not user.is_authenticated:
+        return None
+
+    reservation = _upcoming_reservations_queryset(user).first()
+
     if not reservation:
         return None
 
@@ -487,42 +535,165 @@ def _upcoming_reservation_payload(request):
         },
     }
 
+def _filter_venue_listing(venues, request):
+    kind = request.GET.get("kind")
+    availability = request.GET.get("availability")
+
+    if kind:
+        if kind == "cafe":
+            venues = venues.filter(kind__in=["cafe", "bar"])
+        else:
+            venues = venues.filter(kind=kind)
+
+    if availability == "available":
+        venues = venues.filter(is_full=False)
+    elif availability == "full":
+        venues = venues.filter(is_full=True)
+
+    return venues
+
+def _map_marker_payload(row):
+    return {
+        "id": row["id"],
+        "name": row["name"],
+        "kind": row["kind"],
+        "is_full": row["is_full"],
+        "lat": float(row["latitude"]),
+        "lng": float(row["longitude"]),
+        **({"distance_km": row["distance_km"]} if "distance_km" in row else {}),
+    }
+
+def _cached_listing_response(request, parts, build):
+    """
+        Anonymous JSON listings are served from rendered bytes in the cache (see
+        venues.services.listing_cache) with an ETag, answering If-None-Match with 304.
+        build() returns (data, venue_ids) and only runs on a miss.
+    """
+    if request.user.is_authenticated or request.accepted_renderer.format != "json":
+        data, _ = build()
+        return Response(data)
+
+    key = listing_key({**parts, "locale": get_language()})
+    cached = get_listing(key)
+    if cached is None:
+        data, venue_ids = build()
+        cached = store_listing(key, JSONRenderer().render(data), venue_ids)
+
+    body, etag = cached
+    if_none_match = parse_etags(request.META.get("HTTP_IF_NONE_MATCH", ""))
+    if etag in if_none_match or "*" in if_none_match:
+        response = HttpResponseNotModified()
+    else:
+        response = HttpResponse(body, content_type="application/json")
+    response["ETag"] = etag
+    return response
+
+def _venue_group():
+    return Case(
+        *[When(condition, then=Value(name)) for name, condition in VENUE_GROUPS.items()],
+        output_field=CharField(),
+    )
+
+
+def _all_per_group(venues):
+    """
+        Every venue of every homepage group, from a single query (the unpaginated listing).
+    """
+    grouped = {name: [] for name in VENUE_GROUPS}
+    for venue in venues.annotate(list_group=_venue_group()).order_by(*VENUE_LIST_ORDERING):
+        grouped[venue.list_group].append(venue)
+    return {name: (items, None) for name, items in grouped.items()}
+
+
+def _first_page_per_group(venues, page_size):
+    """
+        First keyset page of every homepage group from a single query: rows are numbered
+        per group and only page_size + 1 of each are fetched.
+    """
+    group = _venue_group()
+    rows = (
+        venues
+        .annotate(
+            list_group=group,
+            group_rank=Window(RowNumber(), partition_by=[group], order_by=[F(name) for name in VENUE_LIST_ORDERING]),
+        )
+        .filter(group_rank__lte=page_size + 1)
+        .order_by(*VENUE_LIST_ORDERING)
+    )
+
+    grouped = {name: [] for name in VENUE_GROUPS}
+    for venue in rows:
+        grouped[venue.list_group].append(venue)
+
+    return {
+        name: (
+            items[:page_size],
+            cursor_for(items[page_size - 1], VENUE_LIST_ORDERING) if len(items) > page_size else None,
+        )
+        for name, items in grouped.items()
+    }
+
 class VenueViewSet(viewsets.ReadOnlyModelViewSet):
     queryset            = Venue.objects.all().order_by("name")
     serializer_class    = VenueSerializer
     permission_classes  = [permissions.AllowAny]
 
     def list(self, request, *args, **kwargs):
-        venues = self.get_queryset()
+        """
+            Venues grouped into the homepage sections, every venue unless paging is asked
+            for: ?page_size=n returns one keyset page per group plus next[group], and
+            ?group=<name>&cursor=<next> continues a single group. ?view=card returns the
+            compact card representation and ?fields=a,b keeps only the listed fields.
+        """
+        group = request.GET.get("group")
+        if group and group not in VENUE_GROUPS:
+            return Response({"error": "Invalid group"}, status=status.HTTP_400_BAD_REQUEST)
 
-        kind = request.GET.get("kind")
-        availability = request.GET.get("availability")
+        try:
+            page_size = min(int(request.GET.get("page_size") or VENUE_LIST_PAGE_SIZE), VENUE_LIST_MAX_PAGE_SIZE)
+        except ValueError:
+            return Response({"error": "Invalid page_size"}, status=status.HTTP_400_BAD_REQUEST)
+        if page_size < 1:
+            return Response({"error": "Invalid page_size"}, status=status.HTTP_400_BAD_REQUEST)
 
-        if kind:
-            if kind == "cafe":
-                venues = venues.filter(kind__in=["cafe", "bar"])
+        cursor = request.GET.get("cursor")
+        paginated = bool(group or cursor or request.GET.get("page_size"))
+        if group and cursor:
+            try:
+                # Builds the lookups now, so values that do not fit the sort fields fail here.
+                Venue.objects.filter(keyset_after(VENUE_LIST_ORDERING, decode_cursor(cursor)))
+            except (TypeError, ValueError, ValidationError):
+                return Response({"error": "Invalid cursor"}, status=status.HTTP_400_BAD_REQUEST)
+
+        fields = [name.strip() for name in request.GET.get("fields", "").split(",") if name.strip()]
+        serializer_class = VenueCardSerializer if request.GET.get("view") == "card" else VenueSerializer
+
+        def build():
+            venues = serializer_class.prefetch(_filter_venue_listing(self.get_queryset(), request), fields)
+            if group:
+                pages = {
+                    group: paginate_keyset(venues.filter(VENUE_GROUPS[group]), VENUE_LIST_ORDERING, cursor, page_size)
+                }
+            elif paginated:
+                pages = _first_page_per_group(venues, page_size)
             else:
-                venues = venues.filter(kind=kind)
-
-        if availability == "available":
-            venues = venues.filter(is_full=False)
-        elif availability == "full":
-            venues = venues.filter(is_full=True)
-
-        data = VenueSerializer(venues, many=True, context={"request": request}).data
-
-        grouped = {
-            "cafe_bar": [v for v in data if v["kind"] in ["cafe", "bar"]],
-            "restaurants": [v for v in data if v["kind"] == "restaurant"],
-            "beach_bar": [v for v in data if v["kind"] == "beach_bar"],
-            "other": [v for v in data if v["kind"] not in ["cafe", "bar", "restaurant", "beach_bar"]],
-        }
+                pages = _all_per_group(venues)
+
+            context = {"request": request, "fields": fields}
+            data = {
+                "count": sum(len(items) for items, _ in pages.values()),
+                "results": {
+                    name: serializer_class(items, many=True, context=context).data
+                    for name, (items, _) in pages.items()
+                },
+                "upcoming_reservation": _upcoming_reservation_payload(request),
+            }
+            if paginated:
+                data["next"] = {name: next_cursor for name, (_, next_cursor) in pages.items()}
+            return data, [venue.id for items, _ in pages.values() for venue in items]
 
-        return Response({
-            "count": len(data),
-            "results": grouped,
-            "upcoming_reservation": _upcoming_reservation_payload(request),
-        })
+        parts = {name: request.GET.get(name, "") for name in VENUE_LIST_CACHE_PARAMS}
+        return _cached_listing_response(request, {"endpoint": "venue-list", **parts}, build)
 
     @action(detail=False, methods=["get"], url_path="owned", permission_classes=[permissions.IsAuthenticated])
     def owned(self, request):
@@ -598,6 +769,14 @@ class VenueViewSet(viewsets.ReadOnlyModelViewSet):
 
         queryset = _dashboard_reservations_queryset(venue,  bucket)
         queryset = _filter_dashboard_reservations(queryset, request)
+
+        if request.GET.get("pagination") == "cursor":
+            filtered = any(request.GET.get(name) for name in ("start", "end", "search"))
+            approximate_count = None if filtered else _dashboard_reservation_counts(venue)[bucket]
+            try:
+                return Response(_keyset_reservation_payload(queryset, request, approximate_count))
+            except (TypeError, ValueError, ValidationError):   # malformed cursor, or values that do not fit the sort fields
+                return Response({"detail": "Invalid cursor."}, status=status.HTTP_400_BAD_REQUEST)
         
         return Response(_paginated_reservation_payload(queryset, request))
 
@@ -753,19 +932,138 @@ class VenueViewSet(viewsets.ReadOnlyModelViewSet):
             return Response({"error": "Invalid date format"}, status=status.HTTP_400_BAD_REQUEST)
 
         slots = venue.get_available_time_slots(selected_date)
-        payload = [
-            {
-                "time": slot["time"].strftime("%H:%M"),
-                "slot_date": slot["slot_date"].isoformat(),
-                "is_next_day": slot["is_next_day"],
-                "offset": slot["offset"],
-                "is_blocked": slot["is_blocked"],
-                "is_reserved": slot["is_reserved"],
-                "is_available": slot["is_available"],
+        payload = [_slot_payload(slot) for slot in slots]
+        return Response({"business_date": selected_date.isoformat(), "slots": payload})
+
+
+    @action(detail=True, methods=["get"], url_path="availability")
+    def availability(self, request, pk=None):
+        venue = self.get_object()
+        start_string = request.GET.get("start")
+        end_string = request.GET.get("end") or start_string
+        if not start_string:
+            return Response({"error": "Missing start date"}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            start_date = datetime.strptime(start_string, "%Y-%m-%d").date()
+            end_date = datetime.strptime(end_string, "%Y-%m-%d").date()
+        except ValueError:
+            return Response({"error": "Invalid date format"}, status=status.HTTP_400_BAD_REQUEST)
+
+        if end_date < start_date:
+            return Response({"error": "End date must not be before start date"}, status=status.HTTP_400_BAD_REQUEST)
+
+        if (end_date - start_date).days + 1 > AVAILABILITY_MAX_RANGE_DAYS:
+            return Response(
+                {"error": f"Date range cannot exceed {AVAILABILITY_MAX_RANGE_DAYS} days"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        include_slots = request.GET.get("detail", "").lower() in {"1", "true", "yes"}
+
+        days = []
+        for business_date, slots in get_availability_range(venue, start_date, end_date):
+            day = {
+                "business_date": business_date.isoformat(),
+                "is_open": bool(slots),
+                "total_slots": len(slots),
+                "free_slots": sum(1 for slot in slots if slot["is_available"]),
             }
-            for slot in slots
+            if include_slots:
+                day["slots"] = [_slot_payload(slot) for slot in slots]
+            days.append(day)
+
+        return Response({"start": start_date.isoformat(), "end": end_date.isoformat(), "days": days})
+
+
+    @action(detail=False, methods=["get"], url_path="free")
+    def free(self, request):
+        """
+            Venues that can take a reservation at date/time (defaults to the current slot),
+            combined with the usual kind/availability filters.
+        """
+        date_string = request.GET.get("date")
+        time_string = request.GET.get("time")
+
+        try:
+            if date_string and time_string:
+                selected_date = datetime.strptime(date_string, "%Y-%m-%d").date()
+                selected_time = datetime.strptime(time_string, "%H:%M").time()
+            elif not date_string and not time_string:
+                current = timezone.localtime()
+                selected_date = current.date()
+                selected_time = current.time().replace(
+                    minute=current.minute - current.minute % SLOT_MINUTES, second=0, microsecond=0
+                )
+            else:
+                return Response({"error": "Provide both date and time, or neither"}, status=status.HTTP_400_BAD_REQUEST)
+        except ValueError:
+            return Response({"error": "Invalid date or time format"}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            free_ids = list(get_free_venue_ids(selected_date, selected_time))
+        except ValueError as exc:
+            return Response({"error": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+
+        venues = _filter_venue_listing(self.get_queryset(), request).filter(id__in=free_ids)
+        results = list(venues.values("id", "name", "kind", "location", "is_full"))
+
+        return Response({
+            "date": selected_date.isoformat(),
+            "time": selected_time.strftime("%H:%M"),
+            "count": len(results),
+            "results": results,
+        })
+
+
+    @action(detail=False, methods=["get"], url_path="map")
+    def venue_map(self, request):
+        """
+            Every venue inside a viewport (bbox=west,south,east,north) or a circle
+            (lat, lng, radius in km), clustered by geohash below the zoom threshold.
+        """
+        venues = _filter_venue_listing(self.get_queryset(), request)
+        bbox_string = request.GET.get("bbox")
+
+        try:
+            zoom = int(request.GET["zoom"]) if request.GET.get("zoom") else None
+            if bbox_string:
+                west, south, east, north = (float(value) for value in bbox_string.split(","))
+                center = None
+            else:
+                center = (float(request.GET["lat"]), float(request.GET["lng"]), float(request.GET["radius"]))
+        except KeyError:
+            return Response({"error": "Provide bbox, or lat, lng and radius"}, status=status.HTTP_400_BAD_REQUEST)
+        except ValueError:
+            return Response({"error": "Invalid map parameters"}, status=status.HTTP_400_BAD_REQUEST)
+
+        if center:
+            latitude, longitude, radius = center
+            if not (-90 <= latitude <= 90 and -180 <= longitude <= 180 and 0 < radius <= MAP_MAX_RADIUS_KM):
+                return Response(
+                    {"error": f"Radius must be between 0 and {MAP_MAX_RADIUS_KM} km around a valid point"},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+            rows = filter_bbox(venues, *radius_bbox(latitude, longitude, radius)).values(
+                "id", "name", "kind", "is_full", "latitude", "longitude"
+            )
+            markers = [_map_marker_payload(row) for row in within_radius(list(rows), latitude, longitude, radius)]
+            return Response({"count": len(markers), "venues": markers})
+
+        if not (-90 <= south <= north <= 90 and -180 <= west <= 180 and -180 <= east <= 180):
+            return Response({"error": "Invalid bbox"}, status=status.HTTP_400_BAD_REQUEST)
+
+        venues = filter_bbox(venues, south, west, north, east)
+        precision = cluster_precision(zoom)
+        if precision is not None:
+            clusters = cluster_venues(venues, precision)
+            return Response({"count": sum(cluster["count"] for cluster in clusters), "clusters": clusters})
+
+        markers = [
+            _map_marker_payload(row)
+            for row in venues.values("id", "name", "kind", "is_full", "latitude", "longitude")
         ]
-        return Response({"business_date": selected_date.isoformat(), "slots": payload})
+        return Response({"count": len(markers), "venues": markers})
 
 
     @action(detail=True, methods=["post"], url_path="reviews", permission_classes=[permissions.IsAuthenticated])
@@ -787,6 +1085,49 @@ class VenueViewSet(viewsets.ReadOnlyModelViewSet):
         )
 
 
+BULK_RESERVATION_LIMIT = 200
+
+# The bulk-* actions, keyed like their single-reservation counterparts:
+# request field -> {requested value: fields written}, and which rows may make the move.
+BULK_STATUS_TRANSITIONS = {
+    "accepted":     {"status": "accepted"},
+    "rejected":     {"status": "rejected"},
+}
+BULK_ARRIVAL_TRANSITIONS = {
+    "checked_in":   {"arrival_status": "checked_in"},
+    "no_show":      {"arrival_status": "no_show"},
+}
+BULK_SEEN_TRANSITIONS = {
+    "seen":         {"seen": True},
+    "unseen":       {"seen": False},
+}
+
+
+def _bulk_targets(data, key):
+    """
+    {id: requested value} from either {"ids": [...], key: value} or
+    {"updates": [{"id": ..., key: value}, ...]}; the value is None when key is None.
+    Raises ValueError/TypeError/KeyError on a malformed body (anything but a JSON object).
+    """
+    if not isinstance(data, dict):
+        raise TypeError("Expected a JSON object")
+    if key and data.get("updates") is not None:
+        if not isinstance(data["updates"], list) or not all(isinstance(item, dict) for item in data["updates"]):
+            raise TypeError("updates must be a list of objects")
+        items = [(item["id"], item.get(key)) for item in data["updates"]]
+    else:
+        ids = data.get("ids")
+        if not isinstance(ids, list):
+            raise ValueError("ids must be a list")
+        value = data.get(key) if key else None
+        items = [(reservation_id, value) for reservation_id in ids]
+
+    return {
+        int(reservation_id): (str(value or "").lower() if key else None)
+        for reservation_id, value in items
+    }
+
+
 class ReservationViewSet(viewsets.ModelViewSet):
     serializer_class    = ReservationSerializer
     permission_classes  = [permissions.IsAuthenticated]
@@ -911,6 +1252,68 @@ class ReservationViewSet(viewsets.ModelViewSet):
         return Response({"reservation": _reservation_payload(reservation)})
 
 
+    def _bulk_transition(self, request, key, transitions, eligible, editor=None):
+        """
+        Applies a bulk-* action: one UPDATE per target state in one transaction, one
+        outbox event per venue. Ids that are not the user's venue's, or not in a state
+        the action applies to, are returned as skipped.
+        """
+        try:
+            targets = _bulk_targets(request.data, key)
+        except (KeyError, TypeError, ValueError):
+            return Response({"detail": "Provide a list of reservation ids."}, status=status.HTTP_400_BAD_REQUEST)
+
+        if not targets:
+            return Response({"detail": "Provide a list of reservation ids."}, status=status.HTTP_400_BAD_REQUEST)
+        if len(targets) > BULK_RESERVATION_LIMIT:
+            return Response(
+                {"detail": f"At most {BULK_RESERVATION_LIMIT} reservations per request."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        if any(value not in transitions for value in targets.values()):
+            return Response({"detail": f"Invalid {key or 'transition'}."}, status=status.HTTP_400_BAD_REQUEST)
+
+        reservations = Reservation.objects.filter(eligible)
+        if not request.user.is_superuser:
+            reservations = reservations.filter(venue__owner=request.user)
+
+        ids_by_value = defaultdict(list)
+        for reservation_id, value in targets.items():
+            ids_by_value[value].append(reservation_id)
+
+        changed = reservations.transition(
+            [(ids, transitions[value]) for value, ids in ids_by_value.items()], editor=editor
+        )
+        changed_ids = {reservation.id for reservation in changed}
+
+        return Response({
+            "updated":  [_reservation_payload(reservation) for reservation in changed],
+            "skipped":  [reservation_id for reservation_id in targets if reservation_id not in changed_ids],
+        })
+
+    @action(detail=False, methods=["post"], url_path="bulk-status")
+    def bulk_update_status(self, request):
+        return self._bulk_transition(
+            request, "status", BULK_STATUS_TRANSITIONS, Q(status="pending"), editor=request.user
+        )
+
+    @action(detail=False, methods=["post"], url_path="bulk-arrival")
+    def bulk_update_arrival(self, request):
+        return self._bulk_transition(
+            request, "arrival_status", BULK_ARRIVAL_TRANSITIONS, Q(status="accepted"), editor=request.user
+        )
+
+    @action(detail=False, methods=["post"], url_path="bulk-move-to-requests")
+    def bulk_move_to_requests(self, request):
+        return self._bulk_transition(
+            request, None, {None: {"status": "pending", "arrival_status": "pending"}},
+            ~Q(status="pending") | ~Q(arrival_status="pending"), editor=request.user,
+        )
+
+    @action(detail=False, methods=["post"], url_path="bulk-seen")
+    def bulk_update_seen(self, request):
+        return self._bulk_transition(request, "state", BULK_SEEN_TRANSITIONS, Q())
+
     @action(detail=True, methods=["get"], url_path="details")
     def reservation_details(self, request, pk=None):
         
@@ -940,48 +1343,43 @@ class ReservationViewSet(viewsets.ModelViewSet):
 
 def group_venues(venues):
     return {
-        "cafe_bar": [v for v in venues if v.kind in ["cafe", "bar"]],
-        "restaurants": [v for v in venues if v.kind == "restaurant"],
-        "beach_bar": [v for v in venues if v.kind == "beach_bar"],
-        "other": [v for v in venues if v.kind == "other"],
+        "cafe_bar": [v for v in venues if v["kind"] in ["cafe", "bar"]],
+        "restaurants": [v for v in venues if v["kind"] == "restaurant"],
+        "beach_bar": [v for v in venues if v["kind"] == "beach_bar"],
+        "other": [v for v in venues if v["kind"] == "other"],
     }
 
 class VenueListAPI(APIView):
     permission_classes = [permissions.AllowAny]
 
     def get(self, request):
-        kind = request.GET.get("kind")
-        availability = request.GET.get("availability")
-
-        venues = Venue.objects.all().order_by("name")
-
-        # kind filter
-        if kind:
-            if kind == "cafe":
-                venues = venues.filter(kind__in=["cafe", "bar"])
-            else:
-                venues = venues.filter(kind=kind)
-
-        # availability filter
-        if availability == "available":
-            venues = venues.filter(is_full=False)
-        elif availability == "full":
-            venues = venues.filter(is_full=True)
+        def build():
+            venues = VenueSerializer.prefetch(_filter_venue_listing(Venue.objects.all().order_by("name"), request))
 
-        # pagination
-        paginator = PageNumberPagination()
-        paginator.page_size = 12
+            # pagination
+            paginator = PageNumberPagination()
+            paginator.page_size = 12
 
-        result_page = paginator.paginate_queryset(venues, request)
+            result_page = paginator.paginate_queryset(venues, request)
 
-        serializer = VenueSerializer(result_page, many=True)
+            serializer = VenueSerializer(result_page, many=True)
 
-        grouped = group_venues(serializer.data)
+            grouped = group_venues(serializer.data)
 
-        return Response({
-            "count": paginator.page.paginator.count,
-            "next": paginator.get_next_link(),
-            "previous": paginator.get_previous_link(),
-            "results": grouped,
-            "upcoming_reservation": _upcoming_reservation_payload(request),
-        })
+            data = {
+                "count": paginator.page.paginator.count,
+                "next": paginator.get_next_link(),
+                "previous": paginator.get_previous_link(),
+                "results": grouped,
+                "upcoming_reservation": _upcoming_reservation_payload(request),
+            }
+            return data, [venue.id for venue in result_page]
+
+        parts = {
+            "endpoint": "venue-list-api",
+            "host": request.get_host(),
+            "kind": request.GET.get("kind", ""),
+            "availability": request.GET.get("availability", ""),
+            "page": request.GET.get("page", ""),
+        }
+        return _cached_listing_response(request, parts, build)
@@ -0,0 +1,37 @@
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+
+from venues.services.rollups import backfill_rollups
+from venues.utils import get_today
+
+
+class Command(BaseCommand):
+    help = "Rebuild the hourly and daily venue activity rollups from the raw visit and reservation rows."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--days", type=int, default=365 * 3, help="Rebuild this many days up to today.")
+        parser.add_argument("--start", help="First local date to rebuild (YYYY-MM-DD). Overrides --days.")
+        parser.add_argument("--end", help="Last local date to rebuild (YYYY-MM-DD). Defaults to today.")
+
+    @staticmethod
+    def _parse_date(value):
+        try:
+            return date.fromisoformat(value)
+        except ValueError as exc:
+            raise CommandError(f"Invalid date {value!r}, expected YYYY-MM-DD.") from exc
+
+    def handle(self, *args, **options):
+        last_day = self._parse_date(options["end"]) if options["end"] else get_today()
+        if options["start"]:
+            first_day = self._parse_date(options["start"])
+        else:
+            first_day = last_day - timedelta(days=options["days"] - 1)
+
+        if first_day > last_day:
+            raise CommandError("--start must not be after --end.")
+
+        written = backfill_rollups(first_day, last_day)
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt rollups for {first_day} .. {last_day}: {written} hourly rows."
+        ))
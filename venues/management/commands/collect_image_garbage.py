@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from venues.services.images import collect_garbage
+
+
+class Command(BaseCommand):
+    help = "Delete approved image deletions and stored image files no row references any more."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--grace-seconds",
+            type=int,
+            default=None,
+            help="Keep unreferenced files younger than this (defaults to IMAGE_GC_GRACE_SECONDS).",
+        )
+
+    def handle(self, *args, **options):
+        if options["grace_seconds"] is not None and options["grace_seconds"] < 0:
+            raise CommandError("--grace-seconds must not be negative.")
+
+        rows, files = collect_garbage(options["grace_seconds"])
+        self.stdout.write(self.style.SUCCESS(f"Deleted {rows} image rows and {files} unreferenced files."))
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from venues.services.rollups import compact_visits, visit_retention_cutoff
+
+
+class Command(BaseCommand):
+    help = "Roll up and delete raw venue visits older than the retention window."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--months",
+            type=int,
+            default=None,
+            help="Keep this many whole months of raw visits (defaults to VISIT_RETENTION_MONTHS).",
+        )
+        parser.add_argument("--max-days", type=int, default=None, help="Stop after compacting this many days.")
+
+    def handle(self, *args, **options):
+        months = options["months"]
+        if months is not None and months <= 0:
+            raise CommandError("--months must be a positive number.")
+
+        cutoff = visit_retention_cutoff(months)
+        if cutoff is None:
+            self.stdout.write("Visit retention is disabled (VISIT_RETENTION_MONTHS <= 0).")
+            return
+
+        days, deleted = compact_visits(months, options["max_days"])
+        self.stdout.write(self.style.SUCCESS(
+            f"Compacted {days} days before {cutoff:%Y-%m-%d}: {deleted} raw visits deleted."
+        ))
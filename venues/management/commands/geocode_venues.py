@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from venues.models import GeocodedAddress
+from venues.services.geocoding import geocode_pending_venues
+
+
+class Command(BaseCommand):
+    help = "Geocode venues that have a location but no coordinates (rate limited, cached)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--limit", type=int, default=None, help="Look at no more than this many venues.")
+        parser.add_argument(
+            "--retry-not-found",
+            action="store_true",
+            help="Ask the geocoder again for addresses it could not resolve before.",
+        )
+
+    def handle(self, *args, **options):
+        if options["limit"] is not None and options["limit"] <= 0:
+            raise CommandError("--limit must be a positive number.")
+
+        if options["retry_not_found"]:
+            deleted, _ = GeocodedAddress.objects.filter(latitude__isnull=True).delete()
+            self.stdout.write(f"Forgot {deleted} addresses without a match.")
+
+        geocoded, attempted = geocode_pending_venues(options["limit"])
+        self.stdout.write(self.style.SUCCESS(f"Geocoded {geocoded} of {attempted} venues without coordinates."))
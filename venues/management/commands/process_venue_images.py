@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from venues.models import VenueImage, VenueMenuImage
+from venues.services.images import process_pending_images
+
+
+class Command(BaseCommand):
+    help = "Generate the WebP renditions of pending venue and menu images."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--backfill",
+            action="store_true",
+            help="Also queue images stored before renditions existed.",
+        )
+        parser.add_argument("--batch-size", type=int, default=None, help="Images encoded per batch.")
+
+    def handle(self, *args, **options):
+        if options["batch_size"] is not None and options["batch_size"] <= 0:
+            raise CommandError("--batch-size must be a positive number.")
+
+        if options["backfill"]:
+            for model_cls in (VenueImage, VenueMenuImage):
+                model_cls.objects.filter(renditions={}).exclude(image="").update(needs_processing=True)
+
+        processed = process_pending_images(options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"Processed {processed} images."))
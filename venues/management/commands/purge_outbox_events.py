@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from venues.services.outbox import purge_sent_events
+
+
+class Command(BaseCommand):
+    help = "Delete sent reservation outbox events older than the retention window."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days",
+            type=int,
+            default=None,
+            help="Keep sent events this many days (defaults to OUTBOX_RETENTION_DAYS).",
+        )
+        parser.add_argument("--batch-size", type=int, default=None, help="Rows deleted per statement.")
+
+    def handle(self, *args, **options):
+        if options["days"] is not None and options["days"] < 0:
+            raise CommandError("--days must not be negative.")
+        if options["batch_size"] is not None and options["batch_size"] <= 0:
+            raise CommandError("--batch-size must be a positive number.")
+
+        deleted = purge_sent_events(options["days"], options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} sent outbox events."))
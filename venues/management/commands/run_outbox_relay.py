@@ -0,0 +1,34 @@
+import os
+import signal
+
+from django.core.management.base import BaseCommand, CommandError
+
+from venues.services.outbox_relay import run_relay
+
+
+class Command(BaseCommand):
+    help = (
+        "Deliver reservation outbox events as soon as they are inserted (PostgreSQL LISTEN/NOTIFY). "
+        "Run it alongside the Celery workers with OUTBOX_RELAY_ENABLED=True."
+    )
+
+    def handle(self, *args, **options):
+        stopping = []
+        read_fd, write_fd = os.pipe()
+
+        def stop(signum, frame):
+            stopping.append(signum)
+            os.write(write_fd, b"x")    # wakes the relay out of its select()
+
+        signal.signal(signal.SIGTERM, stop)
+        signal.signal(signal.SIGINT, stop)
+
+        try:
+            run_relay(should_stop=lambda: bool(stopping), wakeup_fd=read_fd)
+        except RuntimeError as exc:
+            raise CommandError(str(exc)) from exc
+        finally:
+            os.close(read_fd)
+            os.close(write_fd)
+
+        self.stdout.write("Outbox relay stopped.")
@@ -0,0 +1,56 @@
+from django.db import migrations, models
+
+
+# Frozen copy of venues.services.geo.encode_geohash as of this migration.
+GEOHASH_ALPHABET = "0123456789bcdefghjkmnpqrstuvwxyz"
+
+
+def encode_geohash(latitude, longitude, precision=9):
+    latitude, longitude = float(latitude), float(longitude)
+    lat_range, lng_range = [-90.0, 90.0], [-180.0, 180.0]
+
+    chars, bits, bit_count, even = [], 0, 0, True
+    while len(chars) < precision:
+        value, interval = (longitude, lng_range) if even else (latitude, lat_range)
+        middle = (interval[0] + interval[1]) / 2
+        if value >= middle:
+            bits = bits << 1 | 1
+            interval[0] = middle
+        else:
+            bits <<= 1
+            interval[1] = middle
+
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            chars.append(GEOHASH_ALPHABET[bits])
+            bits, bit_count = 0, 0
+
+    return "".join(chars)
+
+
+def populate_geohash(apps, schema_editor):
+    Venue = apps.get_model("venues", "Venue")
+
+    venues = []
+    for venue in Venue.objects.exclude(latitude=None).exclude(longitude=None).iterator():
+        venue.geohash = encode_geohash(venue.latitude, venue.longitude)
+        venues.append(venue)
+
+    Venue.objects.bulk_update(venues, ["geohash"], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("venues", "0007_reservation_special_request_fields"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="venue",
+            name="geohash",
+            field=models.CharField(blank=True, db_index=True, default="", editable=False, max_length=12),
+        ),
+        migrations.RunPython(populate_geohash, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2 on 2026-10-18 01:31
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('venues', '0008_venue_geohash'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='venuevisit',
+            name='timestamp',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False),
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.2 on 2026-10-18 01:34
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('venues', '0009_venuevisit_timestamp_default'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VenueDailyActivity',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('visits', models.PositiveIntegerField(default=0)),
+                ('reservations', models.PositiveIntegerField(default=0)),
+                ('venue', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_activity', to='venues.venue')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('venue', 'date'), name='uniq_venue_daily_activity')],
+            },
+        ),
+        migrations.CreateModel(
+            name='VenueHourlyActivity',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('hour', models.DateTimeField()),
+                ('visits', models.PositiveIntegerField(default=0)),
+                ('reservations', models.PositiveIntegerField(default=0)),
+                ('venue', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='hourly_activity', to='venues.venue')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('venue', 'hour'), name='uniq_venue_hourly_activity')],
+            },
+        ),
+    ]
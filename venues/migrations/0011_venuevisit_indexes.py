@@ -0,0 +1,23 @@
+# Generated by Django 5.2 on 2026-10-18 01:35
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('venues', '0010_venue_activity_rollups'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='venuevisit',
+            index=models.Index(fields=['venue', 'timestamp'], name='venuevisit_venue_ts_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='venuevisit',
+            index=models.Index(fields=['timestamp'], name='venuevisit_ts_idx'),
+        ),
+    ]
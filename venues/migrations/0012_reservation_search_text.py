@@ -0,0 +1,67 @@
+import re
+
+from django.db import migrations, models
+
+
+BATCH_SIZE = 500
+
+# Frozen copies of venues.services.search as of this migration.
+TRIGRAM_INDEX_NAME = "reservation_search_trgm_idx"
+
+
+def build_search_text(firstname, lastname, email, phone):
+    words = [firstname, lastname, email, phone, re.sub(r"\D", "", phone or "")]
+    return " " + " ".join(word.strip().lower() for word in words if word and word.strip())
+
+
+def populate_search_text(apps, schema_editor):
+    Reservation = apps.get_model("venues", "Reservation")
+
+    # Written back every BATCH_SIZE rows so memory stays flat however big the table is.
+    reservations = []
+    queryset = Reservation.objects.only("id", "firstname", "lastname", "email", "phone").order_by("id")
+    for reservation in queryset.iterator(chunk_size=BATCH_SIZE):
+        reservation.search_text = build_search_text(
+            reservation.firstname, reservation.lastname, reservation.email, reservation.phone
+        )
+        reservations.append(reservation)
+        if len(reservations) >= BATCH_SIZE:
+            Reservation.objects.bulk_update(reservations, ["search_text"])
+            reservations = []
+
+    if reservations:
+        Reservation.objects.bulk_update(reservations, ["search_text"])
+
+
+def create_trigram_index(apps, schema_editor):
+    # Other backends (SQLite in tests) keep the plain LIKE scan.
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    schema_editor.execute(
+        f"CREATE INDEX IF NOT EXISTS {TRIGRAM_INDEX_NAME} "
+        "ON venues_reservation USING gin (search_text gin_trgm_ops)"
+    )
+
+
+def drop_trigram_index(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute(f"DROP INDEX IF EXISTS {TRIGRAM_INDEX_NAME}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("venues", "0011_venuevisit_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="reservation",
+            name="search_text",
+            field=models.CharField(blank=True, default="", editable=False, max_length=512),
+        ),
+        migrations.RunPython(populate_search_text, migrations.RunPython.noop),
+        migrations.RunPython(create_trigram_index, drop_trigram_index),
+    ]
@@ -0,0 +1,37 @@
+from django.db import migrations, models
+
+
+DELIVERED_WEBSOCKET = 1
+DELIVERED_EMAIL = 2
+
+
+def move_delivery_state(apps, schema_editor):
+    # Unsent rows kept their per-channel progress in payload["delivery_state"].
+    ReservationOutboxEvent = apps.get_model("venues", "ReservationOutboxEvent")
+
+    events = []
+    for event in ReservationOutboxEvent.objects.exclude(status="sent").iterator():
+        delivery_state = (event.payload or {}).pop("delivery_state", None) or {}
+        event.delivered = (
+            (DELIVERED_WEBSOCKET if delivery_state.get("websocket_sent") else 0)
+            | (DELIVERED_EMAIL if delivery_state.get("email_sent") else 0)
+        )
+        events.append(event)
+
+    ReservationOutboxEvent.objects.bulk_update(events, ["delivered", "payload"], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("venues", "0013_reservation_hot_path_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="reservationoutboxevent",
+            name="delivered",
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.RunPython(move_delivery_state, migrations.RunPython.noop),
+    ]
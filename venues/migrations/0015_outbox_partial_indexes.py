@@ -0,0 +1,29 @@
+# Generated by Django 5.2 on 2026-10-18 01:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('venues', '0014_outbox_delivered_bitmap'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='reservationoutboxevent',
+            name='venues_rese_status_4f1bd7_idx',
+        ),
+        migrations.AddIndex(
+            model_name='reservationoutboxevent',
+            index=models.Index(condition=models.Q(('status__in', ['pending', 'failed'])), fields=['next_retry_at'], name='outbox_due_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reservationoutboxevent',
+            index=models.Index(condition=models.Q(('status', 'processing')), fields=['updated_at'], name='outbox_processing_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reservationoutboxevent',
+            index=models.Index(condition=models.Q(('status', 'sent')), fields=['sent_at'], name='outbox_sent_idx'),
+        ),
+    ]
@@ -0,0 +1,43 @@
+from django.db import migrations
+
+# Frozen copy of venues.services.outbox_relay.NOTIFY_CHANNEL as of this migration.
+NOTIFY_CHANNEL = "reservation_outbox"
+
+
+def create_notify_trigger(apps, schema_editor):
+    # Statement-level: one NOTIFY per INSERT, delivered when the transaction commits.
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute(
+        f"""
+        CREATE OR REPLACE FUNCTION venues_outbox_notify() RETURNS trigger AS $$
+        BEGIN
+            PERFORM pg_notify('{NOTIFY_CHANNEL}', '');
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+        """
+    )
+    schema_editor.execute("DROP TRIGGER IF EXISTS venues_outbox_notify ON venues_reservationoutboxevent")
+    schema_editor.execute(
+        "CREATE TRIGGER venues_outbox_notify AFTER INSERT ON venues_reservationoutboxevent "
+        "FOR EACH STATEMENT EXECUTE FUNCTION venues_outbox_notify()"
+    )
+
+
+def drop_notify_trigger(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute("DROP TRIGGER IF EXISTS venues_outbox_notify ON venues_reservationoutboxevent")
+    schema_editor.execute("DROP FUNCTION IF EXISTS venues_outbox_notify()")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("venues", "0015_outbox_partial_indexes"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_notify_trigger, drop_notify_trigger),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2 on 2026-10-18 01:48
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('venues', '0016_outbox_notify_trigger'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='reservationoutboxevent',
+            name='reservation',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='outbox_events', to='venues.reservation'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2 on 2026-10-18 01:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('venues', '0017_outbox_batch_events'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='venueimage',
+            name='needs_processing',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='venueimage',
+            name='renditions',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AddField(
+            model_name='venuemenuimage',
+            name='needs_processing',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='venuemenuimage',
+            name='renditions',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
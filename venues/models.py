@@ -1,3 +1,4 @@
+import hashlib
 import logging
 import os
 
@@ -15,7 +16,8 @@ from django.contrib.auth.models         import Permission
 from django.contrib.contenttypes.models import ContentType
 #from emails_manager.utils               import send_verification_code
 from django.db.models                   import JSONField  # Django 3.1+ has models.JSONField; import whichever is appropriate
-from .utils                             import get_coords_nominatim, convert_image_to_webp
+from .services.geo                      import encode_geohash
+from .services.search                   import build_search_text
 from django.core.exceptions             import ValidationError
 
 
@@ -39,6 +41,7 @@ class Venue(models.Model):
     is_full             = models.BooleanField(default=False)
     latitude            = models.DecimalField(max_digits=18, decimal_places=12, blank=True, null=True)
     longitude           = models.DecimalField(max_digits=18, decimal_places=12, blank=True, null=True)
+    geohash             = models.CharField(max_length=12, blank=True, default="", db_index=True, editable=False)
     email               = models.EmailField(null=True, blank=True)   
     phone               = models.CharField(max_length=20, blank=True)
     owner               = models.ForeignKey(
@@ -54,6 +57,16 @@ class Venue(models.Model):
 
     def __str__(self):
         return self.name
+
+    def save(self, *args, **kwargs):
+        # Keep the map index column in step with the coordinates.
+        self.geohash = encode_geohash(self.latitude, self.longitude)
+
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and {"latitude", "longitude"} & set(update_fields):
+            kwargs["update_fields"] = {*update_fields, "geohash"}
+
+        super().save(*args, **kwargs)
     
     def has_overlapping_reservation(self, date, start_time, duration_hours=1, user=None):
         start_dt = datetime.combine(date, start_time)
@@ -114,6 +127,16 @@ class Venue(models.Model):
         return minutes // step_minutes    # In your Venue model
 
     def get_available_time_slots(self, date):
+        """
+        Returns the 30-min slots for the selected *business date*, served by the cached
+        availability engine (venues.services.availability). Same shape as
+        compute_available_time_slots(), which remains the database-backed reference.
+        """
+        from .services.availability import get_available_time_slots
+
+        return get_available_time_slots(self, date)
+
+    def compute_available_time_slots(self, date):
         """
         Returns computed 30-min slots for the selected *business date* (the day the user clicked).
 
@@ -289,6 +312,10 @@ class VenueClosedTime(models.Model):
         ]
         ordering = ["date", "time"]
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._original_date = self.__dict__.get("date") # Store initial date so moved exceptions refresh both days
+
 ###########################################################################################
 
 ###########################################################################################
@@ -332,15 +359,34 @@ class Review(models.Model):
 
 @receiver(post_save, sender=Venue)
 def update_venue_coordinates(sender, instance, created, **kwargs):
-    # Only fetch if latitude or longitude are missing and location is set
+    # Only fetch if latitude or longitude are missing and location is set; the lookup runs
+    # on the geocoding queue once the venue is committed, see services/geocoding.py.
     if instance.location and (instance.latitude is None or instance.longitude is None):
-        lat, lon = get_coords_nominatim(instance.location)
-        if lat and lon:
-            # Update instance with fetched coordinates
-            instance.latitude = lat
-            instance.longitude = lon
-            # Avoid recursion by updating without sending signal again
-            Venue.objects.filter(pk=instance.pk).update(latitude=lat, longitude=lon)
+        from .services.geocoding import schedule_geocoding
+
+        transaction.on_commit(lambda venue_id=instance.pk: schedule_geocoding(venue_id), robust=True)
+
+
+class GeocodedAddress(models.Model):
+    """
+    Persistent geocoder cache keyed by normalized address. Addresses the geocoder could not
+    resolve are kept too (no coordinates), with a shorter lifetime.
+    """
+    query               = models.CharField(max_length=255, unique=True)
+    latitude            = models.DecimalField(max_digits=18, decimal_places=12, blank=True, null=True)
+    longitude           = models.DecimalField(max_digits=18, decimal_places=12, blank=True, null=True)
+    fetched_at          = models.DateTimeField(default=timezone.now)
+    expires_at          = models.DateTimeField(db_index=True)
+
+    class Meta:
+        verbose_name_plural = "Geocoded addresses"
+
+    @property
+    def found(self):
+        return self.latitude is not None and self.longitude is not None
+
+    def __str__(self):
+        return f"{self.query} -> {self.latitude}, {self.longitude}" if self.found else f"{self.query} -> not found"
 
 ###########################################################################################
 
@@ -365,11 +411,54 @@ class ReservationQuerySet(models.QuerySet):
         now = timezone.now()
         today = now.date()
         now_time = now.time()
-        # Reservations after today OR today and time >= now
-        return self.filter(
-            Q(date__gt=today) |
-            Q(date=today, time__gte=now_time)
-        )
+        # Reservations after today OR today and time >= now, written as one date range so
+        # the (user|venue, date, time) indexes apply.
+        return self.filter(date__gte=today).exclude(date=today, time__lt=now_time)
+
+    def update(self, **kwargs):
+        """
+            Like QuerySet.update(), but when a tracked field changes it has the same effects
+            as saving each row: one outbox event per changed reservation (written with a
+            single INSERT), dashboard counters and availability. Costs one SELECT before and
+            one after the UPDATE.
+        """
+        fields = {self.model._meta.get_field(name).attname for name in kwargs}
+        if not fields & set(Reservation.TRACKED_FIELDS):
+            return super().update(**kwargs)
+        return self._tracked_update([(self, kwargs)])[0]
+
+    def transition(self, updates, editor=None):
+        """
+            Bulk host actions: applies each (pks, fields) of `updates` to the matching rows
+            of this queryset with one UPDATE, all in one transaction, and announces every
+            changed row in a single outbox event per venue. Returns the changed reservations.
+        """
+        return self._tracked_update(
+            [(self.filter(pk__in=pks), fields) for pks, fields in updates], editor=editor, batched=True
+        )[1]
+
+    def _tracked_update(self, updates, editor=None, batched=False):
+        from .signals import reservations_updated
+
+        now = timezone.now()    # update() skips auto_now, the outbox keys on updated_at
+        count, changed = 0, []
+        with transaction.atomic(using=self.db):
+            for queryset, kwargs in updates:
+                fields = {self.model._meta.get_field(name).attname for name in kwargs}
+                before = {reservation.pk: reservation for reservation in queryset.select_for_update()}
+                count += models.QuerySet.update(queryset, **{"updated_at": now, **kwargs})
+                after = self.model._base_manager.using(self.db).filter(pk__in=list(before)).select_related("venue")
+
+                for reservation in after:
+                    old = before[reservation.pk]._loaded_values
+                    if any(old[field] != reservation._loaded_values[field] for field in Reservation.TRACKED_FIELDS):
+                        reservation._track_change(old, fields)
+                        reservation._editor = editor
+                        changed.append(reservation)
+
+            reservations_updated(changed, batched=batched)
+
+        return count, changed
 
 class ReservationManager(models.Manager):
     def get_queryset(self):
@@ -379,6 +468,11 @@ class ReservationManager(models.Manager):
         return self.get_queryset().upcoming()
 
 class Reservation(models.Model):
+    # Snapshotted when a row is loaded, so saves can tell what changed without re-reading it.
+    TRACKED_FIELDS = ('venue_id', 'date', 'time', 'guests', 'status', 'arrival_status', 'seen')
+    # The subset reported as changes in notifications.
+    CHANGE_FIELDS  = ('date', 'time', 'guests', 'status', 'arrival_status')
+
     STATUS_CHOICES = [
         ('pending',     'Pending'),
         ('accepted',    'Accepted'),
@@ -424,6 +518,7 @@ class Reservation(models.Model):
     smoking             = models.BooleanField(default=False)
     objects             = ReservationManager() 
     seen                = models.BooleanField(default=False) # For owner dashboard: has the owner seen this reservation in their dashboard yet?
+    search_text         = models.CharField(max_length=512, blank=True, default='', editable=False) # Dashboard search column, see services/search.py
 
     def __str__(self):
         return f"{self.full_name} - {self.date} at {self.time} ({self.venue.name})"
@@ -444,8 +539,35 @@ class Reservation(models.Model):
             self.arrival_status = 'pending'
 
         self.special_requests = self.has_any_special_request()
+        self.search_text = build_search_text(self.firstname, self.lastname, self.email, self.phone)
+
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and {"firstname", "lastname", "email", "phone"} & set(update_fields):
+            kwargs["update_fields"] = {*update_fields, "search_text"}
         
         super().save(*args, **kwargs)
+        self._snapshot_tracked()
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._snapshot_tracked()
+        return instance
+
+    def _snapshot_tracked(self):
+        # Deferred fields are left out; detect_reservation_changes then falls back to a query.
+        self._loaded_values = {field: self.__dict__[field] for field in self.TRACKED_FIELDS if field in self.__dict__}
+
+    def _track_change(self, old_values, fields=None):
+        """
+            Records what a write changed, for the post_save receivers: `old_values` is the
+            tracked snapshot from before it, `fields` the attnames written (None = all).
+        """
+        self._written_fields = fields
+        self._old_counts_values = old_values
+        self._old_values = {
+            field: old_values[field] for field in self.CHANGE_FIELDS if fields is None or field in fields
+        }
 
     def has_any_special_request(self):
         return any(
@@ -489,6 +611,22 @@ class Reservation(models.Model):
                 name='unique_user_reservation_per_slot'
             )
         ]
+        indexes = [
+            # Slot masks and the dashboard buckets (date, time ordering, history read backwards).
+            models.Index(fields=['venue', 'date', 'time'], name='reservation_venue_slot_idx'),
+            # Arrivals bucket and the bucket counts: status IN (...) AND date >= today.
+            models.Index(fields=['venue', 'status', 'date'], name='reservation_venue_status_idx'),
+            # Requests bucket: only the (few) pending rows.
+            models.Index(
+                fields=['venue', 'date', 'time'],
+                condition=Q(status='pending'),
+                name='reservation_pending_idx',
+            ),
+            # Reservation.objects.upcoming() and the user's next reservation.
+            models.Index(fields=['user', 'date', 'time'], name='reservation_user_slot_idx'),
+            # Activity rollups rebuild by created_at range across venues.
+            models.Index(fields=['created_at'], name='reservation_created_idx'),
+        ]
 
 
 class ReservationOutboxEvent(models.Model):
@@ -514,10 +652,25 @@ class ReservationOutboxEvent(models.Model):
         (STATUS_FAILED,     'Failed'),
     ]
 
+    # A host action on many reservations: payload["events"] holds one reservation.* payload each.
+    EVENT_BATCH = 'reservation.batch'
+
+    # Bits of `delivered`: which channels of this event have gone out already.
+    DELIVERED_WEBSOCKET = 1
+    DELIVERED_EMAIL     = 2
+
+    CHANNEL_BITS = {
+        CHANNEL_WEBSOCKET:  DELIVERED_WEBSOCKET,
+        CHANNEL_EMAIL:      DELIVERED_EMAIL,
+        CHANNEL_BOTH:       DELIVERED_WEBSOCKET | DELIVERED_EMAIL,
+    }
+
     reservation = models.ForeignKey(
         'Reservation',
         on_delete=models.CASCADE,
         related_name='outbox_events',
+        null=True,
+        blank=True,     # batched events (EVENT_BATCH) cover several reservations
     )
     venue = models.ForeignKey(
         'Venue',
@@ -527,6 +680,7 @@ class ReservationOutboxEvent(models.Model):
     event_type      = models.CharField(max_length=64)
     channel         = models.CharField(max_length=16, choices=CHANNEL_CHOICES, default=CHANNEL_BOTH)
     payload         = models.JSONField(default=dict)
+    delivered       = models.PositiveSmallIntegerField(default=0)  # DELIVERED_* bitmap
     idempotency_key = models.CharField(max_length=255, unique=True)
     status          = models.CharField(max_length=16, choices=STATUS_CHOICES, default=STATUS_PENDING)
     attempts        = models.PositiveIntegerField(default=0)
@@ -539,10 +693,36 @@ class ReservationOutboxEvent(models.Model):
     class Meta:
         ordering = ['created_at']
         indexes = [
-            models.Index(fields=['status', 'next_retry_at']),
             models.Index(fields=['venue', 'created_at']),
+            # Partial indexes: the sweeper and the purge job only ever look at a small,
+            # bounded slice of the table, so their indexes exclude everything else.
+            models.Index(
+                fields=['next_retry_at'],
+                condition=Q(status__in=['pending', 'failed']),
+                name='outbox_due_idx',
+            ),
+            models.Index(
+                fields=['updated_at'],
+                condition=Q(status='processing'),
+                name='outbox_processing_idx',
+            ),
+            models.Index(
+                fields=['sent_at'],
+                condition=Q(status='sent'),
+                name='outbox_sent_idx',
+            ),
         ]
 
+    def needs(self, bit):
+        """True while the channel `bit` belongs to this event and has not been delivered."""
+        return bool(self.CHANNEL_BITS.get(self.channel, 0) & bit & ~self.delivered)
+
+    def messages(self):
+        """The per-reservation payloads this event delivers."""
+        if self.event_type == self.EVENT_BATCH:
+            return list(self.payload.get("events") or [])
+        return [self.payload]
+
 ###########################################################################################
 
 ###########################################################################################
@@ -599,12 +779,58 @@ class VenueVisit(models.Model):
     user            = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True)
     session_key     = models.CharField(max_length=40, blank=True, null=True)
     ip_address      = models.GenericIPAddressField(blank=True, null=True)
-    timestamp       = models.DateTimeField(auto_now_add=True)
+    timestamp       = models.DateTimeField(default=timezone.now, editable=False)   # set explicitly by batched inserts
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['venue', 'timestamp'], name='venuevisit_venue_ts_idx'),
+            models.Index(fields=['timestamp'], name='venuevisit_ts_idx'),     # rollup and retention range scans
+        ]
 
     def __str__(self):
         if self.user:
             return f"{self.user.username} visited {self.venue.name} at {self.timestamp}"
         return f"Anonymous visit to {self.venue.name} at {self.timestamp}"
+
+###########################################################################################
+
+###########################################################################################
+class VenueHourlyActivity(models.Model):
+    """
+        Visits and new reservations per venue and UTC hour, rebuilt from the raw tables by
+        venues.services.rollups.
+    """
+    venue           = models.ForeignKey(Venue, on_delete=models.CASCADE, related_name='hourly_activity')
+    hour            = models.DateTimeField()
+    visits          = models.PositiveIntegerField(default=0)
+    reservations    = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['venue', 'hour'], name='uniq_venue_hourly_activity'),
+        ]
+
+    def __str__(self):
+        return f"{self.venue_id} @ {self.hour:%Y-%m-%d %H:00}: {self.visits} visits, {self.reservations} reservations"
+
+
+class VenueDailyActivity(models.Model):
+    """
+        Per-venue daily totals (local dates) summed from VenueHourlyActivity. Dashboard
+        analytics read these instead of scanning VenueVisit / Reservation.
+    """
+    venue           = models.ForeignKey(Venue, on_delete=models.CASCADE, related_name='daily_activity')
+    date            = models.DateField()
+    visits          = models.PositiveIntegerField(default=0)
+    reservations    = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['venue', 'date'], name='uniq_venue_daily_activity'),
+        ]
+
+    def __str__(self):
+        return f"{self.venue_id} @ {self.date}: {self.visits} visits, {self.reservations} reservations"
     
 def assign_venue_permissions(user):
     content_type = ContentType.objects.get_for_model(Venue)
@@ -697,10 +923,20 @@ class VenueUpdateRequest(models.Model):
 ###########################################################################################
 
 ###########################################################################################
+IMAGE_STORE_PREFIX = "images"
+
+def content_addressed_path(content_hash, suffix):
+    """images/ab/abcdef…{suffix}: one file per distinct content, shared by every row that has it."""
+    return f"{IMAGE_STORE_PREFIX}/{content_hash[:2]}/{content_hash}{suffix}"
+
 def venue_image_upload(instance, filename):
+    if instance.content_hash:
+        return content_addressed_path(instance.content_hash, os.path.splitext(filename)[1].lower())
     return f"venues/{instance.venue.id}/images/{filename}"
 
 def menu_image_upload(instance, filename):
+    if instance.content_hash:
+        return content_addressed_path(instance.content_hash, os.path.splitext(filename)[1].lower())
     return f"venues/{instance.venue.id}/menu/{filename}"
 
 ###########################################################################################
@@ -708,11 +944,18 @@ def menu_image_upload(instance, filename):
 ###########################################################################################
 class BaseWebpImageModel(models.Model):
     """
-    Abstract base model that ensures images are converted to webp only if changed.
+    Abstract base model for venue images. Uploads are stored as they are and converted
+    later: a Celery worker replaces them with WebP renditions (see services/images.py).
     Child models must declare their own `image = models.ImageField(upload_to=...)`.
     """
     image = models.ImageField(upload_to="")  # overridden by children
 
+    # {"thumb": path, "card": path, "full": path}; empty until the upload is processed.
+    renditions          = models.JSONField(default=dict, blank=True)
+    needs_processing    = models.BooleanField(default=False)
+    # sha256 of the uploaded bytes; rows with the same hash share their stored files.
+    content_hash        = models.CharField(max_length=64, blank=True, default="", db_index=True)
+
     class Meta:
         abstract = True
 
@@ -730,6 +973,10 @@ class BaseWebpImageModel(models.Model):
         if not self.image:
             return False
 
+        # Case 0: Fresh upload (not in storage yet) → convert, whatever its name
+        if not self.image._committed:
+            return True
+
         new_name = os.path.basename(self.image.name)
         old_name = os.path.basename(self._original_image_name or "")
 
@@ -747,24 +994,99 @@ class BaseWebpImageModel(models.Model):
 
         return True
 
-    def convert_and_save_webp(self):
-        # Keep original directory (relative path)
-        original_path = self.image.name  # e.g. "venues/2/abc.jpg"
-        dir_name = os.path.dirname(original_path)
-        base_name = os.path.splitext(os.path.basename(original_path))[0]
+    def hash_upload(self):
+        digest = hashlib.sha256()
+        for chunk in self.image.chunks():
+            digest.update(chunk)
+        self.image.seek(0)
+        self.content_hash = digest.hexdigest()
 
-        webp_file = convert_image_to_webp(self.image)
-        new_name = os.path.join(dir_name, f"{base_name}.webp") if dir_name else f"{base_name}.webp"
+    @staticmethod
+    def stored_copies(content_hashes):
+        """
+        {content_hash: a processed row of either image model holding those bytes}; one
+        query per model. Unprocessed rows are left out: their raw upload is deleted once
+        it is converted, possibly before a row copying its name commits.
+        """
+        copies = {}
+        for model_cls in (VenueMenuImage, VenueImage):
+            for stored in model_cls.objects.filter(content_hash__in=set(content_hashes), needs_processing=False):
+                copies[stored.content_hash] = stored
+        return copies
 
-        self.image.save(new_name, webp_file, save=False)
+    def prepare_image(self, stored_copies=None):
+        """
+        Readies a changed image for saving: a fresh upload is hashed before anything is
+        decoded and, when the same bytes are already stored and converted (see
+        stored_copies()), this row points at those files instead of storing them again.
+        Returns True when the image still has to be processed.
+        """
+        self.needs_processing = True
+        self.renditions = {}
+        self.content_hash = ""
+        if self.image._committed:
+            return True
+
+        self.hash_upload()
+        if stored_copies is None:
+            stored_copies = self.stored_copies([self.content_hash])
+        stored = stored_copies.get(self.content_hash)
+        if stored is not None:
+            self.image = stored.image.name
+            self.renditions = stored.renditions
+            self.needs_processing = False
+        return self.needs_processing
+
+    @classmethod
+    def bulk_create_uploads(cls, images):
+        """
+        bulk_create() for new rows carrying fresh uploads: stored, or deduplicated, as
+        save() would, with one lookup for every upload's stored copy, one INSERT and
+        one processing run. Sends no post_save signals.
+        """
+        changed = [image for image in images if image.image_has_changed()]
+        for image in changed:
+            if not image.image._committed:
+                image.hash_upload()
+        stored_copies = cls.stored_copies([image.content_hash for image in changed if image.content_hash])
+        queued = [image for image in changed if image.prepare_image(stored_copies)]
+
+        # The same bytes uploaded twice in one batch: store them once, for the first row.
+        first_by_hash = {}
+        for image in changed:
+            if image.image._committed or not image.content_hash:
+                continue
+            first = first_by_hash.setdefault(image.content_hash, image)
+            if first is not image:
+                if not first.image._committed:
+                    first.image.save(os.path.basename(first.image.name), first.image.file, save=False)
+                image.image = first.image.name
+
+        created = cls.objects.bulk_create(images)
+        for image in created:
+            image._original_image_name = image.image.name
+
+        if queued:
+            from .services.images import schedule_image_processing
+
+            transaction.on_commit(schedule_image_processing, robust=True)
+        return created
 
     def save(self, *args, **kwargs):
-        if self.image_has_changed():
-            self.convert_and_save_webp()
+        changed = self.image_has_changed()
+        queued = changed and self.prepare_image()
+        if changed and kwargs.get("update_fields") is not None:
+            kwargs["update_fields"] = {*kwargs["update_fields"], "image", "needs_processing", "renditions", "content_hash"}
+
         super().save(*args, **kwargs)
         # Update stored name so future saves behave correctly
         self._original_image_name = self.image.name
 
+        if queued:
+            from .services.images import schedule_image_processing
+
+            transaction.on_commit(schedule_image_processing, robust=True)
+
 
 ###########################################################################################
 
@@ -0,0 +1,343 @@
+import logging
+
+from array                  import array
+from datetime               import time, timedelta
+from time                   import time_ns
+from django.conf            import settings
+from django.core.cache      import cache
+
+from venues.models          import Reservation, Venue, VenueClosedTime, WorkingDay
+
+logger = logging.getLogger(__name__)
+
+SLOT_MINUTES    = 30
+MINUTES_PER_DAY = 24 * 60
+SLOTS_PER_DAY   = MINUTES_PER_DAY // SLOT_MINUTES
+
+SCHEDULE_KEY    = "availability:schedule:{venue_id}"
+DAY_KEY         = "availability:day:{venue_id}:{date}"
+INDEX_KEY       = "availability:index:{generation}:{date}"
+GENERATION_KEY  = "availability:index:generation"
+
+RESERVED        = 0     # index of the reserved mask inside a day entry
+BLOCKED         = 1     # index of the blocked mask inside a day entry
+
+###########################################################################################
+# Availability engine
+#
+# Per venue we cache:
+#   - the weekly schedule: {weekday: (open_minute, close_minute, closes_next_day)}
+#   - one entry per *calendar* date: (reserved_mask, blocked_mask), where bit i stands
+#     for the 30-min slot that starts at i * 30 minutes after midnight.
+#
+# A business date is rebuilt from the schedule of its weekday plus the masks of the
+# calendar dates it spans (date and date + 1 when closes_next_day). A slot is open when
+# neither its reserved nor its blocked bit is set.
+###########################################################################################
+def _timeout():
+    return getattr(settings, "AVAILABILITY_CACHE_TIMEOUT", 60 * 60 * 24)
+
+
+def _index_timeout():
+    return getattr(settings, "AVAILABILITY_INDEX_TIMEOUT", 60 * 5)
+
+
+def _minutes(value):
+    return value.hour * 60 + value.minute
+
+
+def slot_index(value):
+    """
+        Returns the 0..47 slot index of a time, or None if it is not on a :00/:30 boundary.
+    """
+    if value.second or value.microsecond or value.minute % SLOT_MINUTES:
+        return None
+    return _minutes(value) // SLOT_MINUTES
+
+
+def _schedule_key(venue_id):
+    return SCHEDULE_KEY.format(venue_id=venue_id)
+
+
+def _day_key(venue_id, day):
+    return DAY_KEY.format(venue_id=venue_id, date=day.isoformat())
+
+
+def _fill(entries, timeout):
+    # Read-through fills never overwrite: a reader that loaded before a write committed
+    # must not replace what refresh_day() or an invalidation has stored since.
+    for key, value in entries.items():
+        cache.add(key, value, timeout)
+
+###########################################################################################
+
+###########################################################################################
+def _schedules_from_db(venue_ids):
+    schedules = {venue_id: {} for venue_id in venue_ids}
+    for day in WorkingDay.objects.filter(venue_id__in=venue_ids):
+        if day.is_closed or day.open_time is None or day.close_time is None:
+            continue
+        schedules[day.venue_id][day.weekday] = (
+            _minutes(day.open_time),
+            _minutes(day.close_time),
+            day.closes_next_day_effective,
+        )
+    return schedules
+
+
+def get_schedules(venue_ids):
+    """
+        Returns {venue_id: schedule}. Venues missing from the cache are loaded with a
+        single WorkingDay query and added back.
+    """
+    keys        = {_schedule_key(venue_id): venue_id for venue_id in venue_ids}
+    cached      = cache.get_many(list(keys))
+    schedules   = {keys[key]: value for key, value in cached.items()}
+
+    missing = [venue_id for venue_id in venue_ids if venue_id not in schedules]
+    if missing:
+        loaded = _schedules_from_db(missing)
+        _fill({_schedule_key(venue_id): value for venue_id, value in loaded.items()}, _timeout())
+        schedules.update(loaded)
+
+    return schedules
+
+
+def get_schedule(venue_id):
+    return get_schedules([venue_id])[venue_id]
+
+
+def invalidate_schedule(venue_id):
+    cache.delete(_schedule_key(venue_id))
+    bump_index_generation()
+
+###########################################################################################
+
+###########################################################################################
+def reserved_slots_queryset(venue_ids, days):
+    return (
+        Reservation.objects
+        .filter(venue_id__in=venue_ids, date__in=days)
+        .values_list("venue_id", "date", "time")
+    )
+
+
+def _masks_from_db(venue_ids, days):
+    masks = {(venue_id, day): [0, 0] for venue_id in venue_ids for day in days}
+
+    reserved_rows = reserved_slots_queryset(venue_ids, days)
+    blocked_rows = (
+        VenueClosedTime.objects
+        .filter(venue_id__in=venue_ids, date__in=days)
+        .values_list("venue_id", "date", "time")
+    )
+
+    for kind, rows in ((RESERVED, reserved_rows), (BLOCKED, blocked_rows)):
+        for venue_id, day, slot_time in rows:
+            index = slot_index(slot_time)
+            if index is not None:
+                masks[(venue_id, day)][kind] |= 1 << index
+
+    return {key: tuple(value) for key, value in masks.items()}
+
+
+def _get_masks(venue_ids, days):
+    keys    = {_day_key(venue_id, day): (venue_id, day) for venue_id in venue_ids for day in days}
+    cached  = cache.get_many(list(keys))
+    masks   = {keys[key]: tuple(value) for key, value in cached.items()}
+
+    missing = [key for key in keys.values() if key not in masks]
+    if missing:
+        loaded = _masks_from_db(
+            sorted({venue_id for venue_id, _ in missing}),
+            sorted({day for _, day in missing}),
+        )
+        # The cross product can hold hits too; only the keys that missed are filled.
+        loaded = {key: loaded[key] for key in missing}
+        _fill({_day_key(venue_id, day): value for (venue_id, day), value in loaded.items()}, _timeout())
+        masks.update(loaded)
+
+    return masks
+
+
+def get_day_masks(venue_id, days):
+    """
+        Returns {date: (reserved_mask, blocked_mask)} for the given calendar dates.
+        Missing dates are loaded with two queries and added back to the cache.
+    """
+    masks = _get_masks([venue_id], days)
+    return {day: masks[(venue_id, day)] for day in days}
+
+
+def refresh_day(venue_id, day):
+    """
+        Recomputes the cached masks of a single calendar date after a reservation or
+        closed-time write. Only that date is touched; the rest of the venue stays cached.
+    """
+    if not venue_id or not day:
+        return
+    loaded = _masks_from_db([venue_id], [day])
+    cache.set(_day_key(venue_id, day), loaded[(venue_id, day)], _timeout())
+    invalidate_index(day)
+
+###########################################################################################
+
+###########################################################################################
+def slot_minutes_for(schedule, business_date):
+    """
+        Returns the slot start minutes (relative to midnight of business_date) for the
+        schedule of that weekday, or None when the schedule is not 30-min aligned.
+    """
+    hours = schedule.get(business_date.weekday())
+    if not hours:
+        return []
+
+    open_minute, close_minute, closes_next_day = hours
+    if open_minute % SLOT_MINUTES or close_minute % SLOT_MINUTES:
+        return None
+
+    end_minute = close_minute + (MINUTES_PER_DAY if closes_next_day else 0)
+    return list(range(open_minute, end_minute, SLOT_MINUTES))
+
+
+def build_slots(business_date, minutes, masks):
+    results = []
+    for offset, minute in enumerate(minutes):
+        slot_date       = business_date + timedelta(days=minute // MINUTES_PER_DAY)
+        index           = (minute % MINUTES_PER_DAY) // SLOT_MINUTES
+        reserved, blocked = masks.get(slot_date, (0, 0))
+
+        is_reserved     = bool(reserved >> index & 1)
+        is_blocked      = bool(blocked >> index & 1)
+
+        results.append({
+            "time":         time(index * SLOT_MINUTES // 60, index * SLOT_MINUTES % 60),
+            "slot_date":    slot_date,
+            "is_next_day":  slot_date != business_date,
+            "offset":       offset,
+            "is_blocked":   is_blocked,
+            "is_reserved":  is_reserved,
+            "is_available": not is_reserved and not is_blocked,
+        })
+    return results
+
+
+def get_availability_range(venue, start, end):
+    """
+        Returns [(business_date, slots)] for every business date in [start, end].
+        The schedule and all calendar-date masks of the range are loaded together, so a
+        cold range costs at most three queries (WorkingDay, Reservation, VenueClosedTime).
+    """
+    schedule    = get_schedule(venue.pk)
+    dates       = [start + timedelta(days=offset) for offset in range((end - start).days + 1)]
+    minutes_by_date = {business_date: slot_minutes_for(schedule, business_date) for business_date in dates}
+
+    days = sorted({
+        business_date + timedelta(days=minute // MINUTES_PER_DAY)
+        for business_date, minutes in minutes_by_date.items()
+        for minute in minutes or []
+    })
+    masks = get_day_masks(venue.pk, days) if days else {}
+
+    results = []
+    for business_date in dates:
+        minutes = minutes_by_date[business_date]
+        if minutes is None:
+            # Legacy rows with open/close off the 30-min grid cannot be expressed as masks.
+            results.append((business_date, venue.compute_available_time_slots(business_date)))
+            continue
+        results.append((business_date, build_slots(business_date, minutes, masks)))
+
+    return results
+
+
+def get_available_time_slots(venue, business_date):
+    """
+        Cached equivalent of Venue.compute_available_time_slots(): same list of dicts,
+        served from the schedule and day masks without touching the database once warm.
+    """
+    return get_availability_range(venue, business_date, business_date)[0][1]
+
+###########################################################################################
+
+###########################################################################################
+# Cross-venue index
+#
+# For one calendar date we keep SLOTS_PER_DAY sorted arrays of venue ids: entry i holds
+# every venue that is open and neither reserved nor blocked in the slot starting at
+# i * 30 minutes after midnight. "Who is free at T" is then a single cache read.
+#
+# The index is derived from the per-venue schedules and day masks above, so it is
+# rebuilt from them (4 queries when everything is cold, 1 when warm) instead of being
+# patched in place. refresh_day() drops the date it touched and invalidate_schedule()
+# moves every date to a new generation, since a schedule change can affect any date.
+###########################################################################################
+def _index_generation():
+    generation = cache.get(GENERATION_KEY)
+    if generation is None:
+        cache.add(GENERATION_KEY, time_ns(), None)
+        generation = cache.get(GENERATION_KEY)
+    return generation
+
+
+def bump_index_generation():
+    cache.set(GENERATION_KEY, time_ns(), None)
+
+
+def _index_key(day):
+    return INDEX_KEY.format(generation=_index_generation(), date=day.isoformat())
+
+
+def invalidate_index(day):
+    cache.delete(_index_key(day))
+
+
+def open_mask_for(schedule, day):
+    """
+        Bitmask of the slots of calendar date `day` in which the venue is open, counting
+        both the business date itself and the after-midnight tail of the previous one.
+        Misaligned schedules cannot be expressed on the slot grid and count as closed.
+    """
+    mask = 0
+    for business_date, shift in ((day, 0), (day - timedelta(days=1), MINUTES_PER_DAY)):
+        for minute in slot_minutes_for(schedule, business_date) or []:
+            calendar_minute = minute - shift
+            if 0 <= calendar_minute < MINUTES_PER_DAY:
+                mask |= 1 << (calendar_minute // SLOT_MINUTES)
+    return mask
+
+
+def _build_index(day):
+    venue_ids   = list(Venue.objects.order_by("id").values_list("id", flat=True))
+    schedules   = get_schedules(venue_ids)
+    masks       = _get_masks(venue_ids, [day])
+
+    index = [array("I") for _ in range(SLOTS_PER_DAY)]
+    for venue_id in venue_ids:
+        reserved, blocked = masks[(venue_id, day)]
+        free = open_mask_for(schedules[venue_id], day) & ~reserved & ~blocked
+
+        while free:
+            lowest = free & -free
+            index[lowest.bit_length() - 1].append(venue_id)
+            free ^= lowest
+
+    return index
+
+
+def get_free_venue_ids(day, slot_time):
+    """
+        Sorted array of the ids of every venue that can take a reservation at
+        (day, slot_time). slot_time must sit on the 30-min grid.
+    """
+    index_of_slot = slot_index(slot_time)
+    if index_of_slot is None:
+        raise ValueError("Time must be on a 30-minute boundary.")
+
+    key     = _index_key(day)
+    index   = cache.get(key)
+    if index is None:
+        index = _build_index(day)
+        cache.add(key, index, _index_timeout())
+
+    return index[index_of_slot]
@@ -0,0 +1,113 @@
+from django.conf            import settings
+from django.core.cache      import cache
+from django.db.models       import Count, Q
+
+from venues.models          import Reservation
+from venues.utils           import get_today
+
+BUCKETS             = ("unseen_requests", "requests", "arrivals", "history")
+ARRIVAL_STATUSES    = ("accepted", "rejected", "cancelled")
+COUNTER_KEY         = "dashboard:counts:{venue_id}:{day}:{bucket}"
+
+###########################################################################################
+# Dashboard bucket counts
+#
+# The badge counts polled by every open dashboard tab. They are computed with one
+# conditional-aggregation query and, when DASHBOARD_COUNTERS_TIMEOUT > 0, kept as one
+# cache counter per venue, day and bucket. Reservation writes move the counters with
+# atomic INCR/DECR after commit; a missing counter is simply left for the next read to
+# recompute, and the timeout bounds any drift from writes that bypass the signals.
+# Keys include the day because the buckets shift at midnight.
+###########################################################################################
+def bucket_filters(today):
+    upcoming_pending = Q(date__gte=today, status="pending")
+    return {
+        "unseen_requests":  upcoming_pending & Q(seen=False),
+        "requests":         upcoming_pending,
+        "arrivals":         Q(date__gte=today, status__in=ARRIVAL_STATUSES),
+        "history":          Q(date__lt=today),
+    }
+
+
+def buckets_of(state, today):
+    """
+        The buckets a reservation in `state` (a reservation_state() tuple) counts towards;
+        mirrors bucket_filters().
+    """
+    _, day, status, seen = state
+    if day < today:
+        return {"history"}
+    if status == "pending":
+        return {"requests"} if seen else {"requests", "unseen_requests"}
+    if status in ARRIVAL_STATUSES:
+        return {"arrivals"}
+    return set()
+
+
+def reservation_state(reservation):
+    return reservation.venue_id, reservation.date, reservation.status, bool(reservation.seen)
+
+
+def state_from_values(values):
+    """reservation_state() of a Reservation.TRACKED_FIELDS snapshot."""
+    return values["venue_id"], values["date"], values["status"], bool(values["seen"])
+
+
+def _timeout():
+    return getattr(settings, "DASHBOARD_COUNTERS_TIMEOUT", 60 * 5)
+
+
+def _key(venue_id, today, bucket):
+    return COUNTER_KEY.format(venue_id=venue_id, day=today.isoformat(), bucket=bucket)
+
+
+def count_from_db(venue_id, today=None):
+    today = today or get_today()
+    return Reservation.objects.filter(venue_id=venue_id).aggregate(
+        **{bucket: Count("id", filter=condition) for bucket, condition in bucket_filters(today).items()}
+    )
+
+###########################################################################################
+
+###########################################################################################
+def get_counts(venue_id):
+    """
+        Returns {bucket: count} for a venue; costs no query while its counters are cached.
+    """
+    today = get_today()
+    if _timeout() <= 0:
+        return count_from_db(venue_id, today)
+
+    keys = {bucket: _key(venue_id, today, bucket) for bucket in BUCKETS}
+    cached = cache.get_many(keys.values())
+    if len(cached) == len(keys):
+        return {bucket: cached[key] for bucket, key in keys.items()}
+
+    counts = count_from_db(venue_id, today)
+    cache.set_many({keys[bucket]: count for bucket, count in counts.items()}, _timeout())
+    return counts
+
+
+def apply_change(old_state, new_state):
+    """
+        Moves the cached counters for a reservation going from old_state to new_state
+        (either may be None for a create or delete).
+    """
+    if _timeout() <= 0:
+        return
+
+    today = get_today()
+    deltas = {}
+    for state, step in ((old_state, -1), (new_state, 1)):
+        if state is None or state[1] is None:
+            continue
+        for bucket in buckets_of(state, today):
+            key = _key(state[0], today, bucket)
+            deltas[key] = deltas.get(key, 0) + step
+
+    for key, delta in deltas.items():
+        if delta:
+            try:
+                cache.incr(key, delta)
+            except ValueError:
+                pass    # not cached: the next read recomputes it
@@ -2,7 +2,7 @@ import logging
 
 from django.utils           import timezone
 from django.contrib.auth    import get_user_model
-from emails_manager.utils   import send_email_with_template, _build_site_url
+from emails_manager.utils   import build_email, send_async_messages, send_email_with_template, _build_site_url
 
 logger = logging.getLogger(__name__)
 
@@ -43,9 +43,9 @@ def send_new_venue_application_email(venue_application, async_send = True):
 ###########################################################################################
 
 ###########################################################################################
-def send_reservation_notification(instance, created=False, editor=None, changes_list=None):
+def build_reservation_emails(instance, created=False, editor=None, changes_list=None):
     """
-    Handles all reservation-related email notifications.
+    Renders (without sending) the emails a reservation change calls for.
     This function belongs to the 'venues' app because it knows
     about reservations, venues, and users.
     """
@@ -55,7 +55,7 @@ def send_reservation_notification(instance, created=False, editor=None, changes_
 
     if not venue or not user:
         logger.warning("Reservation missing venue or user — skipping email.")
-        return
+        return []
 
     emails_to_send = []
 
@@ -135,21 +135,31 @@ def send_reservation_notification(instance, created=False, editor=None, changes_
             },
         })
 
-    # --- Send emails ---
-    for email_info in emails_to_send:
-        try:
-            template_base=email_info["template_base"]
-            
-            print("Sending email with template:", template_base)
-            send_email_with_template(
-                subject=email_info["subject"],
-                recipient=email_info["recipient"],
-                template_base=email_info["template_base"],
-                context=email_info["context"],
-                async_send=True
-            )
-        except Exception:
-            logger.exception("Failed to send reservation notification email to %s", email_info.get("recipient"))
+    return [
+        build_email(
+            subject=email_info["subject"],
+            recipient=email_info["recipient"],
+            template_base=email_info["template_base"],
+            context=email_info["context"],
+        )
+        for email_info in emails_to_send
+    ]
+
+
+def send_reservation_notification(instance, created=False, editor=None, changes_list=None):
+    """
+    Handles all reservation-related email notifications: renders them and sends them
+    together in one background thread. The outbox dispatcher sends build_reservation_emails()
+    itself, over its own pooled connection.
+    """
+    try:
+        emails = build_reservation_emails(instance, created=created, editor=editor, changes_list=changes_list)
+    except Exception:
+        logger.exception("Failed to render reservation notification emails for reservation %s", getattr(instance, "id", None))
+        return
+
+    if emails:
+        send_async_messages(emails)
 
 
 ###########################################################################################
@@ -0,0 +1,193 @@
+import math
+
+from django.db.models               import Avg, Count, Q
+from django.db.models.functions     import Substr
+
+GEOHASH_ALPHABET    = "0123456789bcdefghjkmnpqrstuvwxyz"
+GEOHASH_PRECISION   = 9         # ~5m cells, stored on Venue.geohash
+MAX_COVER_CELLS     = 16        # upper bound of prefixes OR-ed into one bbox query
+EARTH_RADIUS_KM     = 6371.0088
+
+# Geohash length used to group markers at each map zoom level (Web Mercator, ~60px clusters).
+# Zoom levels past the end of the tuple are served as individual venues.
+CLUSTER_PRECISION_BY_ZOOM = (1, 1, 1, 2, 2, 2, 3, 3, 4, 4, 5, 5, 6)
+
+###########################################################################################
+# Geospatial index
+#
+# Venues carry a geohash of their coordinates in an indexed column. A bbox becomes a
+# handful of prefix range scans on that column (plus an exact lat/lng check to trim the
+# cell edges), radius queries go through their bounding box and a haversine filter, and
+# low zoom levels are clustered with one GROUP BY on a geohash prefix.
+###########################################################################################
+def encode_geohash(latitude, longitude, precision=GEOHASH_PRECISION):
+    """
+        Returns the geohash of a point, or "" when either coordinate is missing.
+    """
+    if latitude is None or longitude is None:
+        return ""
+
+    latitude, longitude = float(latitude), float(longitude)
+    lat_range, lng_range = [-90.0, 90.0], [-180.0, 180.0]
+
+    chars, bits, bit_count, even = [], 0, 0, True
+    while len(chars) < precision:
+        value, interval = (longitude, lng_range) if even else (latitude, lat_range)
+        middle = (interval[0] + interval[1]) / 2
+        if value >= middle:
+            bits = bits << 1 | 1
+            interval[0] = middle
+        else:
+            bits <<= 1
+            interval[1] = middle
+
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            chars.append(GEOHASH_ALPHABET[bits])
+            bits, bit_count = 0, 0
+
+    return "".join(chars)
+
+
+def _cell_size(precision):
+    """
+        (height, width) in degrees of a geohash cell of the given length.
+    """
+    total_bits = precision * 5
+    lng_bits = (total_bits + 1) // 2
+    lat_bits = total_bits // 2
+    return 180.0 / (1 << lat_bits), 360.0 / (1 << lng_bits)
+
+
+def covering_prefixes(min_lat, min_lng, max_lat, max_lng):
+    """
+        Geohash prefixes whose cells cover the bbox, using the longest prefix length
+        that needs no more than MAX_COVER_CELLS cells.
+    """
+    cells = {""}
+    for precision in range(1, GEOHASH_PRECISION + 1):
+        height, width = _cell_size(precision)
+        rows = math.floor(max_lat / height) - math.floor(min_lat / height) + 1
+        cols = math.floor(max_lng / width) - math.floor(min_lng / width) + 1
+        if rows * cols > MAX_COVER_CELLS:
+            break
+
+        # Sample the centre of every cell the bbox touches.
+        start_lat = (math.floor(min_lat / height) + 0.5) * height
+        start_lng = (math.floor(min_lng / width) + 0.5) * width
+        cells = {
+            encode_geohash(
+                min(start_lat + row * height, 90.0),
+                min(start_lng + col * width, 180.0),
+                precision,
+            )
+            for row in range(rows)
+            for col in range(cols)
+        }
+
+    return sorted(cells)
+
+
+def _split_antimeridian(min_lat, min_lng, max_lat, max_lng):
+    if min_lng <= max_lng:
+        return [(min_lat, min_lng, max_lat, max_lng)]
+    return [(min_lat, min_lng, max_lat, 180.0), (min_lat, -180.0, max_lat, max_lng)]
+
+
+def filter_bbox(queryset, min_lat, min_lng, max_lat, max_lng):
+    """
+        Restricts a Venue queryset to the bbox. min_lng > max_lng means the box crosses
+        the antimeridian.
+    """
+    condition = Q()
+    for box in _split_antimeridian(min_lat, min_lng, max_lat, max_lng):
+        prefixes = Q()
+        for prefix in covering_prefixes(*box):
+            prefixes |= Q(geohash__startswith=prefix)
+        condition |= prefixes & Q(
+            latitude__gte=box[0], latitude__lte=box[2],
+            longitude__gte=box[1], longitude__lte=box[3],
+        )
+    return queryset.filter(condition)
+
+###########################################################################################
+
+###########################################################################################
+def haversine_km(lat1, lng1, lat2, lng2):
+    lat1, lng1, lat2, lng2 = map(math.radians, (float(lat1), float(lng1), float(lat2), float(lng2)))
+    a = (
+        math.sin((lat2 - lat1) / 2) ** 2
+        + math.cos(lat1) * math.cos(lat2) * math.sin((lng2 - lng1) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def radius_bbox(latitude, longitude, radius_km):
+    """
+        Bounding box (min_lat, min_lng, max_lat, max_lng) of a circle. Near the poles the
+        box widens to every longitude.
+    """
+    delta_lat = math.degrees(radius_km / EARTH_RADIUS_KM)
+    min_lat, max_lat = max(latitude - delta_lat, -90.0), min(latitude + delta_lat, 90.0)
+
+    cos_lat = math.cos(math.radians(latitude))
+    if max_lat >= 90.0 or min_lat <= -90.0 or cos_lat < 1e-9:
+        return min_lat, -180.0, max_lat, 180.0
+
+    delta_lng = math.degrees(radius_km / EARTH_RADIUS_KM / cos_lat)
+    if delta_lng >= 180.0:
+        return min_lat, -180.0, max_lat, 180.0
+
+    min_lng = (longitude - delta_lng + 540.0) % 360.0 - 180.0
+    max_lng = (longitude + delta_lng + 540.0) % 360.0 - 180.0
+    return min_lat, min_lng, max_lat, max_lng
+
+
+def within_radius(rows, latitude, longitude, radius_km):
+    """
+        Keeps the rows (dicts with latitude/longitude) inside the circle, nearest first,
+        annotating each with distance_km.
+    """
+    results = []
+    for row in rows:
+        distance = haversine_km(latitude, longitude, row["latitude"], row["longitude"])
+        if distance <= radius_km:
+            row["distance_km"] = round(distance, 3)
+            results.append(row)
+    results.sort(key=lambda row: row["distance_km"])
+    return results
+
+###########################################################################################
+
+###########################################################################################
+def cluster_precision(zoom):
+    """
+        Geohash length to cluster on at this zoom level, or None to return single venues.
+    """
+    if zoom is None or zoom >= len(CLUSTER_PRECISION_BY_ZOOM):
+        return None
+    return CLUSTER_PRECISION_BY_ZOOM[max(zoom, 0)]
+
+
+def cluster_venues(queryset, precision):
+    """
+        One GROUP BY over the geohash prefix: [{geohash, count, latitude, longitude}],
+        where latitude/longitude is the centroid of the clustered venues.
+    """
+    rows = (
+        queryset
+        .annotate(cell=Substr("geohash", 1, precision))
+        .values("cell")
+        .annotate(count=Count("id"), lat=Avg("latitude"), lng=Avg("longitude"))
+        .order_by("cell")
+    )
+    return [
+        {
+            "geohash":      row["cell"],
+            "count":        row["count"],
+            "latitude":     float(row["lat"]),
+            "longitude":    float(row["lng"]),
+        }
+        for row in rows
+    ]
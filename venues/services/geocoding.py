@@ -0,0 +1,230 @@
+import logging
+import re
+import threading
+import time
+import unicodedata
+
+from datetime                       import timedelta
+from django.conf                    import settings
+from django.core.cache              import cache
+from django.db                      import transaction
+from django.db.models               import Q
+from django.utils                   import timezone
+
+import requests
+
+from venues.models                  import GeocodedAddress, Venue
+from venues.services.geo            import encode_geohash
+from venues.services.listing_cache  import bump_catalog_version, bump_venue_version
+
+logger = logging.getLogger(__name__)
+
+GEOCODING_SCHEDULED_KEY = "geocoding:scheduled"
+NOMINATIM_URL           = "https://nominatim.openstreetmap.org/search"
+
+###########################################################################################
+# Geocoding
+#
+# Venue saves never wait for the geocoder: a venue without coordinates schedules one
+# geocode_venues task after commit (GEOCODING_DELAY_SECONDS countdown, so a burst of saves
+# shares a run), and the Beat sweep retries whatever is still missing. Results live in
+# GeocodedAddress, keyed by normalize_address(), so a restart, another worker or the
+# same address on another venue costs no request. Addresses the geocoder cannot resolve
+# are cached too, for GEOCODING_NEGATIVE_TTL_HOURS instead of GEOCODING_CACHE_TTL_DAYS.
+#
+# Nominatim allows one request per second per application: requests go through a token
+# bucket (GEOCODING_RATE_PER_SECOND, no burst). The bucket is per process, so run the
+# geocoding task on a queue consumed by a single worker process. GEOCODER = "stub"
+# answers from STUB_GEOCODER_RESULTS without any network access, for tests and local
+# development.
+###########################################################################################
+class GeocoderUnavailable(Exception):
+    """The geocoder could not be reached; the address is not cached and is retried later."""
+
+
+class TokenBucket:
+    def __init__(self, rate, capacity=1.0, clock=time.monotonic, sleep=time.sleep):
+        self.rate       = float(rate)
+        self.capacity   = float(capacity)
+        self.tokens     = float(capacity)
+        self.clock      = clock
+        self.sleep      = sleep
+        self.updated    = clock()
+        self.lock       = threading.Lock()
+
+    def acquire(self):
+        """
+            Takes one token, sleeping until one is available. Returns the seconds waited.
+        """
+        with self.lock:
+            now = self.clock()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+
+            waited = 0.0
+            if self.tokens < 1:
+                waited = (1 - self.tokens) / self.rate
+                self.sleep(waited)
+                self.tokens, self.updated = 1.0, self.clock()
+            self.tokens -= 1
+            return waited
+
+
+_bucket = None
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def _rate_limiter():
+    global _bucket
+    rate = _setting("GEOCODING_RATE_PER_SECOND", 1.0)
+    if _bucket is None or _bucket.rate != rate:
+        _bucket = TokenBucket(rate)
+    return _bucket
+
+
+def normalize_address(address):
+    """
+        Cache key of an address: Unicode-normalized, case-folded, with whitespace and comma
+        spacing collapsed, so "Ermou 10,  Athens" and "ermou 10, athens" share an entry.
+    """
+    address = unicodedata.normalize("NFKC", address or "").casefold()
+    address = re.sub(r"\s*,\s*", ", ", re.sub(r"\s+", " ", address))
+    return address.strip(" ,.")[:255]
+
+###########################################################################################
+
+###########################################################################################
+def nominatim_geocode(address):
+    """
+        Returns (lat, lon) or None when Nominatim has no match. Raises GeocoderUnavailable
+        when the request fails.
+    """
+    _rate_limiter().acquire()
+    try:
+        resp = requests.get(
+            NOMINATIM_URL,
+            params={"q": address, "format": "json", "limit": 1},
+            headers={"User-Agent": _setting("GEOCODING_USER_AGENT", "Openspots/1.0 (openspots.application@gmail.com)")},
+            timeout=_setting("GEOCODING_TIMEOUT_SECONDS", 5),
+        )
+        resp.raise_for_status()
+        data = resp.json()
+    except (requests.RequestException, ValueError) as exc:
+        raise GeocoderUnavailable(f"Nominatim request failed for {address!r}: {exc}") from exc
+
+    if not data:
+        return None
+    try:
+        return float(data[0]["lat"]), float(data[0]["lon"])
+    except (KeyError, TypeError, ValueError) as exc:
+        raise GeocoderUnavailable(f"Invalid response from Nominatim for {address!r}") from exc
+
+
+def stub_geocode(address):
+    """
+        Local geocoder: looks the normalized address up in STUB_GEOCODER_RESULTS.
+    """
+    results = {normalize_address(key): value for key, value in _setting("STUB_GEOCODER_RESULTS", {}).items()}
+    coords = results.get(normalize_address(address))
+    return tuple(coords) if coords else None
+
+
+GEOCODERS = {
+    "nominatim":    nominatim_geocode,
+    "stub":         stub_geocode,
+}
+
+
+def geocode(address):
+    """
+        Returns (lat, lon) or None, from the cache when a fresh entry exists. Raises
+        GeocoderUnavailable when the geocoder has to be asked and cannot be reached.
+    """
+    query = normalize_address(address)
+    if not query:
+        return None
+
+    now = timezone.now()
+    entry = GeocodedAddress.objects.filter(query=query, expires_at__gt=now).first()
+    if entry is not None:
+        return (entry.latitude, entry.longitude) if entry.found else None
+
+    coords = GEOCODERS[_setting("GEOCODER", "nominatim")](address)
+    if coords:
+        ttl = timedelta(days=_setting("GEOCODING_CACHE_TTL_DAYS", 90))
+    else:
+        ttl = timedelta(hours=_setting("GEOCODING_NEGATIVE_TTL_HOURS", 24))
+
+    entry, _ = GeocodedAddress.objects.update_or_create(
+        query=query,
+        defaults={
+            "latitude":     coords[0] if coords else None,
+            "longitude":    coords[1] if coords else None,
+            "fetched_at":   now,
+            "expires_at":   now + ttl,
+        },
+    )
+    return (entry.latitude, entry.longitude) if entry.found else None
+
+
+def geocode_pending_venues(limit=None, venue_ids=None):
+    """
+        Fills in the coordinates of venues that have a location but none, one venue at a
+        time (rate limited), only among `venue_ids` when given. Stops early when the
+        geocoder is unreachable; the rest is left for the next run. Returns (venues
+        geocoded, venues looked at).
+    """
+    pending = (
+        Venue.objects
+        .exclude(location="")
+        .filter(Q(latitude__isnull=True) | Q(longitude__isnull=True))
+        .order_by("id")
+    )
+    if venue_ids is not None:
+        pending = pending.filter(id__in=venue_ids)
+    if limit:
+        pending = pending[:limit]
+
+    geocoded = attempted = 0
+    for venue_id, location in list(pending.values_list("id", "location")):
+        attempted += 1
+        try:
+            coords = geocode(location)
+        except GeocoderUnavailable:
+            logger.warning("Geocoder unavailable, %d venues geocoded before stopping", geocoded, exc_info=True)
+            break
+        if not coords:
+            continue
+
+        lat, lon = coords
+        # Only while the row still has this address and no coordinates of its own.
+        updated = Venue.objects.filter(
+            Q(latitude__isnull=True) | Q(longitude__isnull=True), pk=venue_id, location=location
+        ).update(latitude=lat, longitude=lon, geohash=encode_geohash(lat, lon))
+        if updated:
+            geocoded += 1
+            transaction.on_commit(lambda venue_id=venue_id: bump_venue_version(venue_id), robust=True)
+
+    if geocoded:
+        transaction.on_commit(bump_catalog_version, robust=True)     # the venues now show up on the map
+
+    return geocoded, attempted
+
+
+def schedule_geocoding(venue_id=None):
+    """
+        Geocodes after a venue save. Without GEOCODING_ASYNC only the saved venue is looked
+        up, inline; otherwise one delayed task per burst of saves covers every pending venue.
+    """
+    if not _setting("GEOCODING_ASYNC", True):
+        geocode_pending_venues(venue_ids=None if venue_id is None else [venue_id])
+        return
+
+    delay = _setting("GEOCODING_DELAY_SECONDS", 1)
+    if cache.add(GEOCODING_SCHEDULED_KEY, 1, delay + 60):
+        from venues.tasks import geocode_venues
+
+        geocode_venues.apply_async(countdown=delay)
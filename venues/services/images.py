@@ -0,0 +1,294 @@
+import logging
+import multiprocessing
+import os
+
+from concurrent.futures     import ProcessPoolExecutor
+from datetime               import timedelta
+from io                     import BytesIO
+from django.conf            import settings
+from django.core.cache      import cache
+from django.core.files.base import ContentFile
+from django.db              import transaction
+from django.utils           import timezone
+from PIL                    import Image, ImageOps
+
+from venues.models                  import IMAGE_STORE_PREFIX, VenueImage, VenueMenuImage, content_addressed_path
+from venues.services.listing_cache  import bump_venue_version
+
+logger = logging.getLogger(__name__)
+
+IMAGE_MODELS = (VenueImage, VenueMenuImage)
+
+PROCESSING_SCHEDULED_KEY = "images:processing-scheduled"
+
+# (name, max width) of every WebP rendition; "full" also replaces the raw upload.
+RENDITIONS = (
+    ("thumb",   320),
+    ("card",    768),
+    ("full",    1600),
+)
+
+###########################################################################################
+# Image processing
+#
+# Saving a VenueImage/VenueMenuImage only stores the raw upload and flags the row
+# (needs_processing). After commit, schedule_image_processing() enqueues one
+# process_venue_images task per burst of uploads (IMAGE_PROCESSING_DELAY_SECONDS
+# countdown), which decodes each upload once and encodes every rendition of RENDITIONS,
+# spreading the images over a pool of IMAGE_PROCESSING_WORKERS processes. The row then
+# points at the "full" rendition and lists all of them in `renditions` for srcset.
+#
+# Uploads are stored by content (sha256, see BaseWebpImageModel.prepare_image): a
+# re-upload of bytes that are already stored is recognised before anything is decoded
+# and simply shares the existing files.
+#
+# Celery's prefork workers are daemonic and cannot start a pool; there the images are
+# encoded one after another. Run the image queue with --pool=solo or --pool=threads to
+# get the process pool. With IMAGE_PROCESSING_ASYNC off, uploads are processed right
+# after their transaction commits, in the request.
+###########################################################################################
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def render_renditions(data, quality=80, method=4):
+    """
+        Encodes the image bytes `data` into {name: webp bytes} for every rendition.
+        Module-level and bytes-in/bytes-out so it can run in a worker process.
+    """
+    image = ImageOps.exif_transpose(Image.open(BytesIO(data)))
+    if image.mode not in ("RGB", "RGBA"):
+        image = image.convert("RGB")
+
+    renditions = {}
+    for name, width in RENDITIONS:
+        resized = image
+        if image.width > width:
+            resized = image.resize((width, max(1, round(image.height * width / image.width))), Image.LANCZOS)
+
+        buffer = BytesIO()
+        resized.save(buffer, format="WEBP", quality=quality, method=method)
+        renditions[name] = buffer.getvalue()
+    return renditions
+
+
+def _render_all(blobs):
+    quality = _setting("IMAGE_WEBP_QUALITY", 80)
+    method = _setting("IMAGE_WEBP_METHOD", 4)
+    workers = min(_setting("IMAGE_PROCESSING_WORKERS", 2), len(blobs))
+
+    def render(data):
+        try:
+            return render_renditions(data, quality, method)
+        except Exception:
+            logger.exception("Could not decode an uploaded venue image")
+            return None
+
+    if workers <= 1 or multiprocessing.current_process().daemon:
+        return [render(data) for data in blobs]
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(render_renditions, data, quality, method) for data in blobs]
+    results = []
+    for future in futures:
+        try:
+            results.append(future.result())
+        except Exception:
+            logger.exception("Could not decode an uploaded venue image")
+            results.append(None)
+    return results
+
+
+def _store_rendition(image, name, data):
+    storage = image.image.storage
+    if image.content_hash:
+        path = content_addressed_path(image.content_hash, f"-{name}.webp")
+        if storage.exists(path):
+            return path     # same content, same rendition: already stored
+        return storage.save(path, ContentFile(data))
+    return storage.save(f"{os.path.splitext(image.image.name)[0]}-{name}.webp", ContentFile(data))
+
+
+def process_images(model_cls, ids):
+    """
+        Replaces the raw uploads of the given rows with their renditions. Rows of either
+        image model sharing an upload are converted once and updated together. Returns
+        the number of rows processed; undecodable uploads are kept as they are.
+    """
+    by_name = {}
+    for image in model_cls.objects.filter(id__in=ids, needs_processing=True):
+        by_name.setdefault(image.image.name, image)
+    if not by_name:
+        return 0
+
+    blobs = []
+    for raw_name, image in list(by_name.items()):
+        try:
+            with image.image.open("rb") as raw:
+                blobs.append(raw.read())
+        except OSError:
+            logger.exception("Uploaded venue image %s is missing", raw_name)
+            for cls in IMAGE_MODELS:
+                cls.objects.filter(image=raw_name, needs_processing=True).update(needs_processing=False)
+            del by_name[raw_name]
+
+    processed = 0
+    for (raw_name, image), rendered in zip(by_name.items(), _render_all(blobs)):
+        pending = [cls.objects.filter(image=raw_name, needs_processing=True) for cls in IMAGE_MODELS]
+        if rendered is None:
+            for queryset in pending:
+                queryset.update(needs_processing=False)
+            continue
+
+        paths = {name: _store_rendition(image, name, data) for name, data in rendered.items()}
+
+        # Rows that got a newer upload meanwhile no longer match raw_name and keep theirs;
+        # renditions nobody adopts are left to collect_garbage().
+        venue_ids = set()
+        updated = 0
+        for queryset in pending:
+            venue_ids.update(queryset.values_list("venue_id", flat=True))
+            updated += queryset.update(image=paths["full"], renditions=paths, needs_processing=False)
+        for venue_id in venue_ids:
+            transaction.on_commit(lambda venue_id=venue_id: bump_venue_version(venue_id), robust=True)
+        if updated:
+            image.image.storage.delete(raw_name)
+            processed += updated
+
+    return processed
+
+
+def process_pending_images(limit=None):
+    """
+        Processes every flagged venue and menu image, `limit` rows per model at a time.
+        Returns the number of images processed.
+    """
+    limit = limit or _setting("IMAGE_PROCESSING_BATCH_SIZE", 20)
+    processed = 0
+    for model_cls in IMAGE_MODELS:
+        while True:
+            ids = list(
+                model_cls.objects.filter(needs_processing=True).order_by("id").values_list("id", flat=True)[:limit]
+            )
+            if not ids:
+                break
+            processed += process_images(model_cls, ids)
+            if len(ids) < limit:
+                break
+    return processed
+
+
+def schedule_image_processing():
+    if not _setting("IMAGE_PROCESSING_ASYNC", True):
+        process_pending_images()
+        return
+
+    delay = _setting("IMAGE_PROCESSING_DELAY_SECONDS", 2)
+    if cache.add(PROCESSING_SCHEDULED_KEY, 1, delay + 60):
+        from venues.tasks import process_venue_images
+
+        process_venue_images.apply_async(countdown=delay)
+
+###########################################################################################
+
+###########################################################################################
+def image_url(image, rendition="full"):
+    """
+        URL of one rendition of a VenueImage/VenueMenuImage, or of the stored image while
+        it has not been processed yet.
+    """
+    if not image or not image.image:
+        return None
+    path = (image.renditions or {}).get(rendition)
+    return image.image.storage.url(path) if path else image.image.url
+
+
+def image_srcset(image):
+    """
+        "url 320w, url 768w, ..." for an <img srcset>; empty until the image is processed.
+    """
+    renditions = (image.renditions or {}) if image else {}
+    if not renditions or not image.image:
+        return ""
+    return ", ".join(
+        f"{image.image.storage.url(renditions[name])} {width}w" for name, width in RENDITIONS if name in renditions
+    )
+
+###########################################################################################
+# Garbage collection
+#
+# Stored files are shared, so a file may only go once no row references it any more:
+# deleting a row releases its files when it was the last one with its content hash (or,
+# for files stored before content addressing, its file name). collect_garbage() also
+# deletes the rows of image deletions that were approved (still marked_for_deletion, no
+# pending update request) and sweeps the content-addressed store for files no row
+# references, e.g. renditions of a row that was re-uploaded while being processed. Files
+# younger than IMAGE_GC_GRACE_SECONDS are left alone, their row may not be committed yet.
+###########################################################################################
+def image_files(image):
+    return {image.image.name, *(image.renditions or {}).values()} - {"", None}
+
+
+def release_image_files(content_hash, paths, storage=None):
+    """
+        Deletes `paths` (the files of a deleted row) unless another row still uses them.
+        Returns the number of files deleted.
+    """
+    if content_hash:
+        in_use = any(cls.objects.filter(content_hash=content_hash).exists() for cls in IMAGE_MODELS)
+    else:
+        in_use = any(cls.objects.filter(image__in=paths).exists() for cls in IMAGE_MODELS)
+    if in_use:
+        return 0
+
+    storage = storage or VenueImage._meta.get_field("image").storage
+    deleted = 0
+    for path in paths:
+        if storage.exists(path):
+            storage.delete(path)
+            deleted += 1
+    return deleted
+
+
+def _referenced_files():
+    referenced = set()
+    for cls in IMAGE_MODELS:
+        for name, renditions in cls.objects.values_list("image", "renditions").iterator():
+            referenced.add(name)
+            referenced.update((renditions or {}).values())
+    return referenced
+
+
+def collect_garbage(grace_seconds=None):
+    """
+        Returns (rows deleted, files deleted).
+    """
+    rows = 0
+    for cls in IMAGE_MODELS:
+        # post_delete releases each row's files, see signals.py
+        deleted, _ = cls.objects.filter(marked_for_deletion=True).exclude(
+            venue__update_requests__approval_status="pending"
+        ).delete()
+        rows += deleted
+
+    grace = timedelta(seconds=_setting("IMAGE_GC_GRACE_SECONDS", 60 * 60) if grace_seconds is None else grace_seconds)
+    cutoff = timezone.now() - grace
+    storage = VenueImage._meta.get_field("image").storage
+    referenced = _referenced_files()
+
+    files = 0
+    try:
+        shards, _ = storage.listdir(IMAGE_STORE_PREFIX)
+    except FileNotFoundError:
+        return rows, files
+
+    for shard in shards:
+        _, names = storage.listdir(f"{IMAGE_STORE_PREFIX}/{shard}")
+        for name in names:
+            path = f"{IMAGE_STORE_PREFIX}/{shard}/{name}"
+            if path not in referenced and storage.get_modified_time(path) < cutoff:
+                storage.delete(path)
+                files += 1
+
+    return rows, files
+
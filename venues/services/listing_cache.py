@@ -0,0 +1,83 @@
+import hashlib
+
+from time                   import time_ns
+from django.conf            import settings
+from django.core.cache      import cache
+
+CATALOG_VERSION_KEY = "listing:catalog"
+VENUE_VERSION_KEY   = "listing:venue:{venue_id}"
+ENTRY_KEY           = "listing:entry:{catalog}:{digest}"
+
+###########################################################################################
+# Homepage listing cache
+#
+# Anonymous venue listings are stored as rendered JSON bytes together with the version
+# of every venue they contain. Two kinds of counters invalidate them:
+#   - the catalog version is part of the entry key and moves whenever a venue is saved
+#     or deleted (membership, ordering or filters may have changed);
+#   - the per-venue versions are checked on read and move when an image, menu image or
+#     review of that venue changes.
+# Versions are bumped after commit; an entry built while a write is committing can be
+# stale until LISTING_CACHE_TIMEOUT.
+###########################################################################################
+def _timeout():
+    return getattr(settings, "LISTING_CACHE_TIMEOUT", 60 * 10)
+
+
+def _bump(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        # Missing (never set or evicted): restart from a value no old entry can hold.
+        cache.set(key, time_ns(), None)
+
+
+def _venue_key(venue_id):
+    return VENUE_VERSION_KEY.format(venue_id=venue_id)
+
+
+def bump_catalog_version():
+    _bump(CATALOG_VERSION_KEY)
+
+
+def bump_venue_version(venue_id):
+    if venue_id:
+        _bump(_venue_key(venue_id))
+
+###########################################################################################
+
+###########################################################################################
+def listing_key(parts):
+    """
+        Cache key for one listing variant. Read it *before* building the payload so a
+        concurrent catalog bump leaves the new entry unreachable instead of stale.
+    """
+    digest = hashlib.sha1(repr(sorted(parts.items())).encode()).hexdigest()
+    return ENTRY_KEY.format(catalog=cache.get(CATALOG_VERSION_KEY), digest=digest)
+
+
+def get_listing(key):
+    """
+        Returns (body, etag) for a valid entry, or None.
+    """
+    entry = cache.get(key)
+    if entry is None:
+        return None
+
+    venue_ids, versions, body, etag = entry
+    current = cache.get_many([_venue_key(venue_id) for venue_id in venue_ids])
+    for venue_id, version in zip(venue_ids, versions):
+        if current.get(_venue_key(venue_id)) != version:
+            return None
+
+    return body, etag
+
+
+def store_listing(key, body, venue_ids):
+    venue_ids   = sorted(set(venue_ids))
+    current     = cache.get_many([_venue_key(venue_id) for venue_id in venue_ids])
+    versions    = [current.get(_venue_key(venue_id)) for venue_id in venue_ids]
+    etag        = '"%s"' % hashlib.sha1(body).hexdigest()
+
+    cache.set(key, (venue_ids, versions, body, etag), _timeout())
+    return body, etag
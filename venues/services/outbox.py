@@ -0,0 +1,265 @@
+import logging
+
+from collections            import defaultdict
+from datetime               import timedelta
+from django.conf            import settings
+from django.contrib.auth    import get_user_model
+from django.core.cache      import cache
+from django.core.mail       import get_connection
+from django.db              import transaction
+from django.db.models       import F, Q
+from django.utils           import timezone
+
+from emails_manager.utils   import send_messages
+from venues.models          import Reservation, ReservationOutboxEvent
+from venues.notifications   import send_venue_notification_batch
+from venues.services.emails import build_reservation_emails
+
+logger = logging.getLogger(__name__)
+User = get_user_model()
+
+DISPATCH_SCHEDULED_KEY = "outbox:dispatch-scheduled"
+
+###########################################################################################
+# Batched outbox dispatcher
+#
+# Instead of one Celery task per outbox row, a dispatcher claims up to OUTBOX_BATCH_SIZE
+# due rows at once (SELECT ... FOR UPDATE SKIP LOCKED, so parallel dispatchers never
+# claim the same row), sends one WebSocket batch per venue, sends the emails of the whole
+# batch over one SMTP connection (rendered from cached templates), and writes
+# every row's outcome back with a single bulk_update. A row carries one change for all
+# of its channels; the `delivered` bitmap records which ones went out, so a retry only
+# repeats the channel that failed. A batched event (EVENT_BATCH, from bulk host actions)
+# is one row for many reservations of a venue and is delivered, or retried, as a unit.
+#
+# Reservation writes only schedule a dispatch: the first one after a quiet period enqueues
+# the task with a OUTBOX_DISPATCH_DELAY_SECONDS countdown and the rest of the burst rides
+# along. The beat sweep picks up retries and anything a crashed worker left PROCESSING
+# for longer than OUTBOX_PROCESSING_TIMEOUT_SECONDS.
+###########################################################################################
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def retry_delay(attempts):
+    return min(300, 15 * (2 ** max(attempts - 1, 0)))
+
+
+def schedule_dispatch():
+    if _setting("OUTBOX_RELAY_ENABLED", False):
+        return      # the relay is woken by the INSERT trigger's NOTIFY, see services/outbox_relay.py
+
+    delay = _setting("OUTBOX_DISPATCH_DELAY_SECONDS", 1)
+    if cache.add(DISPATCH_SCHEDULED_KEY, 1, delay + 30):
+        from venues.tasks import dispatch_outbox_events
+
+        dispatch_outbox_events.apply_async(countdown=delay)
+
+
+def claim_due_events(limit):
+    """
+        Locks, marks PROCESSING and returns up to `limit` due events, oldest first.
+    """
+    now = timezone.now()
+    stale = now - timedelta(seconds=_setting("OUTBOX_PROCESSING_TIMEOUT_SECONDS", 10 * 60))
+    due = (
+        Q(status__in=[ReservationOutboxEvent.STATUS_PENDING, ReservationOutboxEvent.STATUS_FAILED], next_retry_at__lte=now)
+        | Q(status=ReservationOutboxEvent.STATUS_PROCESSING, updated_at__lt=stale)
+    )
+
+    with transaction.atomic():
+        events = list(
+            ReservationOutboxEvent.objects
+            .select_for_update(skip_locked=True)
+            .filter(due)
+            .order_by("created_at")[:limit]
+        )
+        if events:
+            ReservationOutboxEvent.objects.filter(id__in=[event.id for event in events]).update(
+                status=ReservationOutboxEvent.STATUS_PROCESSING,
+                attempts=F("attempts") + 1,
+                last_error="",
+                updated_at=now,
+            )
+
+    for event in events:
+        event.attempts += 1
+    return events
+
+
+def _send_websocket_batches(events, errors):
+    by_venue = defaultdict(list)
+    for event in events:
+        if event.needs(ReservationOutboxEvent.DELIVERED_WEBSOCKET):
+            by_venue[event.venue_id].append(event)
+
+    for venue_id, group in by_venue.items():
+        try:
+            if not send_venue_notification_batch(venue_id, [message for event in group for message in event.messages()]):
+                raise RuntimeError(f"WebSocket delivery returned False for venue {venue_id}")
+        except Exception as exc:
+            logger.exception("Failed sending %d outbox events to venue %s", len(group), venue_id)
+            for event in group:
+                errors[event.id] = str(exc)
+            continue
+
+        for event in group:
+            event.delivered |= ReservationOutboxEvent.DELIVERED_WEBSOCKET
+
+
+def _reservation_id(event, message):
+    return (message.get("reservation") or {}).get("id") or event.reservation_id
+
+
+def _send_emails(events, errors):
+    events = [event for event in events if event.id not in errors and event.needs(ReservationOutboxEvent.DELIVERED_EMAIL)]
+    if not events:
+        return
+
+    reservations = Reservation.objects.select_related("venue__owner", "user").in_bulk(
+        {_reservation_id(event, message) for event in events for message in event.messages()}
+    )
+    editors = User.objects.in_bulk(
+        {(message.get("email_meta") or {}).get("editor_id") for event in events for message in event.messages()} - {None}
+    )
+
+    # Render everything first, then send the whole tick over one SMTP connection. Each
+    # message's emails are recorded in payload["emails_sent"] once they are out, so a retry
+    # only sends what is still missing.
+    rendered = []
+    for event in events:
+        sent = set(event.payload.get("emails_sent") or [])
+        for index, message in enumerate(event.messages()):
+            if index in sent:
+                continue
+            try:
+                reservation_id = _reservation_id(event, message)
+                email_meta = message.get("email_meta") or {}
+                reservation = reservations.get(reservation_id)
+                if reservation is None:
+                    # Deleted since: nothing left to notify about, and retrying cannot help.
+                    logger.warning("Skipping emails of outbox event %s: reservation %s is gone", event.id, reservation_id)
+                    rendered.append((event, index, []))
+                    continue
+
+                emails = build_reservation_emails(
+                    reservation,
+                    created=bool(email_meta.get("created", False)),
+                    editor=editors.get(email_meta.get("editor_id")),
+                    changes_list=email_meta.get("changes_list") or None,
+                )
+            except Exception as exc:
+                logger.exception("Failed rendering emails for outbox event %s", event.id)
+                errors[event.id] = str(exc)
+                continue
+            rendered.append((event, index, emails))
+
+    connection = None
+    try:
+        for event, index, emails in rendered:
+            try:
+                if emails:
+                    if connection is None:
+                        connection = get_connection(fail_silently=False)
+                        connection.open()
+                    send_messages(emails, connection=connection)
+            except Exception as exc:
+                logger.exception("Failed sending email for outbox event %s", event.id)
+                errors[event.id] = str(exc)
+                # The connection may be broken: the next message reconnects.
+                if connection is not None:
+                    try:
+                        connection.close()
+                    except Exception:
+                        pass
+                    connection = None
+                continue
+
+            event.payload = {**event.payload, "emails_sent": [*(event.payload.get("emails_sent") or []), index]}
+    finally:
+        if connection is not None:
+            connection.close()
+
+    for event in events:
+        if event.id not in errors:
+            event.delivered |= ReservationOutboxEvent.DELIVERED_EMAIL
+
+
+def deliver_events(events):
+    """
+        Delivers claimed events and records the outcome of each in one bulk_update.
+        Returns the number of events sent.
+    """
+    errors = {}
+    _send_websocket_batches(events, errors)
+    _send_emails(events, errors)
+
+    now = timezone.now()
+    for event in events:
+        event.updated_at = now
+        if event.id in errors:
+            event.status = ReservationOutboxEvent.STATUS_FAILED
+            event.last_error = errors[event.id]
+            event.next_retry_at = now + timedelta(seconds=retry_delay(event.attempts))
+        else:
+            event.status = ReservationOutboxEvent.STATUS_SENT
+            event.sent_at = now
+            event.next_retry_at = now
+
+    ReservationOutboxEvent.objects.bulk_update(
+        events, ["status", "delivered", "payload", "last_error", "next_retry_at", "sent_at", "updated_at"], batch_size=500
+    )
+    return len(events) - len(errors)
+
+
+def dispatch_due_events(max_batches=None):
+    """
+        Claims and delivers due events in batches of OUTBOX_BATCH_SIZE until none are
+        left (or max_batches is reached). Returns the number of events sent.
+    """
+    batch_size = _setting("OUTBOX_BATCH_SIZE", 200)
+    sent = batches = 0
+
+    while max_batches is None or batches < max_batches:
+        events = claim_due_events(batch_size)
+        if not events:
+            break
+        batches += 1
+        sent += deliver_events(events)
+
+        if len(events) < batch_size:
+            break
+
+    return sent
+
+###########################################################################################
+
+###########################################################################################
+# Retention
+#
+# Sent rows are only kept OUTBOX_RETENTION_DAYS for debugging, then deleted in batches of
+# OUTBOX_PURGE_BATCH_SIZE (one short DELETE ... WHERE id IN (...) each) so the purge never
+# holds long locks. Pending and failed rows are never purged.
+###########################################################################################
+def purge_sent_events(days=None, batch_size=None):
+    """
+        Deletes sent events older than `days`. Returns the number of rows deleted.
+    """
+    days = _setting("OUTBOX_RETENTION_DAYS", 7) if days is None else days
+    batch_size = batch_size or _setting("OUTBOX_PURGE_BATCH_SIZE", 5000)
+    expired = ReservationOutboxEvent.objects.filter(
+        status=ReservationOutboxEvent.STATUS_SENT,
+        sent_at__lt=timezone.now() - timedelta(days=days),
+    )
+
+    deleted = 0
+    while True:
+        ids = list(expired.order_by().values_list("id", flat=True)[:batch_size])
+        if not ids:
+            break
+        removed, _ = ReservationOutboxEvent.objects.filter(id__in=ids).delete()
+        deleted += removed
+        if len(ids) < batch_size:
+            break
+
+    return deleted
@@ -0,0 +1,88 @@
+import logging
+import select
+import time
+
+from django.conf            import settings
+from django.db              import DatabaseError, close_old_connections, connection
+from django.db.models       import Min
+from django.utils           import timezone
+
+from venues.models          import ReservationOutboxEvent
+from venues.services.outbox import dispatch_due_events
+
+logger = logging.getLogger(__name__)
+
+NOTIFY_CHANNEL = "reservation_outbox"
+
+###########################################################################################
+# Outbox relay (OUTBOX_RELAY_ENABLED)
+#
+# A long-lived process (manage.py run_outbox_relay) that LISTENs on NOTIFY_CHANNEL. An
+# AFTER INSERT trigger on the outbox table (migration 0016) notifies it once per INSERT
+# statement, and only after the inserting transaction commits, so it dispatches as soon
+# as there is work. Between notifications it sleeps until the earliest scheduled retry,
+# so failed events are retried on time instead of on the next beat sweep. Beat keeps
+# running the sweep at a low frequency as a safety net for a relay that is down.
+#
+# PostgreSQL only, and written against psycopg2 (requirements.txt).
+###########################################################################################
+def _next_retry_in(max_wait):
+    next_retry_at = (
+        ReservationOutboxEvent.objects
+        .filter(status__in=[ReservationOutboxEvent.STATUS_PENDING, ReservationOutboxEvent.STATUS_FAILED])
+        .aggregate(next_retry_at=Min("next_retry_at"))["next_retry_at"]
+    )
+    if next_retry_at is None:
+        return max_wait
+    return min(max(0.0, (next_retry_at - timezone.now()).total_seconds()), max_wait)
+
+
+def _listen():
+    # A dedicated autocommit connection: Django's own one may be closed or sit inside a
+    # transaction, and notifications are only delivered to an idle connection.
+    listener = connection.get_new_connection(connection.get_connection_params())
+    listener.autocommit = True
+    with listener.cursor() as cursor:
+        cursor.execute(f"LISTEN {NOTIFY_CHANNEL}")
+    return listener
+
+
+def run_relay(should_stop=lambda: False, wakeup_fd=None):
+    """
+        Dispatches due outbox events whenever NOTIFY_CHANNEL fires or a retry falls due.
+        Runs until should_stop() returns True (checked whenever wakeup_fd, e.g. a signal
+        pipe, becomes readable); reconnects after database errors.
+    """
+    if connection.vendor != "postgresql":
+        raise RuntimeError("The outbox relay needs PostgreSQL LISTEN/NOTIFY.")
+
+    max_wait = getattr(settings, "OUTBOX_RELAY_MAX_WAIT_SECONDS", 60)
+    listener = None
+
+    while not should_stop():
+        try:
+            if listener is None:
+                listener = _listen()
+                logger.info("Outbox relay listening on %s", NOTIFY_CHANNEL)
+
+            close_old_connections()
+            sent = dispatch_due_events()
+            if sent:
+                logger.info("Outbox relay sent %d events", sent)
+
+            readable, _, _ = select.select(
+                [listener] + ([wakeup_fd] if wakeup_fd is not None else []), [], [], _next_retry_in(max_wait)
+            )
+            if listener in readable:
+                listener.poll()
+                listener.notifies.clear()   # one dispatch covers any number of notifications
+        except (DatabaseError, connection.Database.Error):  # Django-wrapped, or raw psycopg2 from the listener
+            logger.exception("Outbox relay lost its database connection, reconnecting")
+            if listener is not None and not listener.closed:
+                listener.close()
+            listener = None
+            connection.close()
+            time.sleep(1)
+
+    if listener is not None:
+        listener.close()
@@ -0,0 +1,217 @@
+from datetime                       import datetime, time, timedelta, timezone as dt_timezone
+from django.conf                    import settings
+from django.db                      import transaction
+from django.db.models               import Count, Sum
+from django.db.models.functions     import TruncDate, TruncHour, TruncDay, TruncMonth, TruncWeek, TruncYear
+from django.utils                   import timezone
+
+from venues.models                  import Reservation, VenueDailyActivity, VenueHourlyActivity, VenueVisit
+from venues.utils                   import get_today
+
+# grouping -> (trunc function over VenueDailyActivity.date, days back, label format)
+ANALYTICS_GROUPINGS = {
+    "daily":    (TruncDay,      30,         "%Y-%m-%d"),
+    "weekly":   (TruncWeek,     84,         "%Y-%m-%d"),
+    "monthly":  (TruncMonth,    365,        "%Y-%m"),
+    "yearly":   (TruncYear,     365 * 3,    "%Y"),
+}
+
+###########################################################################################
+# Activity rollups
+#
+# VenueHourlyActivity holds visits and new reservations (by created_at) per venue and UTC
+# hour; VenueDailyActivity sums those hours into local dates. Both are rebuilt, never
+# incremented: a run deletes the rows of its window and re-inserts them from the raw
+# tables, so it can be repeated safely. The beat task re-runs the last few hours (late
+# buffered visits land there); backfill_venue_rollups rebuilds any older range.
+###########################################################################################
+def _floor_hour(value):
+    return value.replace(minute=0, second=0, microsecond=0)
+
+
+def _day_bounds(day):
+    start = timezone.make_aware(datetime.combine(day, time.min))
+    return start, timezone.make_aware(datetime.combine(day + timedelta(days=1), time.min))
+
+
+def _rebuild_hourly(start, end):
+    counts = {}
+    cutoff = visit_retention_cutoff()
+    sources = (
+        (0, VenueVisit.objects.filter(timestamp__gte=start, timestamp__lt=end), "timestamp"),
+        (1, Reservation.objects.filter(created_at__gte=start, created_at__lt=end), "created_at"),
+    )
+    for index, queryset, field in sources:
+        rows = (
+            queryset
+            .annotate(bucket=TruncHour(field, tzinfo=dt_timezone.utc))
+            .values("venue_id", "bucket")
+            .annotate(count=Count("id"))
+            .order_by()
+        )
+        for row in rows:
+            counts.setdefault((row["venue_id"], row["bucket"]), [0, 0])[index] = row["count"]
+
+    if cutoff is not None and start < cutoff:
+        # Raw visits before the cutoff may already be compacted away: an hour without any
+        # left keeps its rolled-up visit count instead of dropping to zero.
+        compacted = (
+            VenueHourlyActivity.objects
+            .filter(hour__gte=start, hour__lt=min(end, cutoff), visits__gt=0)
+            .values_list("venue_id", "hour", "visits")
+        )
+        for venue_id, hour, visits in compacted:
+            entry = counts.setdefault((venue_id, hour), [0, 0])
+            entry[0] = entry[0] or visits
+
+    VenueHourlyActivity.objects.filter(hour__gte=start, hour__lt=end).delete()
+    VenueHourlyActivity.objects.bulk_create(
+        [
+            VenueHourlyActivity(venue_id=venue_id, hour=hour, visits=visits, reservations=reservations)
+            for (venue_id, hour), (visits, reservations) in counts.items()
+        ],
+        batch_size=1000,
+    )
+    return len(counts)
+
+
+def _rebuild_daily(first_day, last_day):
+    start, _ = _day_bounds(first_day)
+    _, end = _day_bounds(last_day)
+
+    rows = (
+        VenueHourlyActivity.objects
+        .filter(hour__gte=start, hour__lt=end)
+        .annotate(day=TruncDate("hour"))
+        .values("venue_id", "day")
+        .annotate(visits=Sum("visits"), reservations=Sum("reservations"))
+        .order_by()
+    )
+
+    VenueDailyActivity.objects.filter(date__gte=first_day, date__lte=last_day).delete()
+    VenueDailyActivity.objects.bulk_create(
+        [
+            VenueDailyActivity(
+                venue_id=row["venue_id"], date=row["day"], visits=row["visits"], reservations=row["reservations"]
+            )
+            for row in rows
+        ],
+        batch_size=1000,
+    )
+
+
+def rebuild_rollups(start, end):
+    """
+        Rebuilds the hourly rows of [start, end) (widened to whole hours) and the daily
+        rows of every local date it touches. Returns the number of hourly rows written.
+    """
+    start = _floor_hour(start)
+    end = _floor_hour(end) + (timedelta(hours=1) if end != _floor_hour(end) else timedelta())
+
+    with transaction.atomic():
+        written = _rebuild_hourly(start, end)
+        _rebuild_daily(timezone.localtime(start).date(), timezone.localtime(end - timedelta(microseconds=1)).date())
+    return written
+
+
+def refresh_recent_rollups():
+    """
+        Beat entry point: rebuilds the last ROLLUP_LOOKBACK_HOURS up to the current hour.
+    """
+    now = timezone.now()
+    lookback = getattr(settings, "ROLLUP_LOOKBACK_HOURS", 3)
+    return rebuild_rollups(now - timedelta(hours=lookback), now)
+
+
+def backfill_rollups(first_day, last_day):
+    """
+        Rebuilds whole local days one at a time, oldest first, so each transaction stays
+        small. Returns the number of hourly rows written.
+    """
+    written = 0
+    day = first_day
+    while day <= last_day:
+        written += rebuild_rollups(*_day_bounds(day))
+        day += timedelta(days=1)
+    return written
+
+###########################################################################################
+
+###########################################################################################
+# Visit retention
+#
+# Raw VenueVisit rows are only kept for VISIT_RETENTION_MONTHS whole months. Older local
+# days are compacted one at a time: the day's rollups are rebuilt from its raw rows and
+# the rows are deleted in the same transaction, so a day is either fully raw or fully
+# rolled up. The rollups then keep the analytics history at a fixed size per venue-hour.
+# Raising VISIT_RETENTION_MONTHS later cannot bring compacted rows back.
+###########################################################################################
+def visit_retention_cutoff(months=None):
+    """
+        Start of the oldest local month whose raw visits are kept, or None when retention
+        is disabled (VISIT_RETENTION_MONTHS <= 0).
+    """
+    if months is None:
+        months = getattr(settings, "VISIT_RETENTION_MONTHS", 6)
+    if months <= 0:
+        return None
+
+    today = timezone.localdate()
+    index = today.year * 12 + today.month - 1 - months
+    return timezone.make_aware(datetime(index // 12, index % 12 + 1, 1))
+
+
+def compact_visits(months=None, max_days=None):
+    """
+        Rolls up and deletes raw visits older than the retention cutoff, oldest day first.
+        Returns (days_compacted, visits_deleted).
+    """
+    cutoff = visit_retention_cutoff(months)
+    if cutoff is None:
+        return 0, 0
+
+    days = deleted = 0
+    while max_days is None or days < max_days:
+        oldest = (
+            VenueVisit.objects
+            .filter(timestamp__lt=cutoff)
+            .order_by("timestamp")
+            .values_list("timestamp", flat=True)
+            .first()
+        )
+        if oldest is None:
+            break
+
+        day = timezone.localtime(oldest).date()
+        start, end = _day_bounds(day)
+        with transaction.atomic():
+            rebuild_rollups(start, end)
+            removed, _ = VenueVisit.objects.filter(timestamp__gte=start, timestamp__lt=min(end, cutoff)).delete()
+        days += 1
+        deleted += removed
+
+    return days, deleted
+
+###########################################################################################
+
+###########################################################################################
+def activity_series(venue, grouping):
+    """
+        Returns (start_date, rows) for the dashboard charts, where rows are
+        {"period", "visits", "reservations"} read from VenueDailyActivity.
+    """
+    trunc_fn, days_back, date_fmt = ANALYTICS_GROUPINGS.get(grouping, ANALYTICS_GROUPINGS["daily"])
+    start_date = get_today() - timedelta(days=days_back)
+
+    rows = (
+        VenueDailyActivity.objects
+        .filter(venue=venue, date__gte=start_date)
+        .annotate(period=trunc_fn("date"))
+        .values("period")
+        .annotate(visits=Sum("visits"), reservations=Sum("reservations"))
+        .order_by("period")
+    )
+    return start_date, [
+        {"period": row["period"].strftime(date_fmt), "visits": row["visits"], "reservations": row["reservations"]}
+        for row in rows
+    ]
@@ -0,0 +1,46 @@
+import re
+
+from django.db.models           import Case, Q, Value, When
+
+STATUS_VALUES           = ("pending", "accepted", "rejected", "cancelled")
+ARRIVAL_STATUS_VALUES   = ("pending", "checked_in", "no_show")
+TRIGRAM_INDEX_NAME      = "reservation_search_trgm_idx"
+
+###########################################################################################
+# Dashboard reservation search
+#
+# Reservation.search_text holds the lowercased name, email and phone (plus the phone's
+# digits alone) as " word word ...". On PostgreSQL it carries a pg_trgm GIN index, so the
+# LIKE '%term%' produced by `contains` is an index scan for terms of 3+ characters instead
+# of six ILIKEs over every row of the venue. A leading space in the term turns it into a
+# word-prefix match, which is what the ranking uses.
+###########################################################################################
+def build_search_text(firstname, lastname, email, phone):
+    words = [firstname, lastname, email, phone, re.sub(r"\D", "", phone or "")]
+    return " " + " ".join(word.strip().lower() for word in words if word and word.strip())
+
+
+def search_reservations(queryset, search):
+    """
+        Filters to reservations matching every word of `search` and annotates
+        search_rank (how many words match at a word start). Status words still match
+        the status / arrival status columns, as before.
+    """
+    terms = search.lower().split()
+    if not terms:
+        return queryset
+
+    rank = Value(0)
+    for term in terms:
+        condition = Q(search_text__contains=term)
+        statuses = [value for value in STATUS_VALUES if value.startswith(term)]
+        arrivals = [value for value in ARRIVAL_STATUS_VALUES if value.startswith(term)]
+        if statuses:
+            condition |= Q(status__in=statuses)
+        if arrivals:
+            condition |= Q(arrival_status__in=arrivals)
+
+        queryset = queryset.filter(condition)
+        rank = rank + Case(When(search_text__contains=f" {term}", then=Value(1)), default=Value(0))
+
+    return queryset.annotate(search_rank=rank)
@@ -0,0 +1,240 @@
+import ipaddress
+import json
+import logging
+import threading
+
+from collections            import deque
+from datetime               import datetime
+from time                   import monotonic
+from django.conf            import settings
+from django.contrib.auth    import get_user_model
+from django.core.cache      import cache
+from django.utils           import timezone
+
+from venues.models          import Venue, VenueVisit
+
+logger = logging.getLogger(__name__)
+User = get_user_model()
+
+BUFFER_KEY          = "visits:buffer"
+FLUSH_SCHEDULED_KEY = "visits:flush-scheduled"
+DEDUPE_KEY          = "visits:seen:{venue_id}:{visitor}:{window}"
+
+###########################################################################################
+# Visit ingestion
+#
+# venue_detail only appends a small JSON record to a buffer; flush_visits() drains it in
+# batches, drops repeat visits of the same visitor to the same venue inside one dedupe
+# window and writes the rest with bulk_create.
+#
+#   - "redis"  : a Redis list shared by all web workers, flushed by the Celery beat task
+#                every VISIT_FLUSH_MAX_LATENCY_SECONDS, or sooner once a batch is full.
+#   - "memory" : an in-process ring buffer flushed inline by the appending request once it
+#                is full or its oldest record is older than the max latency. Meant for
+#                single-process deployments and tests; the oldest records are dropped if
+#                it overflows.
+###########################################################################################
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+class RedisVisitBuffer:
+    def __init__(self, url):
+        import redis
+
+        self.client = redis.Redis.from_url(url)
+
+    def append(self, record):
+        return self.client.rpush(BUFFER_KEY, record)
+
+    def drain(self, limit):
+        pipeline = self.client.pipeline()       # MULTI/EXEC: read and trim atomically
+        pipeline.lrange(BUFFER_KEY, 0, limit - 1)
+        pipeline.ltrim(BUFFER_KEY, limit, -1)
+        records, _ = pipeline.execute()
+        return [record.decode() for record in records]
+
+    def restore(self, records):
+        if records:
+            self.client.lpush(BUFFER_KEY, *reversed(records))
+
+    def is_due(self):
+        return False    # the beat task enforces the max latency
+
+
+class MemoryVisitBuffer:
+    def __init__(self, max_size):
+        self.records    = deque(maxlen=max_size)
+        self.lock       = threading.Lock()
+        self.oldest_at  = None
+
+    def append(self, record):
+        with self.lock:
+            if not self.records:
+                self.oldest_at = monotonic()
+            self.records.append(record)
+            return len(self.records)
+
+    def drain(self, limit):
+        with self.lock:
+            records = [self.records.popleft() for _ in range(min(limit, len(self.records)))]
+            self.oldest_at = monotonic() if self.records else None
+            return records
+
+    def restore(self, records):
+        with self.lock:
+            self.records.extendleft(reversed(records))
+            self.oldest_at = self.oldest_at or monotonic()
+
+    def is_due(self):
+        max_latency = _setting("VISIT_FLUSH_MAX_LATENCY_SECONDS", 10)
+        return self.oldest_at is not None and monotonic() - self.oldest_at >= max_latency
+
+
+_buffers = {}
+
+def get_visit_buffer():
+    backend = _setting("VISIT_BUFFER_BACKEND", "redis")
+    if backend not in _buffers:
+        if backend == "memory":
+            _buffers[backend] = MemoryVisitBuffer(_setting("VISIT_BUFFER_MAX_SIZE", 100_000))
+        else:
+            _buffers[backend] = RedisVisitBuffer(_setting("VISIT_BUFFER_REDIS_URL", settings.CELERY_BROKER_URL))
+    return _buffers[backend]
+
+###########################################################################################
+
+###########################################################################################
+def valid_ip(value):
+    """
+        The normalized address, or None for anything that is not an IP address (e.g. a
+        forged X-Forwarded-For), so one bad value can never fail a batch insert.
+    """
+    try:
+        return str(ipaddress.ip_address(str(value).strip())) if value else None
+    except ValueError:
+        return None
+
+
+def record_visit(venue_id, user_id, session_key, ip_address):
+    """
+        Buffers one visit. Never touches the database.
+    """
+    record = json.dumps({
+        "venue_id":     venue_id,
+        "user_id":      user_id,
+        "session_key":  session_key,
+        "ip_address":   valid_ip(ip_address),
+        "timestamp":    timezone.now().isoformat(),
+    })
+
+    buffer = get_visit_buffer()
+    size = buffer.append(record)
+    batch_size = _setting("VISIT_FLUSH_BATCH_SIZE", 5000)
+
+    if isinstance(buffer, MemoryVisitBuffer):
+        if size >= batch_size or buffer.is_due():
+            flush_visits()
+    elif size >= batch_size and cache.add(FLUSH_SCHEDULED_KEY, 1, _setting("VISIT_FLUSH_MAX_LATENCY_SECONDS", 10)):
+        from venues.tasks import flush_venue_visits
+
+        flush_venue_visits.delay()
+
+
+def _decode(item):
+    """
+        One buffered record, or None when it cannot be decoded (it is dropped).
+    """
+    try:
+        record = json.loads(item)
+        return {
+            "venue_id":     int(record["venue_id"]),
+            "user_id":      int(record["user_id"]) if record["user_id"] else None,
+            "session_key":  str(record["session_key"])[:40] if record["session_key"] else None,
+            "ip_address":   valid_ip(record["ip_address"]),
+            "timestamp":    datetime.fromisoformat(record["timestamp"]),
+        }
+    except (KeyError, TypeError, ValueError, AttributeError):
+        logger.warning("Dropping undecodable buffered venue visit %r", item)
+        return None
+
+
+def _visitor(record):
+    if record["session_key"]:
+        return f"s:{record['session_key']}"
+    if record["user_id"]:
+        return f"u:{record['user_id']}"
+    return f"ip:{record['ip_address']}"
+
+
+def _dedupe(records):
+    """
+        Keeps the first visit per (venue, visitor, window), both inside the batch and
+        against visits already written by earlier flushes. Returns {dedupe_key: record};
+        the keys are marked as seen only once the batch is written.
+    """
+    window_seconds = _setting("VISIT_DEDUPE_WINDOW_SECONDS", 30 * 60)
+
+    first_by_key = {}
+    for record in records:
+        window = int(record["timestamp"].timestamp()) // window_seconds
+        key = DEDUPE_KEY.format(venue_id=record["venue_id"], visitor=_visitor(record), window=window)
+        first_by_key.setdefault(key, record)
+
+    already_seen = cache.get_many(list(first_by_key))
+    return {key: record for key, record in first_by_key.items() if key not in already_seen}
+
+
+def flush_visits(max_batches=None):
+    """
+        Drains the buffer in batches of VISIT_FLUSH_BATCH_SIZE. Returns the number of
+        VenueVisit rows written.
+    """
+    buffer = get_visit_buffer()
+    batch_size = _setting("VISIT_FLUSH_BATCH_SIZE", 5000)
+    written = batches = 0
+
+    while max_batches is None or batches < max_batches:
+        raw = buffer.drain(batch_size)
+        if not raw:
+            break
+        batches += 1
+
+        # Bad records are dropped here rather than restored: a record that fails every
+        # flush would otherwise block the buffer for good.
+        decoded = [(item, _decode(item)) for item in raw]
+        raw = [item for item, record in decoded if record is not None]
+        records = [record for _, record in decoded if record is not None]
+
+        try:
+            fresh = _dedupe(records)
+            venue_ids = set(
+                Venue.objects.filter(id__in={r["venue_id"] for r in fresh.values()}).values_list("id", flat=True)
+            )
+            user_ids = set(
+                User.objects.filter(id__in={r["user_id"] for r in fresh.values() if r["user_id"]})
+                .values_list("id", flat=True)
+            )
+            visits = [
+                VenueVisit(
+                    venue_id    = record["venue_id"],
+                    user_id     = record["user_id"] if record["user_id"] in user_ids else None,
+                    session_key = record["session_key"],
+                    ip_address  = record["ip_address"],
+                    timestamp   = record["timestamp"],
+                )
+                for record in fresh.values()
+                if record["venue_id"] in venue_ids
+            ]
+            VenueVisit.objects.bulk_create(visits, batch_size=1000)
+            cache.set_many({key: 1 for key in fresh}, _setting("VISIT_DEDUPE_WINDOW_SECONDS", 30 * 60))
+            written += len(visits)
+        except Exception:
+            buffer.restore(raw)
+            logger.exception("Failed to flush %d buffered venue visits", len(raw))
+            raise
+
+        if len(decoded) < batch_size:
+            break
+
+    return written
@@ -1,4 +1,5 @@
-from venues.models import WorkingDay
+from venues.models                 import WorkingDay
+from venues.services.availability  import invalidate_schedule
 
 def ensure_working_days(venue, *, default_closed=True):
     """
@@ -20,4 +21,5 @@ def ensure_working_days(venue, *, default_closed=True):
         if w not in existing
     ]
     if to_create:
-        WorkingDay.objects.bulk_create(to_create)
\ No newline at end of file
+        WorkingDay.objects.bulk_create(to_create)
+        invalidate_schedule(venue.id)
\ No newline at end of file
@@ -1,11 +1,17 @@
+from collections                import defaultdict
 from django.db                  import transaction
-from django.db.models.signals   import pre_save, post_save
+from django.db.models.signals   import pre_save, post_save, post_delete
 from django.dispatch            import receiver
 from django.utils               import timezone
 from django.urls                import reverse
-from .models                    import Reservation, ReservationOutboxEvent
-from .tasks                     import process_outbox_event
+from .models                    import Reservation, ReservationOutboxEvent, Review, VenueClosedTime, VenueImage, VenueMenuImage, WorkingDay
+from .services.availability     import invalidate_schedule, refresh_day
+from .services.dashboard_counts import apply_change, reservation_state, state_from_values
+from .services.images           import image_files, release_image_files
+from .services.listing_cache    import bump_catalog_version, bump_venue_version
+from .services.outbox           import schedule_dispatch
 
+import hashlib
 import logging
 
 logger = logging.getLogger(__name__)
@@ -42,24 +48,28 @@ def build_reservation_payload(instance):
 # PRE - SAVE RESERVATION
 ###########################################################################################
 @receiver(pre_save, sender=Reservation)
-def detect_reservation_changes(sender, instance, **kwargs):
-    if not instance.pk:
+def detect_reservation_changes(sender, instance, update_fields=None, **kwargs):
+    if instance._state.adding:
         instance._old_values = None
+        instance._old_counts_values = None
         return
 
-    try:
-        old_instance            = Reservation.objects.get(pk=instance.pk)
-        instance._old_values    = {
-            'date':             old_instance.date,
-            'time':             old_instance.time,
-            'guests':           old_instance.guests,
-            'status':           old_instance.status,
-            'arrival_status':   old_instance.arrival_status,
-        }
-        
-    except Reservation.DoesNotExist:
-        
-        instance._old_values = None
+    # The snapshot taken when the row was loaded (Reservation.from_db) replaces the
+    # SELECT of the old row; it is only needed for instances built by hand or with
+    # deferred tracked fields.
+    old_values = getattr(instance, "_loaded_values", None) or {}
+    if len(old_values) < len(Reservation.TRACKED_FIELDS):
+        old_instance = Reservation.objects.filter(pk=instance.pk).first()
+        if old_instance is None:
+            instance._old_values = None
+            instance._old_counts_values = None
+            return
+        old_values = old_instance._loaded_values
+
+    fields = None
+    if update_fields is not None:
+        fields = {Reservation._meta.get_field(name).attname for name in update_fields}
+    instance._track_change(old_values, fields)
         
 ###########################################################################################
 
@@ -85,11 +95,9 @@ def get_instance_changes(instance):
 ###########################################################################################
 
 ###########################################################################################
-@receiver(post_save, sender=Reservation)
-def reservation_created_or_updated(sender, instance: Reservation, created, **kwargs):
+def build_outbox_event(instance, created):
     """
-        Trigger both email notifications and WebSocket notifications
-        when a Reservation is created or updated.
+        The (unsaved) outbox row announcing one reservation change on every channel.
     """
     
     venue_id        = instance.venue_id
@@ -122,29 +130,72 @@ def reservation_created_or_updated(sender, instance: Reservation, created, **kwa
 
     event_timestamp = reservation_data.get('updated_at')
 
-    channel_specs = [
-        (ReservationOutboxEvent.CHANNEL_WEBSOCKET, f"{event_name}.websocket"),
-        (ReservationOutboxEvent.CHANNEL_EMAIL, f"{event_name}.email"),
-    ]
+    # One row per change carries both channels; its `delivered` bitmap tracks the fan-out.
+    return ReservationOutboxEvent(
+        reservation     = instance,
+        venue_id        = venue_id,
+        event_type      = event_name,
+        channel         = ReservationOutboxEvent.CHANNEL_BOTH,
+        payload         = payload,
+        idempotency_key = f"reservation:{instance.id}:{event_name}:{event_timestamp}",
+        next_retry_at   = timezone.now(),
+    )
 
-    for channel, channel_event_type in channel_specs:
-        idempotency_key = f"reservation:{instance.id}:{event_name}:{event_timestamp}:{channel}"
-
-        outbox_event, created_outbox = ReservationOutboxEvent.objects.get_or_create(
-            idempotency_key=idempotency_key,
-            defaults={
-                "reservation": instance,
-                "venue_id": venue_id,
-                "event_type": channel_event_type,
-                "channel": channel,
-                "payload": payload,
-                "status": ReservationOutboxEvent.STATUS_PENDING,
-                "next_retry_at": timezone.now(),
-            },
-        )
 
-        if created_outbox or outbox_event.status in (ReservationOutboxEvent.STATUS_PENDING, ReservationOutboxEvent.STATUS_FAILED):
-            transaction.on_commit(lambda event_id=outbox_event.id: process_outbox_event.delay(event_id))
+def queue_outbox_events(events):
+    # A single INSERT: a replayed change with the same idempotency key is ignored.
+    ReservationOutboxEvent.objects.bulk_create(events, ignore_conflicts=True)
+
+    # One batched dispatcher run serves the whole burst of writes, see services/outbox.py
+    transaction.on_commit(schedule_dispatch)
+
+
+@receiver(post_save, sender=Reservation)
+def reservation_created_or_updated(sender, instance: Reservation, created, **kwargs):
+    """
+        Trigger both email notifications and WebSocket notifications
+        when a Reservation is created or updated.
+    """
+    queue_outbox_events([build_outbox_event(instance, created)])
+
+
+def build_batch_events(events):
+    """
+        Folds unsaved per-reservation outbox rows into one EVENT_BATCH row per venue.
+    """
+    by_venue = defaultdict(list)
+    for event in events:
+        by_venue[event.venue_id].append(event)
+
+    batches = []
+    for venue_id, group in by_venue.items():
+        digest = hashlib.sha1("|".join(sorted(event.idempotency_key for event in group)).encode()).hexdigest()
+        batches.append(ReservationOutboxEvent(
+            venue_id        = venue_id,
+            event_type      = ReservationOutboxEvent.EVENT_BATCH,
+            channel         = ReservationOutboxEvent.CHANNEL_BOTH,
+            payload         = {"event": ReservationOutboxEvent.EVENT_BATCH, "events": [event.payload for event in group]},
+            idempotency_key = f"venue:{venue_id}:batch:{digest}",
+            next_retry_at   = timezone.now(),
+        ))
+    return batches
+
+
+def reservations_updated(reservations, batched=False):
+    """
+        ReservationQuerySet.update() counterpart of the post_save receivers: the same
+        outbox events (in one INSERT, folded into one per venue when `batched`), counter
+        moves and availability refreshes for rows changed in bulk. Each reservation
+        carries its _track_change() state.
+    """
+    if not reservations:
+        return
+
+    events = [build_outbox_event(reservation, False) for reservation in reservations]
+    queue_outbox_events(build_batch_events(events) if batched else events)
+    for reservation in reservations:
+        refresh_reservation_availability(Reservation, reservation)
+        update_dashboard_counters(Reservation, reservation, False)
 
 from .models import Venue, WorkingDay
 
@@ -180,6 +231,7 @@ def ensure_working_days(venue):
 
     if missing_days:
         WorkingDay.objects.bulk_create(missing_days)
+        invalidate_schedule(venue.id)
 
 
 @receiver(post_save, sender=Venue)
@@ -189,4 +241,103 @@ def create_default_working_days(sender, instance, created, **kwargs):
 
 ###########################################################################################
 
-###########################################################################################
\ No newline at end of file
+###########################################################################################
+
+
+###########################################################################################
+# AVAILABILITY ENGINE - keep cached slot masks in sync with writes
+###########################################################################################
+def _refresh_availability_days(venue_id, *days):
+    for day in {day for day in days if day}:
+        transaction.on_commit(lambda day=day: refresh_day(venue_id, day), robust=True)
+
+
+@receiver(post_save, sender=Reservation)
+def refresh_reservation_availability(sender, instance, **kwargs):
+    old_values = getattr(instance, "_old_values", None) or {}
+    _refresh_availability_days(instance.venue_id, instance.date, old_values.get("date"))
+
+
+@receiver(post_delete, sender=Reservation)
+def clear_reservation_availability(sender, instance, **kwargs):
+    _refresh_availability_days(instance.venue_id, instance.date)
+
+
+@receiver(post_save, sender=VenueClosedTime)
+@receiver(post_delete, sender=VenueClosedTime)
+def refresh_closed_time_availability(sender, instance, **kwargs):
+    _refresh_availability_days(instance.venue_id, instance.date, getattr(instance, "_original_date", None))
+    instance._original_date = instance.date
+
+
+@receiver(post_save, sender=WorkingDay)
+@receiver(post_delete, sender=WorkingDay)
+def invalidate_working_day_availability(sender, instance, **kwargs):
+    venue_id = instance.venue_id
+    transaction.on_commit(lambda: invalidate_schedule(venue_id), robust=True)
+
+
+###########################################################################################
+# LISTING CACHE - move the versions that cached homepage listings are checked against
+###########################################################################################
+@receiver(post_save, sender=Venue)
+@receiver(post_delete, sender=Venue)
+def bump_venue_listing_version(sender, instance, **kwargs):
+    venue_id = instance.pk
+
+    def bump():
+        bump_catalog_version()
+        bump_venue_version(venue_id)
+
+    transaction.on_commit(bump, robust=True)
+
+
+@receiver(post_save, sender=VenueImage)
+@receiver(post_delete, sender=VenueImage)
+@receiver(post_save, sender=VenueMenuImage)
+@receiver(post_delete, sender=VenueMenuImage)
+@receiver(post_save, sender=Review)
+@receiver(post_delete, sender=Review)
+def bump_venue_content_version(sender, instance, **kwargs):
+    venue_id = instance.venue_id
+    transaction.on_commit(lambda: bump_venue_version(venue_id), robust=True)
+
+
+###########################################################################################
+# IMAGE STORAGE - stored files are shared by content, release them with their last row
+###########################################################################################
+@receiver(post_delete, sender=VenueImage)
+@receiver(post_delete, sender=VenueMenuImage)
+def release_venue_image_files(sender, instance, **kwargs):
+    content_hash, paths = instance.content_hash, image_files(instance)
+    storage = instance.image.storage
+    transaction.on_commit(lambda: release_image_files(content_hash, paths, storage), robust=True)
+
+
+###########################################################################################
+# DASHBOARD COUNTERS - move the cached per-venue bucket counts
+###########################################################################################
+def _written_state(instance):
+    # Fields left out of update_fields keep their old database value.
+    old_values  = getattr(instance, "_old_counts_values", None)
+    fields      = getattr(instance, "_written_fields", None)
+    if old_values is None or fields is None:
+        return reservation_state(instance)
+    return state_from_values({
+        field: getattr(instance, field) if field in fields else old_values[field] for field in Reservation.TRACKED_FIELDS
+    })
+
+
+@receiver(post_save, sender=Reservation)
+def update_dashboard_counters(sender, instance, created, **kwargs):
+    old_values = None if created else getattr(instance, "_old_counts_values", None)
+    old_state = state_from_values(old_values) if old_values else None
+    new_state = _written_state(instance)
+    if old_state != new_state:
+        transaction.on_commit(lambda: apply_change(old_state, new_state), robust=True)
+
+
+@receiver(post_delete, sender=Reservation)
+def remove_from_dashboard_counters(sender, instance, **kwargs):
+    old_state = reservation_state(instance)
+    transaction.on_commit(lambda: apply_change(old_state, None), robust=True)
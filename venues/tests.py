@@ -1,16 +1,50 @@
+import json
+import os
+import shutil
+import tempfile
+from datetime import date, time, timedelta
+from io import BytesIO, StringIO
+from unittest import mock
+
 from django.contrib.auth import get_user_model
+from django.core import mail
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.mail import get_connection
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils.datastructures import MultiValueDict
+from django.utils import timezone
+from PIL import Image
 from rest_framework import status
-from rest_framework.test import APITestCase
+from rest_framework.test import APIRequestFactory, APITestCase
 from rest_framework_simplejwt.tokens import RefreshToken
 
 from emails_manager.models import VenueEmailVerificationCode
-from venues.models import Reservation, Venue, WorkingDay
+from emails_manager.utils import send_messages
+from venues.api.dashboard_helpers import _analytics_payload, _dashboard_reservations_queryset
+from venues.api.pagination import encode_cursor
+from venues.api.views import VENUE_LIST_PAGE_SIZE, VenueListAPI, _handle_dashboard_image_group, _upcoming_reservations_queryset
+from venues.models import GeocodedAddress, Reservation, ReservationOutboxEvent, Review, Venue, VenueClosedTime, VenueDailyActivity, VenueImage, VenueMenuImage, VenueUpdateRequest, VenueVisit, WorkingDay
+from venues.services.availability import _masks_from_db, get_day_masks, reserved_slots_queryset
+from venues.services.dashboard_counts import count_from_db, get_counts
+from venues.services.geocoding import GEOCODERS, GeocoderUnavailable, TokenBucket, geocode, normalize_address
+from venues.services.images import collect_garbage, image_files, image_srcset, image_url
+from venues.services.listing_cache import bump_venue_version
+from venues.services.outbox import dispatch_due_events, purge_sent_events, schedule_dispatch
+from venues.services.outbox_relay import _next_retry_in
+from venues.services.rollups import backfill_rollups, compact_visits, refresh_recent_rollups
+from venues.services.search import search_reservations
+from venues.services.visits import flush_visits, get_visit_buffer, record_visit
 
 User = get_user_model()
 
 
 class VenuesAPITestCase(APITestCase):
     def setUp(self):
+        cache.clear()
         self.user = User.objects.create_user(
             username="reservation_user",
             email="reservation_user@example.com",
@@ -33,7 +67,7 @@ class VenuesAPITestCase(APITestCase):
     def test_venue_list_is_public(self):
         response = self.client.get(self.list_url)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertGreaterEqual(len(response.data["results"]), 1)
+        self.assertGreaterEqual(len(response.json()["results"]), 1)
 
     def test_venue_detail_returns_venue(self):
         response = self.client.get(self.detail_url)
@@ -316,6 +350,94 @@ class VenuesAPITestCase(APITestCase):
         reservation.refresh_from_db()
         self.assertFalse(reservation.seen)
 
+    def test_venue_admin_can_bulk_update_reservations(self):
+        owner = User.objects.create_user(
+            username="venueowner_bulk",
+            email="owner_bulk@example.com",
+            password="pass1234",
+            user_type="venue_admin",
+        )
+        self.venue.owner = owner
+        self.venue.save()
+        other_venue = Venue.objects.create(name="Other Venue", kind="bar", location="Elsewhere")
+        reservations = [
+            Reservation.objects.create(
+                user=self.user, venue=self.venue, firstname="Jane", lastname="Doe", email="jane.doe@example.com",
+                phone="+1234567890", date=date(2030, 1, 1), time=time(12 + index, 0), guests=2,
+            )
+            for index in range(4)
+        ]
+        foreign = Reservation.objects.create(
+            user=self.user, venue=other_venue, firstname="Jane", lastname="Doe", email="jane.doe@example.com",
+            phone="+1234567890", date=date(2030, 1, 1), time=time(12, 0), guests=2,
+        )
+        ids = [reservation.id for reservation in reservations]
+        self.client.login(username="venueowner_bulk", password="pass1234")
+
+        response = self.client.post(
+            "/api/v1/reservations/bulk-status/",
+            {"updates": [{"id": ids[0], "status": "accepted"}, {"id": ids[1], "status": "accepted"},
+                         {"id": ids[2], "status": "rejected"}, {"id": foreign.id, "status": "accepted"}]},
+            format="json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(sorted(item["id"] for item in response.json()["updated"]), ids[:3])
+        self.assertEqual(response.json()["skipped"], [foreign.id])
+        self.assertEqual(
+            dict(Reservation.objects.filter(id__in=ids + [foreign.id]).values_list("id", "status")),
+            {ids[0]: "accepted", ids[1]: "accepted", ids[2]: "rejected", ids[3]: "pending", foreign.id: "pending"},
+        )
+
+        # Three changes, one outbox event for the venue.
+        event = ReservationOutboxEvent.objects.get(event_type=ReservationOutboxEvent.EVENT_BATCH)
+        self.assertEqual(event.venue_id, self.venue.id)
+        self.assertEqual(sorted(message["reservation"]["id"] for message in event.messages()), ids[:3])
+
+        # Only accepted reservations can be checked in.
+        response = self.client.post(
+            "/api/v1/reservations/bulk-arrival/", {"ids": ids, "arrival_status": "checked_in"}, format="json"
+        )
+        self.assertEqual(sorted(item["id"] for item in response.json()["updated"]), ids[:2])
+        self.assertEqual(sorted(response.json()["skipped"]), ids[2:])
+
+        response = self.client.post("/api/v1/reservations/bulk-move-to-requests/", {"ids": ids[:2]}, format="json")
+        self.assertEqual(len(response.json()["updated"]), 2)
+        self.assertFalse(Reservation.objects.filter(id__in=ids[:2]).exclude(status="pending", arrival_status="pending").exists())
+
+        response = self.client.post("/api/v1/reservations/bulk-seen/", {"ids": ids, "state": "maybe"}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        # Malformed bodies are rejected, never a server error.
+        for body in (ids, {"updates": ids}, {"updates": {"id": ids[0]}}):
+            with self.subTest(body=body):
+                response = self.client.post("/api/v1/reservations/bulk-status/", body, format="json")
+                self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    @mock.patch("venues.services.outbox.build_reservation_emails", return_value=[])
+    @mock.patch("venues.services.outbox.send_venue_notification_batch", return_value=True)
+    def test_batched_outbox_event_delivers_every_reservation(self, send_batch, build_emails):
+        owner = User.objects.create_user(username="venueowner_batch", email="owner_batch@example.com", password="pass1234")
+        self.venue.owner = owner
+        self.venue.save()
+        reservations = [
+            Reservation.objects.create(
+                user=self.user, venue=self.venue, firstname="Jane", lastname="Doe", email="jane.doe@example.com",
+                phone="+1234567890", date=date(2030, 1, 1), time=time(12 + index, 0), guests=2,
+            )
+            for index in range(3)
+        ]
+        ReservationOutboxEvent.objects.update(status=ReservationOutboxEvent.STATUS_SENT)
+
+        Reservation.objects.filter(venue=self.venue).transition(
+            [([reservation.id for reservation in reservations], {"status": "accepted"})], editor=owner
+        )
+        self.assertEqual(dispatch_due_events(), 1)
+
+        send_batch.assert_called_once()
+        self.assertEqual(len(send_batch.call_args.args[1]), 3)
+        self.assertEqual(build_emails.call_count, 3)
+        self.assertTrue(all(call.kwargs["editor"] == owner for call in build_emails.call_args_list))
+
     def test_venue_dashboard_bootstrap_is_compact(self):
         owner = User.objects.create_user(
             username="dashboardowner",
@@ -386,6 +508,52 @@ class VenuesAPITestCase(APITestCase):
         self.assertNotIn("email", response.data["results"][0])
         self.assertNotIn("special_requests", response.data["results"][0])
 
+    def test_dashboard_reservations_cursor_pagination(self):
+        owner = User.objects.create_user(
+            username="dashboardowner4",
+            email="dashboardowner4@example.com",
+            password="pass1234",
+            user_type="venue_admin",
+        )
+        self.venue.owner = owner
+        self.venue.save()
+        for index in range(7):
+            Reservation.objects.create(
+                user=self.user,
+                venue=self.venue,
+                firstname=f"Jane{index % 3}",
+                lastname="Doe",
+                email=f"jane{index}@example.com",
+                phone="+1234567890",
+                date=date(2020, 1, 1 + index),
+                time=time(18, 0),
+                guests=2,
+            )
+
+        self.client.login(username="dashboardowner4", password="pass1234")
+        url = f"/api/v1/venues/{self.venue.id}/dashboard-reservations/"
+        params = {"bucket": "history", "pagination": "cursor", "page_size": 3, "sort": "customer_name", "direction": "desc"}
+
+        seen_ids, cursor = [], None
+        while True:
+            response = self.client.get(url, {**params, **({"cursor": cursor} if cursor else {})})
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(response.data["approximate_count"], 7)
+            seen_ids += [item["id"] for item in response.data["results"]]
+            cursor = response.data["next_cursor"]
+            if not cursor:
+                break
+
+        expected = list(
+            self.venue.reservations.order_by("-firstname", "-lastname", "-id").values_list("id", flat=True)
+        )
+        self.assertEqual(seen_ids, expected)
+
+        for bad_cursor in ("not-a-cursor", encode_cursor([{"a": 1}, [], 1]), encode_cursor(["a", "b", "c"])):
+            with self.subTest(cursor=bad_cursor):
+                response = self.client.get(url, {**params, "cursor": bad_cursor})
+                self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
     def test_reservation_details_returns_sensitive_fields_on_demand(self):
         owner = User.objects.create_user(
             username="dashboardowner3",
@@ -448,3 +616,1001 @@ class VenuesAPITestCase(APITestCase):
         self.assertEqual(monday.open_time.strftime("%H:%M"), "08:00")
         self.assertEqual(monday.close_time.strftime("%H:%M"), "16:00")
         self.assertTrue(tuesday.is_closed)
+
+
+class AvailabilityEngineTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username="slots_user",
+            email="slots_user@example.com",
+            password="pass1234",
+        )
+        self.venue = Venue.objects.create(
+            name="Slots Venue",
+            kind="bar",
+            location="1 Slot Street",
+            latitude=37.9,
+            longitude=23.7,
+        )
+        self.business_date = date(2030, 1, 1)
+        WorkingDay.objects.filter(venue=self.venue, weekday=self.business_date.weekday()).update(
+            open_time=time(20, 0),
+            close_time=time(1, 0),
+            closes_next_day=True,
+        )
+
+    def _reserve(self, slot_date, slot_time, username):
+        user = User.objects.create_user(username=username, email=f"{username}@example.com", password="pass1234")
+        with self.captureOnCommitCallbacks(execute=True):
+            return Reservation.objects.create(
+                user=user,
+                venue=self.venue,
+                firstname="Jane",
+                lastname="Doe",
+                email="jane.doe@example.com",
+                phone="+1234567890",
+                date=slot_date,
+                time=slot_time,
+                guests=2,
+            )
+
+    def test_cached_slots_match_database_computation(self):
+        self._reserve(self.business_date, time(21, 0), "slots_a")
+        VenueClosedTime.objects.create(venue=self.venue, date=date(2030, 1, 2), time=time(0, 30))
+
+        expected = self.venue.compute_available_time_slots(self.business_date)
+        self.assertEqual(self.venue.get_available_time_slots(self.business_date), expected)
+        self.assertEqual(len(expected), 10)
+        self.assertTrue(expected[-1]["is_next_day"])
+
+        with self.assertNumQueries(0):
+            self.assertEqual(self.venue.get_available_time_slots(self.business_date), expected)
+
+    def test_reservation_writes_update_cached_day(self):
+        self.venue.get_available_time_slots(self.business_date)
+
+        reservation = self._reserve(date(2030, 1, 2), time(0, 0), "slots_b")
+        slots = {(s["slot_date"], s["time"]): s for s in self.venue.get_available_time_slots(self.business_date)}
+        self.assertTrue(slots[(date(2030, 1, 2), time(0, 0))]["is_reserved"])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            reservation.delete()
+        slots = {(s["slot_date"], s["time"]): s for s in self.venue.get_available_time_slots(self.business_date)}
+        self.assertTrue(slots[(date(2030, 1, 2), time(0, 0))]["is_available"])
+
+    def test_stale_read_through_fill_keeps_the_refreshed_day(self):
+        day = date(2030, 1, 2)
+        stale = _masks_from_db([self.venue.id], [day])
+        self._reserve(day, time(0, 0), "slots_stale")      # refresh_day() stores the new masks
+        fresh = get_day_masks(self.venue.id, [day])
+
+        # A reader that missed and loaded before the reservation committed fills afterwards.
+        with mock.patch.object(cache, "get_many", return_value={}), \
+                mock.patch("venues.services.availability._masks_from_db", return_value=stale):
+            self.assertEqual(get_day_masks(self.venue.id, [day]), {day: stale[(self.venue.id, day)]})
+
+        self.assertNotEqual(fresh, {day: stale[(self.venue.id, day)]})
+        self.assertEqual(get_day_masks(self.venue.id, [day]), fresh)
+
+    def test_working_day_change_invalidates_schedule(self):
+        self.assertEqual(len(self.venue.get_available_time_slots(self.business_date)), 10)
+
+        working_day = WorkingDay.objects.get(venue=self.venue, weekday=self.business_date.weekday())
+        working_day.is_closed = True
+        with self.captureOnCommitCallbacks(execute=True):
+            working_day.save()
+
+        self.assertEqual(self.venue.get_available_time_slots(self.business_date), [])
+
+    def test_range_endpoint_loads_whole_range_in_three_queries(self):
+        self._reserve(date(2030, 1, 2), time(0, 0), "slots_c")
+        cache.clear()
+
+        # 1 venue lookup + WorkingDay + Reservation + VenueClosedTime for all 30 days
+        with self.assertNumQueries(4):
+            response = self.client.get(
+                f"/api/v1/venues/{self.venue.id}/availability/",
+                {"start": "2030-01-01", "end": "2030-01-30", "detail": "1"},
+            )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data["days"]), 30)
+        first_day = response.data["days"][0]
+        self.assertEqual(first_day["total_slots"], 10)
+        self.assertEqual(first_day["free_slots"], 9)
+        self.assertEqual(first_day["slots"][-2]["slot_date"], "2030-01-02")
+        self.assertTrue(first_day["slots"][-2]["is_reserved"])
+        self.assertNotIn("slots", self.client.get(
+            f"/api/v1/venues/{self.venue.id}/availability/", {"start": "2030-01-01", "end": "2030-01-02"}
+        ).data["days"][0])
+
+    def test_free_venue_search_follows_reservations_and_filters(self):
+        restaurant = Venue.objects.create(name="Free Restaurant", kind="restaurant", location="2 Slot Street")
+        WorkingDay.objects.filter(venue=restaurant, weekday=self.business_date.weekday()).update(
+            is_closed=False,
+            open_time=time(12, 0),
+            close_time=time(23, 0),
+        )
+        url = "/api/v1/venues/free/"
+
+        response = self.client.get(url, {"date": "2030-01-01", "time": "21:00"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([v["id"] for v in response.data["results"]], [restaurant.id, self.venue.id])
+
+        # After-midnight tail of the previous business date counts for the calendar date.
+        response = self.client.get(url, {"date": "2030-01-02", "time": "00:30"})
+        self.assertEqual([v["id"] for v in response.data["results"]], [self.venue.id])
+
+        self._reserve(self.business_date, time(21, 0), "free_a")
+        # Rebuild from the warm per-venue caches: venue ids + the filtered listing.
+        with self.assertNumQueries(2):
+            response = self.client.get(url, {"date": "2030-01-01", "time": "21:00", "kind": "cafe"})
+        self.assertEqual(response.data["count"], 0)
+
+        with self.assertNumQueries(1):
+            response = self.client.get(url, {"date": "2030-01-01", "time": "21:00", "availability": "available"})
+        self.assertEqual([v["id"] for v in response.data["results"]], [restaurant.id])
+
+        self.assertEqual(
+            self.client.get(url, {"date": "2030-01-01", "time": "21:15"}).status_code,
+            status.HTTP_400_BAD_REQUEST,
+        )
+
+
+class VenueMapAPITestCase(APITestCase):
+    def setUp(self):
+        self.athens = Venue.objects.create(
+            name="Athens Bar", kind="bar", location="Athens", latitude=37.9838, longitude=23.7275
+        )
+        self.piraeus = Venue.objects.create(
+            name="Piraeus Restaurant", kind="restaurant", location="Piraeus", latitude=37.9420, longitude=23.6465
+        )
+        self.thessaloniki = Venue.objects.create(
+            name="Thessaloniki Cafe", kind="cafe", location="Thessaloniki", latitude=40.6401, longitude=22.9444
+        )
+        self.url = "/api/v1/venues/map/"
+
+    def test_geohash_follows_coordinates(self):
+        self.assertEqual(len(self.athens.geohash), 9)
+        self.athens.latitude, self.athens.longitude = 57.64911, 10.40744
+        self.athens.save(update_fields=["latitude", "longitude"])
+        self.athens.refresh_from_db()
+        self.assertEqual(self.athens.geohash, "u4pruydqq")
+
+    def test_bbox_radius_and_clusters(self):
+        response = self.client.get(self.url, {"bbox": "23.5,37.8,23.9,38.1", "zoom": "15"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual({v["id"] for v in response.data["venues"]}, {self.athens.id, self.piraeus.id})
+
+        response = self.client.get(self.url, {"bbox": "23.5,37.8,23.9,38.1", "kind": "cafe", "zoom": "15"})
+        self.assertEqual([v["id"] for v in response.data["venues"]], [self.athens.id])
+
+        response = self.client.get(self.url, {"lat": "37.98", "lng": "23.72", "radius": "5"})
+        self.assertEqual([v["id"] for v in response.data["venues"]], [self.athens.id])
+
+        response = self.client.get(self.url, {"bbox": "19,34,29,42", "zoom": "5"})
+        self.assertEqual(response.data["count"], 3)
+        self.assertEqual(sorted(c["count"] for c in response.data["clusters"]), [1, 2])
+
+        response = self.client.get(self.url, {"lat": "37.98"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class VenueListQueryBudgetTestCase(APITestCase):
+    # venues + images + menu images + reviews (and a COUNT for the paginated API)
+    LIST_QUERY_BUDGET = 4
+    PAGINATED_QUERY_BUDGET = 5
+
+    def setUp(self):
+        cache.clear()
+
+    def _add_venues(self, count):
+        for index in range(count):
+            venue = Venue.objects.create(
+                name=f"Budget Venue {index}", kind="restaurant", location="Budget Street", latitude=37.9, longitude=23.7
+            )
+            VenueImage.objects.bulk_create([
+                VenueImage(venue=venue, image=f"venues/{venue.id}/{order}.webp", order=order, approved=True)
+                for order in range(2)
+            ])
+            VenueMenuImage.objects.bulk_create([
+                VenueMenuImage(venue=venue, image=f"menus/{venue.id}/0.webp", approved=True)
+            ])
+            reviewer = User.objects.create_user(username=f"budget_{venue.id}", password="pass1234")
+            Review.objects.create(venue=venue, user=reviewer, rating=5, comment="Great")
+
+    def test_venue_list_query_count_does_not_grow_with_venues(self):
+        for count in (2, 6):
+            self._add_venues(count)
+            cache.clear()
+            with self.assertNumQueries(self.LIST_QUERY_BUDGET):
+                response = self.client.get("/api/v1/venues/")
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        venue = response.json()["results"]["restaurants"][0]
+        self.assertEqual(len(venue["images"]), 2)
+        self.assertEqual(venue["first_image"], venue["images"][0]["url"])
+        self.assertEqual(len(venue["menu_images"]), 1)
+        self.assertEqual(venue["reviews"][0]["username"], f"budget_{venue['id']}")
+
+    def test_paginated_venue_list_query_count_does_not_grow_with_page_size(self):
+        view = VenueListAPI.as_view()
+        factory = APIRequestFactory()
+
+        for count in (2, 10):
+            self._add_venues(count)
+            cache.clear()
+            with self.assertNumQueries(self.PAGINATED_QUERY_BUDGET):
+                response = view(factory.get("/venues/"))
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_venue_list_returns_every_venue_unless_paging_is_asked_for(self):
+        self._add_venues(VENUE_LIST_PAGE_SIZE + 1)
+
+        response = self.client.get("/api/v1/venues/", {"view": "card"})
+        self.assertEqual(len(response.json()["results"]["restaurants"]), VENUE_LIST_PAGE_SIZE + 1)
+        self.assertEqual(response.json()["count"], VENUE_LIST_PAGE_SIZE + 1)
+        self.assertNotIn("next", response.json())
+
+    def test_venue_list_pages_each_group_with_cursors(self):
+        self._add_venues(5)
+        Venue.objects.create(name="Budget Cafe", kind="cafe", location="Budget Street", latitude=37.9, longitude=23.7)
+
+        with self.assertNumQueries(2):
+            response = self.client.get("/api/v1/venues/", {"view": "card", "page_size": "2"})
+        self.assertEqual(len(response.json()["results"]["restaurants"]), 2)
+        self.assertEqual(len(response.json()["results"]["cafe_bar"]), 1)
+        self.assertIsNone(response.json()["next"]["cafe_bar"])
+        self.assertEqual(
+            set(response.json()["results"]["restaurants"][0]),
+            {"id", "name", "kind", "first_image", "first_image_srcset", "average_rating", "is_full"},
+        )
+
+        names = [venue["name"] for venue in response.json()["results"]["restaurants"]]
+        cursor = response.json()["next"]["restaurants"]
+        while cursor:
+            response = self.client.get(
+                "/api/v1/venues/",
+                {"group": "restaurants", "cursor": cursor, "page_size": "2", "fields": "id,name"},
+            )
+            self.assertEqual(list(response.json()["results"]), ["restaurants"])
+            self.assertEqual(set(response.json()["results"]["restaurants"][0]), {"id", "name"})
+            names += [venue["name"] for venue in response.json()["results"]["restaurants"]]
+            cursor = response.json()["next"]["restaurants"]
+
+        self.assertEqual(names, [f"Budget Venue {index}" for index in range(5)])
+        for bad_cursor in ("nope", encode_cursor([["a"], {"b": 1}]), encode_cursor(["a", "abc"]), encode_cursor([None, 1])):
+            with self.subTest(cursor=bad_cursor):
+                self.assertEqual(
+                    self.client.get("/api/v1/venues/", {"group": "restaurants", "cursor": bad_cursor}).status_code,
+                    status.HTTP_400_BAD_REQUEST,
+                )
+
+
+class VenueListingCacheTestCase(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.venue = Venue.objects.create(
+            name="Cached Venue", kind="restaurant", location="Cache Street", latitude=37.9, longitude=23.7
+        )
+        self.url = "/api/v1/venues/"
+
+    def test_anonymous_listing_is_served_from_cache_with_etag(self):
+        first = self.client.get(self.url, {"view": "card"})
+        self.assertEqual(first.status_code, status.HTTP_200_OK)
+        etag = first["ETag"]
+
+        with self.assertNumQueries(0):
+            second = self.client.get(self.url, {"view": "card"})
+        self.assertEqual(second.content, first.content)
+
+        with self.assertNumQueries(0):
+            not_modified = self.client.get(self.url, {"view": "card"}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(not_modified.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(not_modified["ETag"], etag)
+
+    def test_venue_and_image_writes_invalidate_listing(self):
+        etag = self.client.get(self.url, {"view": "card"})["ETag"]
+
+        with self.captureOnCommitCallbacks(execute=True):
+            VenueImage.objects.bulk_create([VenueImage(venue=self.venue, image="venues/cached.webp", approved=True)])
+            bump_venue_version(self.venue.id)
+        response = self.client.get(self.url, {"view": "card"}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.json()["results"]["restaurants"][0]["first_image"].endswith("cached.webp"))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.venue.is_full = True
+            self.venue.save(update_fields=["is_full"])
+        response = self.client.get(self.url, {"view": "card"})
+        self.assertTrue(response.json()["results"]["restaurants"][0]["is_full"])
+
+    def test_authenticated_listing_is_not_cached(self):
+        user = User.objects.create_user(username="listing_user", password="pass1234")
+        self.client.force_authenticate(user)
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotIn("ETag", response)
+
+
+@override_settings(VISIT_BUFFER_BACKEND="memory", VISIT_FLUSH_BATCH_SIZE=4, VISIT_FLUSH_MAX_LATENCY_SECONDS=3600)
+class VenueVisitBufferTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        flush_visits()
+        self.venue = Venue.objects.create(name="Visited", kind="bar", location="Visit Street", latitude=37.9, longitude=23.7)
+
+    def test_visits_are_buffered_deduplicated_and_bulk_written(self):
+        with self.assertNumQueries(0):
+            record_visit(self.venue.id, None, "session-a", "10.0.0.1")
+            record_visit(self.venue.id, None, "session-a", "10.0.0.1")
+            record_visit(self.venue.id, None, None, "10.0.0.2")
+        self.assertEqual(VenueVisit.objects.count(), 0)
+
+        # The fourth record fills the batch and flushes it inline.
+        record_visit(self.venue.id, None, "session-b", "10.0.0.3")
+        self.assertEqual(VenueVisit.objects.count(), 3)
+
+        # Same visitor inside the dedupe window, across flushes: not written again.
+        record_visit(self.venue.id, None, "session-a", "10.0.0.1")
+        record_visit(99999, None, "session-c", "10.0.0.4")
+        self.assertEqual(flush_visits(), 0)
+        self.assertEqual(VenueVisit.objects.count(), 3)
+
+
+    def test_bad_records_are_dropped_instead_of_blocking_the_buffer(self):
+        record_visit(self.venue.id, None, "session-x", "not-an-ip, 10.0.0.9")
+        buffer = get_visit_buffer()
+        buffer.append("{broken")
+        buffer.append(json.dumps({"venue_id": self.venue.id, "user_id": None, "session_key": "session-y",
+                                  "ip_address": "999.1.1.1", "timestamp": timezone.now().isoformat()}))
+
+        self.assertEqual(flush_visits(), 2)
+        self.assertEqual(list(VenueVisit.objects.values_list("ip_address", flat=True)), [None, None])
+
+        record_visit(self.venue.id, None, "session-z", "10.0.0.5")
+        self.assertEqual(flush_visits(), 1)
+        self.assertEqual(VenueVisit.objects.get(session_key="session-z").ip_address, "10.0.0.5")
+
+class VenueActivityRollupTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.venue = Venue.objects.create(name="Rolled", kind="bar", location="Rollup Street", latitude=37.9, longitude=23.7)
+        self.user = User.objects.create_user(username="rollup", email="rollup@example.com", password="pass1234")
+
+    def _reservation(self, created_at):
+        reservation = Reservation.objects.create(
+            user=self.user,
+            venue=self.venue,
+            firstname="Jane",
+            lastname="Doe",
+            email="jane.doe@example.com",
+            phone="+1234567890",
+            date=date(2030, 1, 1),
+            time=time(18, 0),
+            guests=2,
+        )
+        Reservation.objects.filter(pk=reservation.pk).update(created_at=created_at)
+
+    def test_backfill_and_refresh_feed_analytics(self):
+        now = timezone.now()
+        old = now - timedelta(days=5)
+        VenueVisit.objects.bulk_create([
+            VenueVisit(venue=self.venue, session_key="a", timestamp=old),
+            VenueVisit(venue=self.venue, session_key="b", timestamp=old),
+            VenueVisit(venue=self.venue, session_key="c", timestamp=now),
+        ])
+        self._reservation(old)
+
+        call_command("backfill_venue_rollups", "--days", "10", stdout=StringIO())
+        self.assertEqual(sum(VenueDailyActivity.objects.values_list("visits", flat=True)), 3)
+
+        # Reruns replace rows instead of adding to them.
+        VenueVisit.objects.create(venue=self.venue, session_key="d", timestamp=now)
+        refresh_recent_rollups()
+        refresh_recent_rollups()
+
+        with self.assertNumQueries(1):
+            payload = _analytics_payload(self.venue, "daily")
+
+        self.assertEqual(payload["total_visits"], 4)
+        self.assertEqual(payload["total_reservations"], 1)
+        self.assertEqual(payload["peak_visits"], 2)
+
+    def test_compaction_keeps_history_in_rollups(self):
+        now = timezone.now()
+        old = now - timedelta(days=300)
+        VenueVisit.objects.bulk_create(
+            [VenueVisit(venue=self.venue, session_key=str(i), timestamp=old) for i in range(3)]
+            + [VenueVisit(venue=self.venue, session_key="recent", timestamp=now)]
+        )
+
+        days, deleted = compact_visits(months=6)
+        self.assertEqual((days, deleted), (1, 3))
+        self.assertEqual(VenueVisit.objects.count(), 1)
+
+        # Rebuilding the compacted range must not zero the rolled-up visits.
+        backfill_rollups(timezone.localtime(old).date(), timezone.localdate())
+        self.assertEqual(_analytics_payload(self.venue, "yearly")["total_visits"], 4)
+        self.assertEqual(compact_visits(months=6), (0, 0))
+
+
+class DashboardCountersTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.venue = Venue.objects.create(name="Counted", kind="bar", location="Count Street", latitude=37.9, longitude=23.7)
+        self.user = User.objects.create_user(username="counter", email="counter@example.com", password="pass1234")
+
+    def _reservation(self, day, **fields):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Reservation.objects.create(
+                user=self.user, venue=self.venue, firstname="Jane", lastname="Doe",
+                email="jane.doe@example.com", phone="+1234567890", date=day, time=time(18, 0), guests=2, **fields
+            )
+
+    def test_counts_come_from_one_query_then_from_counters(self):
+        today = timezone.now().date()
+        pending = self._reservation(today + timedelta(days=1))
+        self._reservation(today + timedelta(days=2), seen=True)
+        self._reservation(today - timedelta(days=3), status="accepted")
+
+        expected = {"unseen_requests": 1, "requests": 2, "arrivals": 0, "history": 1}
+        with self.assertNumQueries(1):
+            self.assertEqual(get_counts(self.venue.id), expected)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            pending.status = "accepted"
+            pending.save(update_fields=["status"])
+        self._reservation(today + timedelta(days=4))
+
+        with self.assertNumQueries(0):
+            counts = get_counts(self.venue.id)
+        self.assertEqual(counts, {"unseen_requests": 1, "requests": 2, "arrivals": 1, "history": 1})
+        self.assertEqual(counts, count_from_db(self.venue.id))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            pending.delete()
+        self.assertEqual(get_counts(self.venue.id), count_from_db(self.venue.id))
+
+
+class ReservationSearchTestCase(TestCase):
+    def setUp(self):
+        self.venue = Venue.objects.create(name="Searched", kind="bar", location="Search Street", latitude=37.9, longitude=23.7)
+        self.user = User.objects.create_user(username="searcher", email="searcher@example.com", password="pass1234")
+
+    def _reservation(self, firstname, lastname, phone, **fields):
+        return Reservation.objects.create(
+            user=self.user, venue=self.venue, firstname=firstname, lastname=lastname,
+            email=f"{firstname.lower()}@example.com", phone=phone, date=date(2030, 1, 1),
+            time=time(12 + Reservation.objects.count(), 0), guests=2,
+            **fields
+        )
+
+    def test_search_matches_name_phone_and_status_with_word_starts_first(self):
+        infix = self._reservation("Tamara", "Lee", "+30 210 000")
+        prefix = self._reservation("Maria", "Lee", "+30 691 234")
+        accepted = self._reservation("Nikos", "Lee", "+30 222 333", status="accepted")
+
+        base = Reservation.objects.filter(venue=self.venue)
+        ranked = search_reservations(base, "mar").order_by("-search_rank", "id")
+        self.assertEqual(list(ranked), [prefix, infix])
+        self.assertEqual(list(search_reservations(base, "6912")), [prefix])
+        self.assertEqual(list(search_reservations(base, "ACCEPT")), [accepted])
+        self.assertEqual(list(search_reservations(base, "maria lee")), [prefix])
+
+        # Renames keep the search column in step, even with update_fields.
+        infix.firstname = "Joanna"
+        infix.save(update_fields=["firstname"])
+        self.assertEqual(list(search_reservations(base, "joan")), [infix])
+
+
+class ReservationQueryPlanTestCase(TestCase):
+    """
+    EXPLAIN regression suite: every hot Reservation query, as the code builds it, must be
+    answered from one of the indexes added for it (see Reservation.Meta.indexes).
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.venue = Venue.objects.create(name="Planned", kind="bar", location="Plan Street", latitude=37.9, longitude=23.7)
+        other = Venue.objects.create(name="Other", kind="bar", location="Plan Street", latitude=37.9, longitude=23.7)
+        cls.user = User.objects.create_user(username="planner", email="planner@example.com", password="pass1234")
+        statuses = ["pending", "accepted", "rejected", "cancelled"]
+        Reservation.objects.bulk_create([
+            Reservation(
+                user=cls.user, venue=venue, firstname="Plan", lastname=str(index), email="plan@example.com",
+                phone="+30 210 000", date=date(2030, 1, 1) + timedelta(days=index), time=time(18, 0), guests=2,
+                status=statuses[index % 4],
+            )
+            for venue in (cls.venue, other)
+            for index in range(200)
+        ])
+
+    def _plan(self, sql, params):
+        explain = "EXPLAIN QUERY PLAN " if connection.vendor == "sqlite" else "EXPLAIN "
+        with connection.cursor() as cursor:
+            cursor.execute(explain + sql, params)
+            return "\n".join(" ".join(str(column) for column in row) for row in cursor.fetchall())
+
+    def executed_plans(self, run):
+        """
+        Plans of the statements `run()` executes, for queries that cannot be EXPLAINed
+        through a queryset (e.g. aggregate()).
+        """
+        statements = []
+
+        def record(execute, sql, params, many, context):
+            statements.append((sql, params))
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(record):
+            run()
+        return "\n".join(self._plan(sql, params) for sql, params in statements)
+
+    def assertUsesIndex(self, queryset_or_plan, *index_names):
+        if connection.vendor not in ("postgresql", "sqlite"):
+            self.skipTest(f"No plan check for {connection.vendor}")
+        if connection.vendor == "postgresql":
+            with connection.cursor() as cursor:
+                cursor.execute("ANALYZE venues_reservation")
+
+        plan = queryset_or_plan if isinstance(queryset_or_plan, str) else queryset_or_plan.explain()
+        self.assertTrue(any(name in plan for name in index_names), f"none of {index_names} in:\n{plan}")
+
+    def test_dashboard_buckets_use_indexes(self):
+        expected = {
+            "requests": ("reservation_pending_idx",),
+            "arrivals": ("reservation_venue_status_idx", "reservation_venue_slot_idx"),
+            "history":  ("reservation_venue_slot_idx",),
+        }
+        for bucket, index_names in expected.items():
+            with self.subTest(bucket=bucket):
+                self.assertUsesIndex(_dashboard_reservations_queryset(self.venue, bucket), *index_names)
+
+    def test_bucket_counts_use_indexes(self):
+        plan = self.executed_plans(lambda: count_from_db(self.venue.id))
+        self.assertUsesIndex(plan, "reservation_venue_status_idx", "reservation_venue_slot_idx")
+
+    def test_slot_masks_use_indexes(self):
+        self.assertUsesIndex(
+            reserved_slots_queryset([self.venue.id], [date(2030, 1, 5), date(2030, 1, 6)]), "reservation_venue_slot_idx"
+        )
+
+    def test_upcoming_reservations_use_indexes(self):
+        self.assertUsesIndex(_upcoming_reservations_queryset(self.user), "reservation_user_slot_idx")
+        self.assertUsesIndex(Reservation.objects.filter(user=self.user).upcoming(), "reservation_user_slot_idx")
+
+    def test_rollups_use_created_index(self):
+        plan = self.executed_plans(lambda: refresh_recent_rollups())
+        self.assertUsesIndex(plan, "reservation_created_idx")
+
+
+class OutboxDispatcherTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username="notified", email="notified@example.com", password="pass1234")
+        self.venues = [
+            Venue.objects.create(name=f"Outbox {index}", kind="bar", location="Outbox Street", latitude=37.9, longitude=23.7)
+            for index in range(2)
+        ]
+        for venue in self.venues:
+            for hour in range(3):
+                Reservation.objects.create(
+                    user=self.user, venue=venue, firstname="Jane", lastname="Doe", email="jane.doe@example.com",
+                    phone="+1234567890", date=date(2030, 1, 1), time=time(12 + hour, 0), guests=2,
+                )
+
+    @mock.patch("venues.services.outbox.send_venue_notification_batch", return_value=True)
+    def test_due_events_are_sent_in_one_batch_per_venue(self, send_batch):
+        # One row per change, carrying both channels.
+        self.assertEqual(ReservationOutboxEvent.objects.count(), 6)
+
+        self.assertEqual(dispatch_due_events(), 6)
+
+        self.assertEqual(send_batch.call_count, 2)
+        self.assertEqual(sorted(len(call.args[1]) for call in send_batch.call_args_list), [3, 3])
+        self.assertFalse(ReservationOutboxEvent.objects.exclude(status=ReservationOutboxEvent.STATUS_SENT).exists())
+        self.assertEqual(dispatch_due_events(), 0)
+
+    def test_relay_mode_leaves_dispatch_to_the_relay(self):
+        with mock.patch("venues.tasks.dispatch_outbox_events.apply_async") as apply_async:
+            with override_settings(OUTBOX_RELAY_ENABLED=True):
+                schedule_dispatch()
+            apply_async.assert_not_called()
+
+            schedule_dispatch()
+            schedule_dispatch()     # coalesced into the first one
+            apply_async.assert_called_once()
+
+        # The relay sleeps until the earliest retry, never past its max wait.
+        self.assertEqual(_next_retry_in(60), 0)
+        ReservationOutboxEvent.objects.update(next_retry_at=timezone.now() + timedelta(seconds=30))
+        self.assertTrue(25 < _next_retry_in(60) <= 30)
+        ReservationOutboxEvent.objects.update(status=ReservationOutboxEvent.STATUS_SENT)
+        self.assertEqual(_next_retry_in(60), 60)
+
+    def test_old_sent_events_are_purged_in_batches(self):
+        events = list(ReservationOutboxEvent.objects.order_by("id"))
+        old = timezone.now() - timedelta(days=30)
+        ReservationOutboxEvent.objects.filter(id__in=[e.id for e in events[:4]]).update(
+            status=ReservationOutboxEvent.STATUS_SENT, sent_at=old
+        )
+        ReservationOutboxEvent.objects.filter(id=events[4].id).update(status=ReservationOutboxEvent.STATUS_FAILED)
+
+        self.assertEqual(purge_sent_events(days=7, batch_size=3), 4)
+        self.assertEqual(
+            sorted(ReservationOutboxEvent.objects.values_list("id", flat=True)), [e.id for e in events[4:]]
+        )
+
+    def test_failed_venue_batch_is_retried_later(self):
+        failing_venue = self.venues[0]
+
+        def send_batch(venue_id, messages):
+            return venue_id != failing_venue.id
+
+        with mock.patch("venues.services.outbox.send_venue_notification_batch", side_effect=send_batch):
+            self.assertEqual(dispatch_due_events(), 3)
+
+        failed = ReservationOutboxEvent.objects.filter(status=ReservationOutboxEvent.STATUS_FAILED)
+        self.assertEqual(failed.count(), 3)
+        self.assertTrue(all(event.venue_id == failing_venue.id and event.attempts == 1 for event in failed))
+        self.assertTrue(all(event.next_retry_at > timezone.now() for event in failed))
+
+        # The retry only repeats what failed: no second email for events already mailed.
+        ReservationOutboxEvent.objects.update(next_retry_at=timezone.now())
+        failed.update(delivered=ReservationOutboxEvent.DELIVERED_EMAIL)
+        with mock.patch("venues.services.outbox.send_venue_notification_batch", return_value=True), \
+                mock.patch("venues.services.outbox.build_reservation_emails") as build_emails:
+            self.assertEqual(dispatch_due_events(), 3)
+        build_emails.assert_not_called()
+
+    @mock.patch("venues.services.outbox.send_venue_notification_batch", return_value=True)
+    def test_emails_of_a_batch_share_one_connection(self, send_batch):
+        owner = User.objects.create_user(username="outbox_owner", email="outbox_owner@example.com", password="pass1234")
+        Venue.objects.filter(id__in=[venue.id for venue in self.venues]).update(owner=owner)
+
+        with mock.patch("venues.services.outbox.get_connection", wraps=get_connection) as connect:
+            self.assertEqual(dispatch_due_events(), 6)
+
+        connect.assert_called_once()
+        # Owner notification and guest confirmation for each new reservation.
+        self.assertEqual(len(mail.outbox), 12)
+        self.assertEqual(sorted({message.to[0] for message in mail.outbox}), ["notified@example.com", "outbox_owner@example.com"])
+
+
+    @mock.patch("venues.services.outbox.send_venue_notification_batch", return_value=True)
+    def test_failed_send_reconnects_and_is_retried_alone(self, send_batch):
+        calls = []
+
+        def send(emails, connection=None):
+            calls.append(connection)
+            if len(calls) == 1:
+                raise ConnectionError("connection dropped")
+            return send_messages(emails, connection=connection)
+
+        with mock.patch("venues.services.outbox.send_messages", side_effect=send), \
+                mock.patch("venues.services.outbox.get_connection", wraps=get_connection) as connect:
+            self.assertEqual(dispatch_due_events(), 5)
+        self.assertEqual(connect.call_count, 2)     # a new connection after the failure
+        self.assertEqual(len(mail.outbox), 5)
+
+        failed = ReservationOutboxEvent.objects.get(status=ReservationOutboxEvent.STATUS_FAILED)
+        self.assertEqual(failed.payload.get("emails_sent"), None)
+        mail.outbox = []
+        ReservationOutboxEvent.objects.update(next_retry_at=timezone.now())
+        self.assertEqual(dispatch_due_events(), 1)
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(ReservationOutboxEvent.objects.get(id=failed.id).payload["emails_sent"], [0])
+
+    @mock.patch("venues.services.outbox.send_venue_notification_batch", return_value=True)
+    def test_batched_event_retries_only_unsent_reservations(self, send_batch):
+        dispatch_due_events()
+        mail.outbox = []
+        reservations = list(Reservation.objects.filter(venue=self.venues[0]).order_by("time"))
+        Reservation.objects.filter(id__in=[r.id for r in reservations]).transition(
+            [([r.id for r in reservations], {"status": "accepted"})]
+        )
+        batch = ReservationOutboxEvent.objects.get(event_type=ReservationOutboxEvent.EVENT_BATCH)
+        deleted_id = reservations[2].id
+        reservations[2].delete()        # gone before delivery: skipped, not a failure
+
+        calls = []
+
+        def send(emails, connection=None):
+            calls.append(emails)
+            if len(calls) == 2:
+                raise ConnectionError("connection dropped")
+            return send_messages(emails, connection=connection)
+
+        with mock.patch("venues.services.outbox.send_messages", side_effect=send):
+            dispatch_due_events()
+        batch.refresh_from_db()
+        self.assertEqual(batch.status, ReservationOutboxEvent.STATUS_FAILED)
+        deleted_index = [message["reservation"]["id"] for message in batch.messages()].index(deleted_id)
+        self.assertIn(deleted_index, batch.payload["emails_sent"])
+        self.assertEqual(len(batch.payload["emails_sent"]), 2)
+        self.assertEqual(len(mail.outbox), 1)
+
+        ReservationOutboxEvent.objects.update(next_retry_at=timezone.now())
+        self.assertEqual(dispatch_due_events(), 1)
+        self.assertEqual(len(mail.outbox), 2)     # only the email that failed
+        batch.refresh_from_db()
+        self.assertEqual(sorted(batch.payload["emails_sent"]), [0, 1, 2])
+
+class ReservationChangeTrackingTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.venue = Venue.objects.create(name="Tracked", kind="bar", location="Track Street", latitude=37.9, longitude=23.7)
+        self.user = User.objects.create_user(username="tracked", email="tracked@example.com", password="pass1234")
+        self.day = timezone.now().date() + timedelta(days=1)
+        for hour in range(3):
+            Reservation.objects.create(
+                user=self.user, venue=self.venue, firstname="Jane", lastname="Doe", email="jane.doe@example.com",
+                phone="+1234567890", date=self.day, time=time(12 + hour, 0), guests=2,
+            )
+
+    def test_save_uses_the_loaded_snapshot_instead_of_a_select(self):
+        reservation = Reservation.objects.order_by("time").first()
+        reservation.status = "accepted"
+
+        # UPDATE, outbox INSERT (savepoints aside): no SELECT of the old row.
+        with self.assertNumQueries(2):
+            reservation.save(update_fields=["status"])
+        self.assertEqual(reservation._old_values, {"status": "pending"})
+
+        event = ReservationOutboxEvent.objects.latest("id")
+        self.assertEqual(event.payload["email_meta"]["changes_list"], [{"field": "Status", "old": "pending", "new": "accepted"}])
+
+        # A second save diffs against what the first one wrote.
+        reservation.guests = 4
+        reservation.save(update_fields=["guests"])
+        self.assertEqual(reservation._old_values, {"guests": 2})
+
+    def test_queryset_update_emits_events_and_moves_counters(self):
+        self.assertEqual(get_counts(self.venue.id)["requests"], 3)
+        before = ReservationOutboxEvent.objects.count()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            updated = Reservation.objects.filter(venue=self.venue, time__lt=time(14, 0)).update(status="accepted")
+        self.assertEqual(updated, 2)
+
+        events = list(ReservationOutboxEvent.objects.order_by("id")[before:])
+        self.assertEqual(len(events), 2)
+        self.assertTrue(all(event.event_type == "reservation.updated" for event in events))
+        self.assertEqual(get_counts(self.venue.id), count_from_db(self.venue.id))
+        self.assertEqual(get_counts(self.venue.id)["arrivals"], 2)
+
+        # Rows the UPDATE leaves as they were emit nothing; untracked fields skip the extra queries.
+        Reservation.objects.filter(venue=self.venue).update(status="accepted")
+        self.assertEqual(ReservationOutboxEvent.objects.count(), before + 3)
+        with self.assertNumQueries(1):
+            Reservation.objects.filter(venue=self.venue).update(special_requests=True)
+
+
+# Processing runs right after commit instead of through the broker (not eager in settings).
+@override_settings(IMAGE_PROCESSING_ASYNC=False)
+class VenueImageProcessingTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        self.venue = Venue.objects.create(name="Pictured", kind="bar", location="Photo Street", latitude=37.9, longitude=23.7)
+
+    def _upload(self, name, size=(2000, 1000)):
+        buffer = BytesIO()
+        Image.new("RGB", size, "red").save(buffer, format="PNG")
+        return SimpleUploadedFile(name, buffer.getvalue(), content_type="image/png")
+
+    def test_uploads_are_stored_raw_then_replaced_by_renditions(self):
+        with override_settings(MEDIA_ROOT=self.media_root, IMAGE_PROCESSING_WORKERS=1):
+            with self.captureOnCommitCallbacks() as callbacks:
+                image = VenueImage.objects.create(venue=self.venue, image=self._upload("terrace.png"), approved=True)
+
+            # The request only stores the upload, under its content hash.
+            self.assertEqual(image.image.name, f"images/{image.content_hash[:2]}/{image.content_hash}.png")
+            self.assertTrue(image.needs_processing)
+            raw_path = image.image.path
+
+            with mock.patch("venues.services.images.bump_venue_version") as bump:
+                with self.captureOnCommitCallbacks(execute=True):
+                    for callback in callbacks:
+                        callback()
+            bump.assert_called_once_with(self.venue.id)        # cached listings pick up the renditions
+
+            image.refresh_from_db()
+            self.assertFalse(image.needs_processing)
+            self.assertEqual(set(image.renditions), {"thumb", "card", "full"})
+            self.assertTrue(image.image.name.endswith(f"{image.content_hash}-full.webp"))
+            self.assertFalse(os.path.exists(raw_path))
+            with Image.open(image.image.path) as full:
+                self.assertEqual(full.size, (1600, 800))
+
+            srcset = image_srcset(image)
+            self.assertIn(f"{image.content_hash}-thumb.webp 320w", srcset)
+            self.assertIn(f"{image.content_hash}-card.webp 768w", srcset)
+            self.assertTrue(image_url(image, "card").endswith(f"{image.content_hash}-card.webp"))
+
+    def _stored_files(self):
+        root = os.path.join(self.media_root, "images")
+        return sorted(os.path.join(path, name) for path, _, names in os.walk(root) for name in names)
+
+    def test_identical_uploads_share_files_and_are_released_with_the_last_row(self):
+        with override_settings(MEDIA_ROOT=self.media_root, IMAGE_PROCESSING_WORKERS=1):
+            with self.captureOnCommitCallbacks(execute=True):
+                first = VenueImage.objects.create(venue=self.venue, image=self._upload("a.png"), approved=True)
+            first.refresh_from_db()
+            files = self._stored_files()
+            self.assertEqual(len(files), 3)
+
+            # Same bytes under another name and model: nothing is stored or converted again.
+            with self.captureOnCommitCallbacks(execute=True):
+                second = VenueMenuImage.objects.create(venue=self.venue, image=self._upload("b.png"), approved=True)
+            self.assertEqual((second.image.name, second.renditions), (first.image.name, first.renditions))
+            self.assertFalse(second.needs_processing)
+            self.assertEqual(self._stored_files(), files)
+
+            with self.captureOnCommitCallbacks(execute=True):
+                first.delete()
+            self.assertEqual(self._stored_files(), files)
+            with self.captureOnCommitCallbacks(execute=True):
+                second.delete()
+            self.assertEqual(self._stored_files(), [])
+
+    def test_upload_matching_an_unprocessed_copy_keeps_its_own_raw_file(self):
+        with override_settings(MEDIA_ROOT=self.media_root, IMAGE_PROCESSING_WORKERS=1):
+            with self.captureOnCommitCallbacks() as first_callbacks:
+                first = VenueImage.objects.create(venue=self.venue, image=self._upload("a.png"), approved=True)
+            with self.captureOnCommitCallbacks() as second_callbacks:
+                second = VenueMenuImage.objects.create(venue=self.venue, image=self._upload("b.png"), approved=True)
+
+            # The first raw upload is converted and deleted before the second row is processed.
+            self.assertNotEqual(second.image.name, first.image.name)
+            self.assertTrue(second.needs_processing)
+            for callback in first_callbacks + second_callbacks:
+                callback()
+
+            first.refresh_from_db()
+            second.refresh_from_db()
+            self.assertEqual((second.image.name, second.renditions), (first.image.name, first.renditions))
+            self.assertTrue(os.path.exists(second.image.path))
+            self.assertEqual(len(self._stored_files()), 3)
+
+    def _edit_gallery(self, existing_count, upload_count):
+        existing = [
+            VenueImage.objects.create(venue=self.venue, image=f"venues/legacy-{index}.webp", approved=True, order=index)
+            for index in range(existing_count)
+        ]
+        uploads = [self._upload(f"new-{index}.png", size=(40 + index, 30)) for index in range(upload_count)]
+        order = [{"kind": "new", "upload_key": f"new-{index}"} for index in range(upload_count)]
+        order += [{"kind": "existing", "id": image.id} for image in reversed(existing[1:])]
+        request = mock.Mock(
+            data={"venue_image_order": order, "deleted_venue_image_ids": [existing[0].id]},
+            FILES=MultiValueDict({"venue_images": uploads}),
+        )
+
+        with CaptureQueriesContext(connection) as queries, self.captureOnCommitCallbacks():
+            ids = _handle_dashboard_image_group(
+                self.venue, request, VenueImage, "venue_images", "visible_venue_image_ids",
+                auto_approve=True, order_field="venue_image_order", deleted_field="deleted_venue_image_ids",
+            )
+        return existing, ids, len(queries)
+
+    def test_gallery_edit_costs_the_same_queries_for_any_number_of_images(self):
+        with override_settings(MEDIA_ROOT=self.media_root, IMAGE_PROCESSING_ASYNC=False):
+            _, _, small = self._edit_gallery(existing_count=3, upload_count=2)
+            VenueImage.objects.all().delete()
+            existing, ids, large = self._edit_gallery(existing_count=40, upload_count=10)
+
+        self.assertEqual(small, large)
+        self.assertEqual(ids[10:], [image.id for image in reversed(existing[1:])])
+        self.assertEqual(list(VenueImage.objects.filter(venue=self.venue).values_list("id", flat=True)), ids)
+        self.assertEqual(VenueImage.objects.filter(needs_processing=True).count(), 10)
+
+    def test_garbage_collection_removes_approved_deletions_and_orphans(self):
+        with override_settings(MEDIA_ROOT=self.media_root, IMAGE_PROCESSING_WORKERS=1):
+            with self.captureOnCommitCallbacks(execute=True):
+                kept = VenueImage.objects.create(venue=self.venue, image=self._upload("kept.png"), approved=True)
+                removed = VenueImage.objects.create(
+                    venue=self.venue, image=self._upload("removed.png", size=(900, 600)), approved=True
+                )
+            other_venue = Venue.objects.create(name="Pending", kind="bar", location="Wait Street", latitude=37.9, longitude=23.7)
+            pending = VenueImage.objects.create(venue=other_venue, image="venues/legacy.webp", approved=True, marked_for_deletion=True)
+            VenueUpdateRequest.objects.create(venue=other_venue, name="Pending", kind="bar", location="Wait Street")
+            VenueImage.objects.filter(id=removed.id).update(marked_for_deletion=True)
+            # Both uploads were converted (IMAGE_PROCESSING_ASYNC is off for this case): three
+            # renditions each, the raw uploads are gone.
+            self.assertEqual(len(self._stored_files()), 6)
+            orphan = os.path.join(self.media_root, "images", "zz", "orphan.webp")
+            os.makedirs(os.path.dirname(orphan))
+            open(orphan, "wb").close()
+
+            with self.captureOnCommitCallbacks(execute=True):
+                rows, files = collect_garbage(grace_seconds=0)
+            self.assertEqual(rows, 1)
+            self.assertEqual(files, 4)      # the orphan and the three files of the deleted row
+
+            self.assertEqual(
+                sorted(VenueImage.objects.values_list("id", flat=True)), sorted([kept.id, pending.id])
+            )
+            kept.refresh_from_db()
+            self.assertEqual(self._stored_files(), sorted(os.path.join(self.media_root, path) for path in image_files(kept)))
+
+
+@override_settings(GEOCODER="stub", GEOCODING_ASYNC=False, STUB_GEOCODER_RESULTS={"Ermou 10, Athens": (37.976, 23.728)})
+class GeocodingTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_venue_save_geocodes_after_commit_through_the_cache(self):
+        with mock.patch.dict(GEOCODERS, stub=mock.Mock(wraps=GEOCODERS["stub"])) as geocoders:
+            with self.captureOnCommitCallbacks(execute=True) as callbacks:
+                venue = Venue.objects.create(name="Mapped", kind="bar", location="Ermou 10, Athens")
+                geocoders["stub"].assert_not_called()     # nothing is geocoded inside the save
+            self.assertTrue(callbacks)
+
+            venue.refresh_from_db()
+            self.assertAlmostEqual(float(venue.latitude), 37.976)
+            self.assertAlmostEqual(float(venue.longitude), 23.728)
+            self.assertTrue(venue.geohash)
+
+            # The same address, spelled differently, is answered by the cache table.
+            with self.captureOnCommitCallbacks(execute=True):
+                other = Venue.objects.create(name="Neighbour", kind="cafe", location="  ermou 10 ,ATHENS ")
+            other.refresh_from_db()
+            self.assertEqual((other.latitude, other.longitude), (venue.latitude, venue.longitude))
+            self.assertEqual(geocoders["stub"].call_count, 1)
+            self.assertEqual(GeocodedAddress.objects.get().query, normalize_address("Ermou 10, Athens"))
+
+    def test_inline_geocoding_only_looks_up_the_saved_venue(self):
+        with self.captureOnCommitCallbacks():
+            backlog = Venue.objects.create(name="Backlog", kind="bar", location="Ermou 10, Athens")
+        with self.captureOnCommitCallbacks(execute=True):
+            saved = Venue.objects.create(name="Saved", kind="cafe", location="Ermou 10, Athens")
+
+        saved.refresh_from_db()
+        backlog.refresh_from_db()
+        self.assertIsNotNone(saved.latitude)
+        self.assertIsNone(backlog.latitude)       # left to the Beat sweep
+
+    def test_unknown_addresses_are_cached_until_they_expire(self):
+        stub = mock.Mock(return_value=None)
+        with mock.patch.dict(GEOCODERS, stub=stub):
+            self.assertIsNone(geocode("Nowhere 1"))
+            self.assertIsNone(geocode("nowhere 1"))
+            self.assertEqual(stub.call_count, 1)
+            self.assertFalse(GeocodedAddress.objects.get().found)
+
+            GeocodedAddress.objects.update(expires_at=timezone.now() - timedelta(seconds=1))
+            stub.return_value = (1.5, 2.5)
+            self.assertEqual(geocode("Nowhere 1"), (1.5, 2.5))
+            self.assertEqual(stub.call_count, 2)
+
+    def test_unreachable_geocoder_caches_nothing_and_leaves_venues_for_later(self):
+        Venue.objects.create(name="Later", kind="bar", location="Ermou 10, Athens")
+        with mock.patch.dict(GEOCODERS, stub=mock.Mock(side_effect=GeocoderUnavailable("down"))):
+            call_command("geocode_venues", stdout=StringIO())
+        self.assertFalse(GeocodedAddress.objects.exists())
+
+        out = StringIO()
+        call_command("geocode_venues", stdout=out)
+        self.assertIn("Geocoded 1 of 1 venues", out.getvalue())
+        self.assertFalse(Venue.objects.filter(latitude__isnull=True).exists())
+
+    def test_token_bucket_allows_one_request_per_interval(self):
+        now = [100.0]
+        sleeps = []
+
+        def sleep(seconds):
+            sleeps.append(seconds)
+            now[0] += seconds
+
+        bucket = TokenBucket(rate=1, clock=lambda: now[0], sleep=sleep)
+        self.assertEqual(bucket.acquire(), 0)
+        self.assertEqual(bucket.acquire(), 1)
+        now[0] += 0.25
+        self.assertEqual(bucket.acquire(), 0.75)
+        now[0] += 5     # idle time does not build up a burst
+        self.assertEqual(bucket.acquire(), 0)
+        self.assertEqual(bucket.acquire(), 1)
+        self.assertEqual(sleeps, [1, 0.75, 1])
@@ -6,14 +6,10 @@ from plotly.offline                 import plot
 from PIL                            import Image, UnidentifiedImageError
 from io                             import BytesIO
 from django.core.files.base         import ContentFile
-from typing                         import Tuple, Optional
-from functools                      import lru_cache
-from django.db                      import IntegrityError
 from django.core.cache              import cache
 from time                           import time as current_timestamp
 
 import  logging
-import  requests
 import  plotly.graph_objects        as go
 
 logger = logging.getLogger(__name__)
@@ -25,65 +21,6 @@ def get_today():
 
 ###########################################################################################
 
-###########################################################################################
-@lru_cache(maxsize = 1024)
-def _cached_nominatim(address: str) -> Optional[Tuple[float, float]]:
-    """
-        Internal cached helper - small LRU cache.
-        Returns (lat, lon) or None on failure.
-    """
-    
-    url         =   "https://nominatim.openstreetmap.org/search"
-    params      =   { 
-                      "q":       address, 
-                      "format":  "json", 
-                      "limit":   1 
-                    }
-    
-    headers     =   { 'User-Agent': 'Openspots/1.0 (openspots.application@gmail.com)' }
-    
-    try:
-        resp    = requests.get(url, params=params, headers=headers, timeout=5)
-        resp.raise_for_status()
-        
-        data    = resp.json()
-        if not data:
-            return None
-        
-        result  = data[0]
-        
-        return float(result['lat']), float(result['lon'])
-    
-    except requests.RequestException as exc:
-    
-        logger.warning("Nominatim request failed for %r: %s", address, exc)
-    
-    except (ValueError, KeyError) as exc:
-    
-        logger.exception("Invalid response from nominatim for %r: %s", address, exc)
-    
-    return None
-
-###########################################################################################
-
-###########################################################################################
-def get_coords_nominatim(address: str) -> tuple[Optional[float], Optional[float]]:
-    """
-        Geocode address via Nominatim. Returns (lat, lon) or (None, None) on failure.
-        Uses an in-memory LRU cache to reduce requests.
-    """
-
-    if not address:
-        return None, None
-
-    res = _cached_nominatim(address)
-    if res:
-        return res
-
-    return None, None
-
-###########################################################################################
-
 ###########################################################################################
 def generate_time_choices():
     """
@@ -329,32 +266,23 @@ def convert_image_to_webp(image_field, quality=80, max_width=None):
 
 ###########################################################################################
 def log_venue_visit(venue, request):
-    from .models import VenueVisit
+    from .services.visits import record_visit
 
     """
         Log a visit.
         Does NOT count visits when the venue owner views their own venue.
+        The visit is only buffered here; venues.services.visits writes it in batches.
     """
 
     try:
-        if not request.session.session_key:
-            request.session.save()
-
         user = request.user if request.user.is_authenticated else None
 
         # Skip owner viewing their own venue
         if user and venue.owner_id and venue.owner_id == user.id:
             return
 
-        VenueVisit.objects.create(venue=venue, user=user, session_key=request.session.session_key,
-                                  ip_address=get_client_ip(request), timestamp=now()
-        )
+        record_visit(venue.id, user.id if user else None, request.session.session_key, get_client_ip(request))
 
-    except IntegrityError:
-        logger.exception(
-            "Database integrity error while logging visit for venue %s",
-            getattr(venue, "id", None)
-        )
     except Exception:
         logger.exception(
             "Failed to log venue visit for venue %s",
@@ -3,22 +3,22 @@ from django.contrib                  import messages
 from django.contrib.auth             import get_user_model
 from django.contrib.auth.decorators  import login_required
 from django.views.decorators.http    import require_POST
-from django.db.models                import Count
-from django.db.models.functions      import TruncDay, TruncWeek, TruncMonth, TruncYear
 from django.utils.timezone           import now
 from django.core.paginator           import Paginator
-from datetime                        import timedelta, datetime
+from datetime                        import datetime
 from django.utils                    import timezone
 from django.http                     import HttpResponse, Http404, JsonResponse, HttpResponseForbidden
 from django.template.loader          import render_to_string
 from django.db                       import transaction, IntegrityError
 from django.urls                     import reverse
-from .models                         import Venue, VenueUpdateRequest, VenueVisit, Reservation, VenueImage, VenueMenuImage
+from .models                         import Venue, VenueUpdateRequest, Reservation, VenueImage, VenueMenuImage
 from emails_manager.models           import VenueEmailVerificationCode
 from .forms                          import ReservationForm, VenueApplicationForm, ArrivalStatusForm, ReviewForm
 from .utils                          import *
 from .decorators                     import venue_admin_required
 from venues.services.emails          import send_reservation_notification, send_new_venue_application_email, send_venue_verification_code
+from venues.services.listing_cache   import bump_venue_version
+from venues.services.rollups         import activity_series
 from django.http                     import JsonResponse
 from django.utils.translation        import gettext as _
 import  json
@@ -404,49 +404,13 @@ def get_venue_visits_analytics_json(request, venue_id, grouping = 'daily'):
     except Venue.DoesNotExist:
         return JsonResponse({'error': 'Venue not found'}, status=404)
 
-    # Grouping selection
-    if grouping == 'weekly':
-        trunc_fn = TruncWeek
-        days_back = 84
-        date_fmt = "%Y-%m-%d"  # week start date
-    elif grouping == 'monthly':
-        trunc_fn = TruncMonth
-        days_back = 365
-        date_fmt = "%Y-%m"     # e.g. 2023-07
-    elif grouping == 'yearly':
-        trunc_fn = TruncYear
-        days_back = 365 * 3 # Last 3 years
-        date_fmt = "%Y"        # just the year
-    else:
-        trunc_fn = TruncDay
-        days_back = 30
-        date_fmt = "%Y-%m-%d"  # full date
-
-    start_date = now().date() - timedelta(days=days_back)
-
-    # Visits query
-    visits = (
-        VenueVisit.objects
-        .filter(venue = venue, timestamp__date__gte = start_date)
-        .annotate(period = trunc_fn('timestamp'))
-        .values('period')
-        .annotate(count = Count('id'))
-        .order_by('period')
-    )
-    visit_labels = [v['period'].strftime(date_fmt) for v in visits]
-    visit_values = [v['count'] for v in visits]
-
-    # Reservations query
-    reservations = (
-        Reservation.objects
-        .filter(venue = venue, created_at__date__gte = start_date)
-        .annotate(period = trunc_fn('created_at'))
-        .values('period')
-        .annotate(count = Count('id'))
-        .order_by('period')
-    )
-    reservation_labels = [r['period'].strftime(date_fmt) for r in reservations]
-    reservation_values = [r['count'] for r in reservations]
+    # Pre-aggregated per-day rollups (venues.services.rollups), grouped to the period
+    start_date, rows = activity_series(venue, grouping)
+
+    visit_labels        = [row['period'] for row in rows if row['visits']]
+    visit_values        = [row['visits'] for row in rows if row['visits']]
+    reservation_labels  = [row['period'] for row in rows if row['reservations']]
+    reservation_values  = [row['reservations'] for row in rows if row['reservations']]
 
     # Build Plotly figure
     fig = go.Figure()
@@ -1168,40 +1132,56 @@ def submit_venue_update(request, venue_id):
 
         # If front-end didn't submit sequence, you can still accept uploads but avoid touching existing
         if visible_ids is None:
-            for f in files:
-                model.objects.create(venue=venue, image=f, approved=auto_approve, marked_for_deletion=False)
+            if files:
+                model.bulk_create_uploads([
+                    model(venue=venue, image=f, approved=auto_approve, marked_for_deletion=False) for f in files
+                ])
+                transaction.on_commit(lambda: bump_venue_version(venue.id), robust=True)
             return
 
         sequence = [x for x in visible_ids.split(",") if x]
-        updated_ids = []
-        updated = []
-        
+
+        # One query for every referenced image, one INSERT for the uploads and one UPDATE
+        # for the new order, however many images the gallery has.
+        existing_ids = set()
+        for token in sequence:
+            if not token.startswith("new-"):
+                try:
+                    existing_ids.add(int(token))
+                except ValueError:
+                    pass
+        images_by_id = model.objects.filter(venue=venue).in_bulk(existing_ids) if existing_ids else {}
+
+        new_images = []
         for order_index, token in enumerate(sequence):
             if token.startswith("new-"):
                 f = file_map.get(token)
                 if f:
-                    obj = model.objects.create(
-                        venue=venue, image=f, approved=auto_approve, marked_for_deletion=False, order=order_index
+                    new_images.append(
+                        model(venue=venue, image=f, approved=auto_approve, marked_for_deletion=False, order=order_index)
                     )
-                    
-                    updated.append(obj)
-                    updated_ids.append(obj.id)
             else:
                 try:
-                    img = model.objects.get(pk=int(token), venue=venue)
-                except (ValueError, model.DoesNotExist):
+                    img = images_by_id[int(token)]
+                except (ValueError, KeyError):
                     continue
                 img.order = order_index
                 img.marked_for_deletion = False
                 if auto_approve:
                     img.approved = True
-                img.save(update_fields=["order", "marked_for_deletion"] + (["approved"] if auto_approve else []))
-                updated.append(img)
-                updated_ids.append(img.id)
+
+        if new_images:
+            model.bulk_create_uploads(new_images)
+        if images_by_id:
+            model.objects.bulk_update(
+                images_by_id.values(), ["order", "marked_for_deletion"] + (["approved"] if auto_approve else [])
+            )
+        updated_ids = [img.id for img in new_images] + list(images_by_id)
 
         model.objects.filter(venue=venue, approved=True) \
             .exclude(id__in=updated_ids) \
             .update(marked_for_deletion=True)
+        transaction.on_commit(lambda: bump_venue_version(venue.id), robust=True)
     
     require_approval = getattr(settings, "VENUE_UPDATES_REQUIRE_APPROVAL", True)
 
@@ -1295,6 +1275,7 @@ def _reorder_images(request, venue_id, model_cls):
 
         if to_update:
             model_cls.objects.bulk_update(to_update, ["order"])
+            transaction.on_commit(lambda: bump_venue_version(venue.id), robust=True)
 
     logger.info("[ImageOrder] user=%s model=%s venue=%s updated=%s", request.user.pk, model_cls.__name__, venue_id, updated_ids)
 
@@ -1447,8 +1428,9 @@ def ajax_verify_venue_code(request):
 ###########################################################################################
 
 ###########################################################################################
-from .models import Venue, WorkingDay
-from .utils  import user_can_manage_venue  # your existing helper
+from .models                       import Venue, WorkingDay
+from .utils                        import user_can_manage_venue  # your existing helper
+from .services.availability        import invalidate_schedule
 
 def ensure_working_days_exist(venue):
     existing = set(venue.working_days.values_list("weekday", flat=True))
@@ -1459,6 +1441,7 @@ def ensure_working_days_exist(venue):
     ]
     if missing:
         WorkingDay.objects.bulk_create(missing)
+        invalidate_schedule(venue.id)
 
 
 @login_required